@@ -6,16 +6,28 @@ bl_info = {
 "location": "View3D > Sidebar > LiveLinkFace"
 }
 
-import os, sys, bpy
-sys.path.append(os.getcwd())
-from bpy_utils import register_custom_list_operators, unregister_custom_list_operators
-from livelinkface.operators import LiveLinkFacePanel, ConnectOperator, LoadCSVOperator
+import os, sys
+try:
+    import bpy
+except ImportError:
+    # imported outside Blender (e.g. to receive/record streams headlessly with livelinkface.pylivelinkface), so there is no add-on to register
+    bpy = None
+if getattr(bpy, "is_fake", False):
+    # the fakebpy stand-in (benchmarks, tests) has no UI to register the add-on with either
+    bpy = None
+
+if bpy is not None:
+    sys.path.append(os.getcwd())
+    from bpy_utils import register_custom_list_operators, unregister_custom_list_operators
+    from livelinkface.operators import LiveLinkFacePanel, ConnectOperator, LoadCSVOperator, LoadCSVBatchOperator, LoadTakeOperator
 
 def register():
     register_custom_list_operators("ll", "ll_targets", "ll_index")
     bpy.utils.register_class(LiveLinkFacePanel)
     bpy.utils.register_class(ConnectOperator)
     bpy.utils.register_class(LoadCSVOperator)
+    bpy.utils.register_class(LoadCSVBatchOperator)
+    bpy.utils.register_class(LoadTakeOperator)
 
     bpy.types.Scene.ll_is_listening = bpy.props.BoolProperty(name="Server listening", description="Whether the server is currently listening", default=False)
     bpy.types.Scene.ll_host_ip = bpy.props.StringProperty(name="Host IP", description="IP address of the interface on this machine to listen", default="0.0.0.0")
@@ -27,6 +39,50 @@ def register():
         default = False
     )
 
+    bpy.types.Scene.ll_threaded_receiver = bpy.props.BoolProperty(
+        name="Background receiver",
+        description="Receive packets on a background thread so frames aren't dropped while Blender is busy",
+        default = False
+    )
+
+    bpy.types.Scene.ll_jitter_latency = bpy.props.IntProperty(
+        name="Jitter buffer (ms)",
+        description="Hold packets this long to put them back in frame order and fill short gaps, at the cost of that much delay (0 applies packets as they arrive)",
+        default = 0, min = 0, max = 1000
+    )
+
+    bpy.types.Scene.ll_match_scene_rate = bpy.props.BoolProperty(
+        name="Match scene frame rate",
+        description="Resample recorded and imported frames from the device frame rate to the scene frame rate, so takes play back at their real speed",
+        default = False
+    )
+
+    bpy.types.Scene.ll_decimate_tolerance = bpy.props.FloatProperty(
+        name="Keyframe reduction tolerance",
+        description="After importing or recording, remove keyframes that can be reproduced to within this tolerance (0 keeps every frame)",
+        default = 0.0, min = 0.0, max = 1.0, precision = 4
+    )
+
+    bpy.types.Scene.ll_filter = bpy.props.EnumProperty(
+        name="Smoothing",
+        description="Filter used to reduce jitter in streamed and imported frames",
+        items=[("none", "None", "No smoothing"),
+               ("average", "Moving average", "Mean of the last few frames"),
+               ("exponential", "Exponential", "Exponential smoothing"),
+               ("one_euro", "One Euro", "Adaptive smoothing: heavy when still, light when moving fast")],
+        default="none"
+    )
+    bpy.types.Scene.ll_filter_size = bpy.props.IntProperty(name="Frames", description="Number of frames averaged", default=5, min=1, max=60)
+    bpy.types.Scene.ll_filter_alpha = bpy.props.FloatProperty(name="Factor", description="Weight of each new frame (1 is no smoothing)", default=0.5, min=0.01, max=1.0)
+    bpy.types.Scene.ll_filter_min_cutoff = bpy.props.FloatProperty(name="Min cutoff", description="Cutoff frequency (Hz) when still, lower values remove more jitter", default=1.0, min=0.01, max=30.0)
+    bpy.types.Scene.ll_filter_beta = bpy.props.FloatProperty(name="Speed coefficient", description="How quickly smoothing is reduced as movement speeds up, higher values lag less", default=0.0, min=0.0, max=10.0)
+
+    bpy.types.Object.ll_subject = bpy.props.StringProperty(
+        name="Subject",
+        description="Subject name or device id of the LiveLinkFace stream this target follows (empty follows every stream not claimed by another target)",
+        default=""
+    )
+
     bpy.types.Scene.invert_lr_mouth = bpy.props.BoolProperty(
         name="Invert Mouth L/R",
         description="Invert MouthLeft-MouthRight blendshapes",
@@ -36,11 +92,23 @@ def unregister():
     bpy.utils.unregister_class(LiveLinkFacePanel)
     bpy.utils.unregister_class(ConnectOperator)
     bpy.utils.unregister_class(LoadCSVOperator)
+    bpy.utils.unregister_class(LoadCSVBatchOperator)
+    bpy.utils.unregister_class(LoadTakeOperator)
     unregister_custom_list_operators("ll","ll_targets", "ll_index")
     del bpy.types.Scene.ll_is_listening
     del bpy.types.Scene.ll_host_ip
     del bpy.types.Scene.ll_host_port
     del bpy.types.Scene.ll_record_stream
+    del bpy.types.Scene.ll_threaded_receiver
+    del bpy.types.Scene.ll_jitter_latency
+    del bpy.types.Scene.ll_match_scene_rate
+    del bpy.types.Scene.ll_decimate_tolerance
+    del bpy.types.Scene.ll_filter
+    del bpy.types.Scene.ll_filter_size
+    del bpy.types.Scene.ll_filter_alpha
+    del bpy.types.Scene.ll_filter_min_cutoff
+    del bpy.types.Scene.ll_filter_beta
+    del bpy.types.Object.ll_subject
     del bpy.types.Scene.invert_lr_mouth
  
 if __name__ == "main":
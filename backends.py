@@ -0,0 +1,115 @@
+"""Target backends: where the streaming pipeline writes the frames it receives.
+
+A backend drives one target (e.g. a Blender object) from frames of the 61
+ARKit weights, ordered as FaceBlendShape:
+
+    resolve_channels()              maps the ARKit weights to the target's own
+                                    channels (called again whenever they change)
+    write_frame(frame, values)      records one frame
+    write_take(values, start_frame) records a run of consecutive frames
+    write_live(values)              poses the target now (live preview)
+    flush()                         pushes what has been recorded since the
+                                    last flush to the target
+    finish(num_frames, tolerance)   ends a recording of num_frames frames,
+                                    reducing its keyframes to tolerance
+
+bpylivelinkface.LiveLinkTarget is the Blender backend (shape keys, custom
+properties and fcurves). NumpyBackend keeps everything in memory, so the
+pipeline (pipeline.py) can be run, tested and benchmarked without Blender.
+"""
+from abc import ABC, abstractmethod
+import numpy as np
+
+from livelinkface.decimate import simplify_mask
+from livelinkface.pylivelinkface import BLENDSHAPE_COUNT, LIVE_LINK_FACE_HEADER
+
+
+class TargetBackend(ABC):
+    """Interface of the target backends (see the module docstring).
+    write_frame, write_live, flush and finish must be implemented; by default
+    resolve_channels does nothing and write_take writes one frame at a time."""
+
+    def resolve_channels(self) -> None:
+        pass
+
+    @abstractmethod
+    def write_frame(self, frame: int, values) -> None:
+        pass
+
+    def write_take(self, values, start_frame: int = 0) -> None:
+        for i, frame_values in enumerate(values):
+            self.write_frame(start_frame + i, frame_values)
+
+    @abstractmethod
+    def write_live(self, values) -> None:
+        pass
+
+    @abstractmethod
+    def flush(self) -> None:
+        pass
+
+    @abstractmethod
+    def finish(self, num_frames: int, tolerance: float = 0.0) -> None:
+        pass
+
+
+class NumpyBackend(TargetBackend):
+    """Records into a (num_frames, channels) float32 array.
+
+    channels are the names (from LIVE_LINK_FACE_HEADER) of the ARKit weights
+    kept, all 61 by default. ``live`` holds the last pose written with
+    write_live. ``flushed`` counts the flushes that had something to push
+    and, like Blender's keyframes, ``keyframes`` only reflects what had been
+    recorded at the last flush. After finish with a tolerance, ``keep``
+    masks the keyframes needed to reproduce each channel (see
+    decimate.simplify_mask).
+    """
+
+    def __init__(self, num_frames: int = 0, channels=None) -> None:
+        self.channel_names = list(LIVE_LINK_FACE_HEADER[2:] if channels is None else channels)
+        self.num_frames = num_frames
+        self.frames = np.zeros((num_frames, len(self.channel_names)), dtype=np.float32)
+        self.keyframes = self.frames.copy()
+        self.live = np.zeros(len(self.channel_names), dtype=np.float32)
+        self.recorded = 0
+        self.flushed = 0
+        self.keep = None
+        self.dirty_start = self.dirty_end = -1
+        self.resolve_channels()
+
+    def resolve_channels(self) -> None:
+        names = LIVE_LINK_FACE_HEADER[2:2 + BLENDSHAPE_COUNT]
+        unknown = [name for name in self.channel_names if name not in names]
+        if unknown:
+            raise ValueError(f"Unknown ARKit blendshapes {unknown}")
+        self.channels = np.array([names.index(name) for name in self.channel_names], dtype=np.intp)
+
+    def _mark_dirty(self, start: int, end: int) -> None:
+        self.dirty_start = start if self.dirty_start == -1 else min(self.dirty_start, start)
+        self.dirty_end = max(self.dirty_end, end)
+        self.recorded = max(self.recorded, end + 1)
+
+    def write_frame(self, frame: int, values) -> None:
+        self.frames[frame] = np.asarray(values)[self.channels]
+        self._mark_dirty(frame, frame)
+
+    def write_take(self, values, start_frame: int = 0) -> None:
+        values = np.asarray(values)
+        self.frames[start_frame:start_frame + len(values)] = values[:, self.channels]
+        self._mark_dirty(start_frame, start_frame + len(values) - 1)
+
+    def write_live(self, values) -> None:
+        self.live[:] = np.asarray(values)[self.channels]
+
+    def flush(self) -> None:
+        if self.dirty_start == -1:
+            return
+        self.keyframes[self.dirty_start:self.dirty_end + 1] = self.frames[self.dirty_start:self.dirty_end + 1]
+        self.dirty_start = self.dirty_end = -1
+        self.flushed += 1
+
+    def finish(self, num_frames: int, tolerance: float = 0.0) -> None:
+        self.flush()
+        self.recorded = min(num_frames, self.num_frames)
+        if tolerance > 0:
+            self.keep = simplify_mask(self.keyframes[:self.recorded].T, tolerance)
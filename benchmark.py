@@ -0,0 +1,353 @@
+"""Benchmarks for the streaming and import hot paths, runnable without Blender.
+
+    python -m livelinkface.benchmark                  # run and check against the baselines
+    python -m livelinkface.benchmark --filter decode  # only the decode benchmarks
+    python -m livelinkface.benchmark --update         # record new baselines
+    python -m livelinkface.benchmark --filter pipeline --update  # ... for some benchmarks only
+
+Outside Blender, bpylivelinkface runs on the fakebpy stand-in. Each
+benchmark calls one operation repeatedly for at least min_time seconds, a
+few times over, and reports its throughput (items, i.e. packets or frames,
+per second, from the median call of its best repeat) and the latency
+percentiles of a single call. Parameters are swept over packet rates (as
+packets decoded per 60 Hz timer tick), frame counts and shape key counts,
+with the values in the benchmark names.
+
+Absolute throughputs depend on the machine (and on what else it is doing),
+so every repeat of a benchmark is followed by one of a fixed reference
+workload (REFERENCE_CASE), and benchmarks are compared by their throughput
+relative to the reference's. Relative throughputs are compared against
+those stored in BASELINES_PATH, and any benchmark that has slowed down by
+more than the tolerance is reported as a regression, with a non-zero exit
+status, so CI catches it.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Callable, Iterator, List, NamedTuple
+import numpy as np
+
+from livelinkface import fakebpy
+from livelinkface.backends import NumpyBackend
+from livelinkface.decimate import simplify_mask
+from livelinkface.filters import create_filter, FILTER_AVERAGE, FILTER_EXPONENTIAL, FILTER_ONE_EURO
+from livelinkface.pipeline import LiveLinkFacePipeline
+from livelinkface.pylivelinkface import PyLiveLinkFace, FaceBlendShape, LIVE_LINK_FACE_HEADER, \
+    BLENDSHAPE_COUNT, ROW_SIZE
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baselines.json")
+
+# the fraction a relative throughput can drop below its baseline before it is a regression
+DEFAULT_TOLERANCE = 0.25
+DEFAULT_REPEATS = 10
+
+PACKET_RATES = (60, 600, 6000)
+FRAME_COUNTS = (600, 6000)
+SHAPE_KEY_COUNTS = (52, 256)
+FILTERS = (FILTER_AVERAGE, FILTER_EXPONENTIAL, FILTER_ONE_EURO)
+# a 10 minute take at 60 fps, with the ARKit shape keys
+DECIMATE_SIZES = ((36000, 52),)
+
+
+class Case(NamedTuple):
+    """ One benchmark: run is called repeatedly, and processes items items
+    (packets or frames) per call. """
+    name: str
+    run: Callable[[], object]
+    items: int
+
+
+class Result(NamedTuple):
+    name: str
+    calls: int
+    items: int
+    throughput: float           # items per second (of the median call of the best repeat)
+    p50: float                  # call latency percentiles, seconds
+    p90: float
+    p99: float
+    max: float
+    relative: float             # throughput over the reference's (median over the repeats)
+
+
+def _repeat(case: Case, min_time: float, min_calls: int) -> List[float]:
+    """ Times calls to case.run until min_time seconds and min_calls calls
+    have passed. """
+    times = []
+    start = time.perf_counter()
+    while len(times) < min_calls or time.perf_counter() - start < min_time:
+        t0 = time.perf_counter()
+        case.run()
+        times.append(time.perf_counter() - t0)
+    return times
+
+
+_REFERENCE_VALUES = np.random.default_rng(0).random(8192)
+
+
+def _reference() -> float:
+    """ A fixed mix of interpreted Python and NumPy work, like the
+    benchmarks', that doesn't depend on the add-on's code. """
+    total = 0.0
+    for value in _REFERENCE_VALUES[:1024].tolist():
+        total += value * value
+    return total + float(np.sort(_REFERENCE_VALUES)[::64].sum())
+
+
+REFERENCE_CASE = Case("reference", _reference, 1)
+
+
+def measure(case: Case, min_time: float = 0.05, min_calls: int = 5, repeats: int = DEFAULT_REPEATS,
+            reference: Case = REFERENCE_CASE) -> Result:
+    """ Calls case.run (once to warm up, then) until min_time seconds and
+    min_calls calls have passed, timing every call, repeats times over.
+
+    The throughput is that of the fastest repeat's median call, and the
+    latency percentiles cover every call. Each repeat is followed by one of
+    the reference case, so both see the machine in the same state, and the
+    relative throughput is the median over the repeats of the case's
+    throughput over the reference's. Anything they print is discarded. """
+    with contextlib.redirect_stdout(io.StringIO()):
+        case.run()
+        reference.run()
+        samples, medians, ratios = [], [], []
+        for _ in range(repeats):
+            times = _repeat(case, min_time, min_calls)
+            median = float(np.median(times))
+            reference_median = float(np.median(_repeat(reference, min_time, min_calls)))
+            samples.extend(times)
+            medians.append(median)
+            ratios.append(case.items * reference_median / reference.items / median if median > 0 else float("inf"))
+    samples = np.array(samples)
+    best = min(medians)
+    p50, p90, p99 = np.percentile(samples, [50, 90, 99])
+    return Result(case.name, len(samples), case.items, case.items / best if best > 0 else float("inf"),
+        float(p50), float(p90), float(p99), float(samples.max()), float(np.median(ratios)))
+
+
+def _packets(count: int, seed: int = 0) -> List[bytes]:
+    random = np.random.default_rng(seed)
+    face = PyLiveLinkFace(name="Benchmark", uuid="00000000-0000-0000-0000-000000000000")
+    return [bytes(face.encode_view(1000 + i, random.random(BLENDSHAPE_COUNT))) for i in range(count)]
+
+
+def _shape_keys(count: int) -> list:
+    """ The ARKit shape keys, padded with other (undriven) shape keys to count. """
+    names = list(fakebpy.ARKIT_SHAPE_KEYS)
+    return names + [f"Extra{i}" for i in range(count - len(names))]
+
+
+def _target(llf, shape_keys: int, num_frames: int, action_name: str = None):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return llf.LiveLinkTarget(fakebpy.make_object("Face", _shape_keys(shape_keys)), num_frames, action_name=action_name)
+
+
+def decode_cases() -> Iterator[Case]:
+    packet = _packets(1)[0]
+    row = np.zeros(ROW_SIZE)
+    yield Case("decode/decode", lambda: PyLiveLinkFace.decode(packet), 1)
+    yield Case("decode/decode_into", lambda: PyLiveLinkFace.decode_into(packet, row), 1)
+    for rate in PACKET_RATES:
+        packets = _packets(max(rate // 60, 1))
+        yield Case(f"decode/decode_batch[rate={rate}]", lambda packets=packets: PyLiveLinkFace.decode_batch(packets), len(packets))
+
+
+def filter_cases() -> Iterator[Case]:
+    random = np.random.default_rng(0)
+    frame = random.random(BLENDSHAPE_COUNT).tolist()
+    shapes = list(FaceBlendShape)
+    for kind in FILTERS:
+        face = PyLiveLinkFace()
+        face.filter = create_filter(kind)
+
+        def set_each(face=face):
+            for shape, value in zip(shapes, frame):
+                face.set_blendshape(shape, value)
+        yield Case(f"filter/set_blendshape[{kind}]", set_each, 1)
+        yield Case(f"filter/set_blendshapes[{kind}]", lambda face=face: face.set_blendshapes(frame), 1)
+        for frames in FRAME_COUNTS:
+            values = random.random((frames, BLENDSHAPE_COUNT)).astype(np.float32)
+            take_filter = create_filter(kind)
+
+            def process(take_filter=take_filter, values=values):
+                take_filter.reset()
+                take_filter.process(values)
+            yield Case(f"filter/process[{kind},frames={frames}]", process, frames)
+
+
+def decimate_cases() -> Iterator[Case]:
+    random = np.random.default_rng(0)
+    for frames, curves in DECIMATE_SIZES:
+        # slowly wandering weights with a little sensor noise, like a captured take
+        values = np.clip(np.cumsum(random.normal(0, 0.02, (curves, frames)), axis=1) + random.normal(0, 0.005, (curves, frames)), 0, 1)
+        yield Case(f"decimate/simplify_mask[frames={frames},curves={curves}]",
+            lambda values=values: simplify_mask(values, 0.01), frames * curves)
+
+
+def import_cases(llf, directory: str) -> Iterator[Case]:
+    random = np.random.default_rng(0)
+    for frames in FRAME_COUNTS:
+        path = os.path.join(directory, f"take{frames}.csv")
+        with open(path, "w") as f:
+            f.write(",".join(LIVE_LINK_FACE_HEADER) + "\n")
+            for i, weights in enumerate(random.random((frames, BLENDSHAPE_COUNT))):
+                timecode = f"10:{i // 3600 % 60:02d}:{i // 60 % 60:02d}:{i % 60:02d}.000"
+                f.write(f"{timecode},{BLENDSHAPE_COUNT}," + ",".join(f"{w:.6f}" for w in weights) + "\n")
+        for shape_keys in SHAPE_KEY_COUNTS:
+            obj = fakebpy.make_object("Face", _shape_keys(shape_keys))
+            yield Case(f"import/from_csv[frames={frames},keys={shape_keys}]",
+                lambda obj=obj, path=path: llf.LiveLinkTarget.from_csv([obj], path), frames)
+
+
+def apply_cases(llf) -> Iterator[Case]:
+    random = np.random.default_rng(0)
+    frame = random.random(BLENDSHAPE_COUNT).astype(np.float32)
+    weights = frame.tolist()
+    for shape_keys in SHAPE_KEY_COUNTS:
+        target = _target(llf, shape_keys, 3600)
+
+        def set_each(target=target):
+            for i, value in enumerate(weights):
+                target.set_frame_value(i, 100, value)
+        yield Case(f"apply/set_frame_value[keys={shape_keys}]", set_each, 1)
+        yield Case(f"apply/set_frame_values[keys={shape_keys}]", lambda target=target: target.set_frame_values(100, frame), 1)
+        yield Case(f"apply/set_live_values[keys={shape_keys}]", lambda target=target: target.set_live_values(frame), 1)
+
+        for frames in FRAME_COUNTS:
+            target = _target(llf, shape_keys, frames, f"Benchmark{frames}_{shape_keys}")
+
+            def update_one(target=target, middle=frames // 2):
+                # a single frame streamed in, as on every timer tick
+                target.set_frame_values(middle, frame)
+                target.update_keyframes()
+            yield Case(f"apply/update_keyframes[frames={frames},keys={shape_keys},dirty=1]", update_one, 1)
+
+            def update_all(target=target):
+                target.mark_all_dirty()
+                target.update_keyframes()
+            yield Case(f"apply/update_keyframes[frames={frames},keys={shape_keys},dirty=all]", update_all, frames)
+
+
+def pipeline_cases(llf) -> Iterator[Case]:
+    """ A timer tick of the streaming pipeline (decode, route, write, flush)
+    recording into each backend. """
+    for rate in PACKET_RATES:
+        packets = _packets(max(rate // 60, 1))
+        for backend, target in (("numpy", NumpyBackend(3600)), ("blender", _target(llf, 52, 3600, f"BenchmarkPipeline{rate}"))):
+            pipeline = LiveLinkFacePipeline([target], record=True)
+
+            def tick(pipeline=pipeline, packets=packets):
+                pipeline.receive(packets)
+                pipeline.tick()
+            yield Case(f"pipeline/tick[rate={rate},backend={backend}]", tick, len(packets))
+
+
+def cases(directory: str) -> Iterator[Case]:
+    """ Every benchmark. The bpy cases run on fakebpy (unless bpy can be
+    imported, i.e. inside Blender). """
+    yield from decode_cases()
+    yield from filter_cases()
+    yield from decimate_cases()
+    fakebpy.install()
+    import livelinkface.bpylivelinkface as llf
+    yield from import_cases(llf, directory)
+    yield from apply_cases(llf)
+    yield from pipeline_cases(llf)
+
+
+def load_baselines(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baselines(path: str, results: List[Result], baselines: dict) -> None:
+    baselines = dict(baselines)
+    for result in results:
+        baselines[result.name] = { "throughput": round(result.throughput, 1), "relative": float(f"{result.relative:.6g}") }
+    with open(path, "w") as f:
+        json.dump(dict(sorted(baselines.items())), f, indent=2)
+        f.write("\n")
+
+
+def ratio(result: Result, baselines: dict) -> float:
+    """ A result's relative throughput over its baseline's (None if it has
+    none). The absolute throughputs are only for reading: they were likely
+    measured on another machine. """
+    baseline = baselines.get(result.name)
+    if baseline is None or "relative" not in baseline:
+        return None
+    return result.relative / baseline["relative"]
+
+
+def compare(result: Result, baselines: dict, tolerance: float) -> str:
+    """ Returns "new", "ok", "faster" or "REGRESSED" for a result. """
+    change = ratio(result, baselines)
+    if change is None:
+        return "new"
+    if change < 1 - tolerance:
+        return "REGRESSED"
+    if change > 1 + tolerance:
+        return "faster"
+    return "ok"
+
+
+def _format_time(seconds: float) -> str:
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:8.1f}us"
+    return f"{seconds * 1e3:8.2f}ms"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m livelinkface.benchmark",
+        description="Benchmark decoding, filtering, decimating, importing and keyframing without Blender.")
+    parser.add_argument("--filter", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--min-time", type=float, default=0.05, help="seconds to run each repeat of a benchmark for")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS, help="repeats of each benchmark (the best one counts)")
+    parser.add_argument("--baselines", default=BASELINES_PATH, help="baseline throughputs (JSON)")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+        help="fraction of a baseline's relative throughput that can be lost before it is a regression")
+    parser.add_argument("--update", action="store_true", help="save the results as the new baselines")
+    parser.add_argument("--json", default=None, help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    baselines = load_baselines(args.baselines)
+    results, regressions = [], []
+    print(f"{'benchmark':60s} {'items/s':>12s} {'p50':>10s} {'p90':>10s} {'p99':>10s} {'max':>10s}  baseline")
+    with tempfile.TemporaryDirectory() as directory:
+        for case in cases(directory):
+            if args.filter not in case.name:
+                continue
+            result = measure(case, args.min_time, repeats=args.repeats)
+            results.append(result)
+            status = compare(result, baselines, args.tolerance)
+            if status == "REGRESSED":
+                regressions.append(result)
+            change = ratio(result, baselines)
+            vs = f"{change:6.2f}x {status}" if change is not None else status
+            print(f"{result.name:60s} {result.throughput:12.1f} {_format_time(result.p50)} {_format_time(result.p90)} "
+                  f"{_format_time(result.p99)} {_format_time(result.max)}  {vs}", flush=True)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump([result._asdict() for result in results], f, indent=2)
+    if args.update:
+        save_baselines(args.baselines, results, baselines)
+        print(f"Saved {len(results)} baselines to {args.baselines}")
+        return 0
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) regressed by more than {args.tolerance:.0%}:", file=sys.stderr)
+        for result in regressions:
+            print(f"  {result.name}: {result.relative:.6g}x the reference's throughput, baseline "
+                  f"{baselines[result.name]['relative']:.6g}x", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
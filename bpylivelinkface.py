@@ -2,32 +2,54 @@ import traceback
 import time
 import socket 
 import bpy 
-import csv
 import random 
+import os
+import numpy as np
 
-from livelinkface.pylivelinkface import PyLiveLinkFace, FaceBlendShape
+from livelinkface.pylivelinkface import BLENDSHAPE_COUNT, MAX_PACKET_SIZE, LIVE_LINK_FACE_HEADER
+from livelinkface.receiver import PacketRingBuffer, LiveLinkFaceReceiver, enable_overflow_count, recv_into_counting_overflow
+from livelinkface.take import TakeReader, TAKE_CHANNELS, read_csv, ParallelCSVReader
+from livelinkface.decimate import simplify_mask
+from livelinkface.backends import TargetBackend
+from livelinkface.pipeline import LiveLinkFacePipeline
+from livelinkface.timing import frame_times, resample
+from livelinkface.timecode import parse_timecodes, infer_framerate
 
-LIVE_LINK_FACE_HEADER = "Timecode,BlendShapeCount,EyeBlinkLeft,EyeLookDownLeft,EyeLookInLeft,EyeLookOutLeft,EyeLookUpLeft,EyeSquintLeft,EyeWideLeft,EyeBlinkRight,EyeLookDownRight,EyeLookInRight,EyeLookOutRight,EyeLookUpRight,EyeSquintRight,EyeWideRight,JawForward,JawRight,JawLeft,JawOpen,MouthClose,MouthFunnel,MouthPucker,MouthRight,MouthLeft,MouthSmileLeft,MouthSmileRight,MouthFrownLeft,MouthFrownRight,MouthDimpleLeft,MouthDimpleRight,MouthStretchLeft,MouthStretchRight,MouthRollLower,MouthRollUpper,MouthShrugLower,MouthShrugUpper,MouthPressLeft,MouthPressRight,MouthLowerDownLeft,MouthLowerDownRight,MouthUpperUpLeft,MouthUpperUpRight,BrowDownLeft,BrowDownRight,BrowInnerUp,BrowOuterUpLeft,BrowOuterUpRight,CheekPuff,CheekSquintLeft,CheekSquintRight,NoseSneerLeft,NoseSneerRight,TongueOut,HeadYaw,HeadPitch,HeadRoll,LeftEyeYaw,LeftEyePitch,LeftEyeRoll,RightEyeYaw,RightEyePitch,RightEyeRoll".split(",")
 
 instance = None
 
+# the kind of property each ARKit blendshape resolves to on a target (see LiveLinkTarget.resolve_channels)
+CHANNEL_NONE = 0
+CHANNEL_SHAPE_KEY = 1
+CHANNEL_CUSTOM_PROP = 2
+
+# when no more than this many consecutive frames have changed since the last upload, LiveLinkTarget.update_keyframes writes just those keyframe points rather than the whole curve
+PARTIAL_UPLOAD_FRAMES = 16
+
+# seconds between checks (see LiveLinkTarget.check_channels) for renamed shape keys, new custom properties etc. while writing frames
+CHANNEL_CHECK_INTERVAL = 0.5
+
+# maximum number of queued packets drained from the socket and decoded as a single batch
+MAX_BATCH_SIZE = 512
+
 '''
 Create a listener (an instance of LiveLinkFaceServer) on the given IP/port. 
 Prefer using this method than constructing an instance directly as this will ensure that any pre-existing connections are closed
 '''
-def create_instance(targets, record=False, host= "0.0.0.0", port = 11111):
+def create_instance(targets, record=False, host= "0.0.0.0", port = 11111, threaded=False, tolerance=0.0, filter=None, routes=None, latency=0.0, rate=None):
     global instance
     if instance is not None:
         instance.close()
-    instance = LiveLinkFaceServer(targets, record, host, port)
+    instance = LiveLinkFaceServer(targets, record, host, port, threaded=threaded, tolerance=tolerance, filter=filter, routes=routes, latency=latency, rate=rate)
 
 '''
 Interface for looking up shape key/custom properties by name and setting their respective weights on frames.
 '''
-class LiveLinkTarget:
+class LiveLinkTarget(TargetBackend):
 
     '''
     Construct an instance to manipulate frames on a single target object (which is an object within the Blender context).
+    This is the Blender backend (see backends.py) the streaming pipeline writes to.
     If the number of frames is known ahead of time (i.e. you are not working with streaming), this can be passed here.
     If you are streaming, pass num_frames=0 (or simply don't pass anything for the parameter and leave empty).
     The target should have at least one shape key or custom property with a name that corresponds to one of the entries in LIVE_LINK_FACE_HEADER.
@@ -36,18 +58,23 @@ class LiveLinkTarget:
     def __init__(self, target, num_frames=360, action_name=None):
         
         self.target = target
-        self.frame_nums = list(range(num_frames)) 
+        self.num_frames = num_frames
+        # the frame number each slot of the keyframe store is keyed on (see set_key_frames)
+        self.key_frames = np.arange(num_frames, dtype=np.float32)
 
-        # create an array-of-arrays to hold the (flattened) tuples of (frame_number,weight) for each shape key
-        # i.e. each inner array will look like:
-        # [ 0, v1, 1, v2, ..., N, vN ]
-        # where v1 and v2 refer to the shape key weights at frames 0 and 1 respectively, and there are N frames in total
+        # keyframes are held in a contiguous float32 (n_shape_keys, num_frames, 2) array of (frame_number, weight) pairs, i.e. each row
+        # [ [0, v1], [1, v2], ..., [N, vN] ]
+        # is laid out exactly as keyframe_points.foreach_set('co', ...) expects it, so it can be handed to Blender through the buffer protocol without conversion
         # (note this will also create keyframes for non-LiveLinkFace shape keys on the mesh)
-        # I can't find a better way to check if an object has shapekeys, so just use try-except
-        try:
-            self.sk_frame_data =  [ [ i for co in zip(self.frame_nums, [0.0] * num_frames) for i in co ] for _ in range(len(self.target.data.shape_keys.key_blocks)) ]
-        except:
-            self.sk_frames = None
+        shape_keys = self.target.data.shape_keys
+        self.sk_frame_data = LiveLinkTarget.create_frame_data(0 if shape_keys is None else len(shape_keys.key_blocks), num_frames)
+
+        # the current weight of every shape key, used by the live preview path (set_live_values) to write all weights with a single foreach_set
+        # this starts from the mesh's current weights so shape keys that aren't driven by LiveLinkFace keep their value
+        self.sk_values = np.zeros(len(self.sk_frame_data), dtype=np.float32)
+        if shape_keys is not None:
+            shape_keys.key_blocks.foreach_get("value", self.sk_values)
+
         # some ARKit blendshapes may drive bone rotations, rather than mesh-deforming shape keys
         # if a custom property exists on the target object whose name matches the incoming ARkit shape, the property will be animated
         # it is then your responsibility to create a driver in Blender to rotate the bone between its extremities (blendshape values -1 to 1 )
@@ -68,13 +95,36 @@ class LiveLinkTarget:
                 self.custom_props += [ k ] 
                 
         print(f"Set custom_props to {self.custom_props}")
-        self.custom_prop_framedata = [ [ i for co in zip(self.frame_nums, [0.0] * num_frames) for i in co ] for _ in range(len(self.custom_props)) ]
-                
+        self.custom_prop_framedata = LiveLinkTarget.create_frame_data(len(self.custom_props), num_frames)
+
+        # which channels and which (inclusive) frame range have changed since the last call to update_keyframes
+        # everything starts dirty so the first upload writes every curve
+        self.sk_dirty = np.ones(len(self.sk_frame_data), dtype=bool)
+        self.custom_prop_dirty = np.ones(len(self.custom_prop_framedata), dtype=bool)
+        self.dirty_start = 0
+        self.dirty_end = num_frames - 1
+
+        self.sk_action = None
+        self.custom_prop_action = None
+        self.sk_fcurves = []
+        self.custom_prop_fcurves = []
+
+        self.resolve_channels()
+
         if action_name is not None:
             self.create_action(action_name, num_frames)
         
         self.update_keyframes()
 
+    '''
+    Allocate a (num_channels, num_frames, 2) float32 keyframe store, with the frame numbers filled in and all weights set to zero.
+    '''
+    @staticmethod
+    def create_frame_data(num_channels, num_frames):
+        frame_data = np.zeros((num_channels, num_frames, 2), dtype=np.float32)
+        frame_data[:, :, 0] = np.arange(num_frames, dtype=np.float32)
+        return frame_data
+
     '''
     Try and resolve an ARKit blendshape-id to a named shape key in the target object.
     ARKit blendshape IDs are the integer index within LIVE_LINK_FACE_HEADER (offset to exclude the first two columns.
@@ -117,140 +167,553 @@ class LiveLinkTarget:
                 pass
         return None    
             
+    '''
+    Fingerprint of everything the channel tables depend on (the invert L/R setting, the names of the shape keys and the names of the custom properties).
+    If this changes (e.g. a shape key is renamed or a custom property added), the tables need to be rebuilt.
+    '''
+    def channel_signature(self):
+        shape_keys = self.target.data.shape_keys
+        return (bpy.context.scene.invert_lr_mouth, 
+                () if shape_keys is None else tuple(shape_keys.key_blocks.keys()), 
+                tuple(self.target.keys()))
+
+    '''
+    Add any custom property matching an ARKit blendshape that isn't animated yet (e.g. one added mid-session) to the keyframe store, with a curve in the custom property action (if there is one).
+    '''
+    def add_custom_props(self):
+        new_props = []
+        for i_ll in range(BLENDSHAPE_COUNT):
+            custom_prop = self.livelink_to_custom_prop(i_ll)
+            if custom_prop is not None and custom_prop not in self.custom_props and custom_prop not in new_props:
+                new_props += [custom_prop]
+        if len(new_props) == 0:
+            return
+        print(f"Found custom properties {new_props}")
+        self.custom_props += new_props
+        new_frame_data = LiveLinkTarget.create_frame_data(len(new_props), self.num_frames)
+        new_frame_data[:, :, 0] = self.key_frames
+        self.custom_prop_framedata = np.concatenate([self.custom_prop_framedata, new_frame_data])
+        self.custom_prop_dirty = np.concatenate([self.custom_prop_dirty, np.ones(len(new_props), dtype=bool)])
+        if self.custom_prop_action is not None:
+            for custom_prop in new_props:
+                self.custom_prop_fcurves += [ LiveLinkTarget.create_fcurve(self.custom_prop_action, f"[\"{custom_prop}\"]", self.num_frames) ]
+            # the new curves need every point written, not just the frames changed since the last upload
+            if self.num_frames > 0:
+                self.mark_dirty_frames(0, self.num_frames - 1)
+
+    '''
+    Resolve every ARKit blendshape to the shape key or custom property it drives, once, into integer tables:
+    - channel_kind[i_ll] is one of CHANNEL_NONE/CHANNEL_SHAPE_KEY/CHANNEL_CUSTOM_PROP
+    - channel_index[i_ll] is the index into sk_frame_data or custom_prop_framedata (-1 if unresolved)
+    - sk_channels/sk_indices and custom_prop_channels/custom_prop_indices are the same mapping as gather/scatter index arrays
+    This is called automatically (see check_channels) by the set_*_value(s) methods whenever channel_signature changes.
+    '''
+    def resolve_channels(self):
+        self.add_custom_props()
+        self.channel_kind = np.full(BLENDSHAPE_COUNT, CHANNEL_NONE, dtype=np.int8)
+        self.channel_index = np.full(BLENDSHAPE_COUNT, -1, dtype=np.int32)
+        has_shape_keys = self.target.data.shape_keys is not None
+
+        for i_ll in range(BLENDSHAPE_COUNT):
+            i_sk = self.livelink_to_shapekey_idx(i_ll) if has_shape_keys else -1
+            if i_sk != -1 and i_sk < len(self.sk_frame_data):
+                self.channel_kind[i_ll] = CHANNEL_SHAPE_KEY
+                self.channel_index[i_ll] = i_sk
+                continue
+            custom_prop = self.livelink_to_custom_prop(i_ll)
+            if custom_prop is not None and custom_prop in self.custom_props:
+                self.channel_kind[i_ll] = CHANNEL_CUSTOM_PROP
+                self.channel_index[i_ll] = self.custom_props.index(custom_prop)
+
+        self.sk_channels = np.flatnonzero(self.channel_kind == CHANNEL_SHAPE_KEY)
+        self.sk_indices = self.channel_index[self.sk_channels]
+        self.custom_prop_channels = np.flatnonzero(self.channel_kind == CHANNEL_CUSTOM_PROP)
+        self.custom_prop_indices = self.channel_index[self.custom_prop_channels]
+        self.signature = self.channel_signature()
+        self.signature_checked = time.monotonic()
+
+    '''
+    Rebuild the channel tables if channel_signature has changed since they were built.
+    Building the signature walks every shape key and custom property name, so while writing frames it is only compared every CHANNEL_CHECK_INTERVAL seconds (or whenever [force] is True).
+    '''
+    def check_channels(self, force=False):
+        now = time.monotonic()
+        if not force and now - self.signature_checked < CHANNEL_CHECK_INTERVAL:
+            return
+        self.signature_checked = now
+        if self.channel_signature() != self.signature:
+            self.resolve_channels()
+            
     '''Sets the value for the LiveLink blendshape at index [i_ll] to [val] for frame [frame] (note the underlying target may be a blendshape or a bone).'''
     def set_frame_value(self, i_ll, frame, val):
-        i_sk = self.livelink_to_shapekey_idx(i_ll)
-        frame_data_offset = (2*frame)+1 
-        if i_sk != -1:
-            self.sk_frame_data[i_sk][frame_data_offset] = val
+        self.check_channels()
+        kind = self.channel_kind[i_ll]
+        if kind == CHANNEL_SHAPE_KEY:
+            self.sk_frame_data[self.channel_index[i_ll], frame, 1] = val
+            self.sk_dirty[self.channel_index[i_ll]] = True
+        elif kind == CHANNEL_CUSTOM_PROP:
+            self.custom_prop_framedata[self.channel_index[i_ll], frame, 1] = val
+            self.custom_prop_dirty[self.channel_index[i_ll]] = True
         else:
-            custom_prop = self.livelink_to_custom_prop(i_ll)
-            if custom_prop is not None:
-                custom_prop_idx = self.custom_props.index(custom_prop)
-                self.custom_prop_framedata[custom_prop_idx][frame_data_offset] = val
-            else:
-#                print(f"Failed to find custom property for ARkit blendshape id {i_ll}")
-                pass
+            return
+        self.mark_dirty_frames(frame, frame)
+
+    '''
+    Sets the values for all LiveLink blendshapes at frame [frame] from [values] (indexed by ARKit blendshape-id, i.e. a decoded packet).
+    The channel tables are rebuilt first if the target's shape keys/custom properties or the invert L/R setting have changed.
+    '''
+    def set_frame_values(self, frame, values):
+        self.check_channels()
+        values = np.asarray(values)
+        self.sk_frame_data[self.sk_indices, frame, 1] = values[self.sk_channels]
+        self.custom_prop_framedata[self.custom_prop_indices, frame, 1] = values[self.custom_prop_channels]
+        self.sk_dirty[self.sk_indices] = True
+        self.custom_prop_dirty[self.custom_prop_indices] = True
+        self.mark_dirty_frames(frame, frame)
+
+    '''
+    Sets the values for all LiveLink blendshapes on a run of consecutive frames, starting at [start_frame], from the (num_frames, 61) matrix [values] (one row per frame, columns indexed by ARKit blendshape-id).
+    Each shape key/custom property is written as a whole column, so this is the fast path for importing a take.
+    '''
+    def set_take_values(self, values, start_frame=0):
+        self.check_channels(force=True)
+        values = np.asarray(values)
+        end_frame = start_frame + len(values)
+        self.sk_frame_data[self.sk_indices, start_frame:end_frame, 1] = values[:, self.sk_channels].T
+        self.custom_prop_framedata[self.custom_prop_indices, start_frame:end_frame, 1] = values[:, self.custom_prop_channels].T
+        self.sk_dirty[self.sk_indices] = True
+        self.custom_prop_dirty[self.custom_prop_indices] = True
+        self.mark_dirty_frames(start_frame, end_frame - 1)
+
+    '''
+    Keys the slots of the keyframe store on the given (num_frames,) increasing [frames], rather than on one frame each (e.g. to leave gaps where rows are missing from a take).
+    '''
+    def set_key_frames(self, frames):
+        self.key_frames[:] = frames
+        self.sk_frame_data[:, :, 0] = self.key_frames
+        self.custom_prop_framedata[:, :, 0] = self.key_frames
+        self.mark_all_dirty()
 
-    '''Loads a CSV in LiveLinkFace format. First line is the header (Timecode,BlendshapeCount,etc,etc), every line thereafter is a single frame with comma-separated weights'''
+    '''Extends the range of frames that need to be uploaded on the next call to update_keyframes to include [start, end].'''
+    def mark_dirty_frames(self, start, end):
+        if self.dirty_start == -1:
+            self.dirty_start, self.dirty_end = start, end
+        else:
+            self.dirty_start = min(self.dirty_start, start)
+            self.dirty_end = max(self.dirty_end, end)
+
+    '''Marks every channel and frame as changed, so the next call to update_keyframes rewrites every curve.'''
+    def mark_all_dirty(self):
+        self.sk_dirty[:] = True
+        self.custom_prop_dirty[:] = True
+        self.dirty_start = 0
+        self.dirty_end = self.num_frames - 1
+
+    '''
+    Loads a CSV in LiveLinkFace format. First line is the header (Timecode,BlendshapeCount,etc,etc), every line thereafter is a single frame with comma-separated weights.
+    The file is parsed in chunks straight into a float32 frame matrix (see take.read_csv), which is then applied to each target a whole column at a time.
+    Rows are placed by their timecodes (at [source_fps], read from the timecodes if not given, see csv_frame_times), so rows dropped from the sequence leave gaps between keys.
+    If a frame [rate] is given, the rows are resampled onto that rate instead, so dropped rows are interpolated over.
+    '''
     @staticmethod
-    def from_csv(targets,path,action_name="LiveLinkAction",use_first_frame_as_zero=False):        
-        with open(path,"r") as csv_file:
-            csvdata = list(csv.reader(csv_file))
+    def from_csv(targets,path,action_name="LiveLinkAction",use_first_frame_as_zero=False,tolerance=0.0,filter=None,rate=None,source_fps=None):        
+        timecodes, values = read_csv(path)
+        frames, times = LiveLinkTarget.csv_frame_times(timecodes, source_fps)
+        return LiveLinkTarget.from_values(targets, values, action_name, use_first_frame_as_zero, tolerance, filter, times, rate, frames)
 
-        num_frames = len(csvdata) - 1
+    '''
+    Returns the frame (counted from the first row) and the time (seconds from the first row) of each row of a LiveLinkFace CSV from its timecode column (see timecode.parse_timecodes), counting rows missing from the sequence.
+    The timecodes are read at [source_fps], or at the frame rate they were written at if not given (see timecode.infer_framerate).
+    Falls back to one row per frame (at [source_fps], or 60) if the timecodes can't be parsed.
+    '''
+    @staticmethod
+    def csv_frame_times(timecodes, source_fps=None):
+        try:
+            if source_fps is None:
+                source_fps = infer_framerate(timecodes)
+            frames, sub_frames = parse_timecodes(timecodes, source_fps)
+        except ValueError as e:
+            print(f"Ignoring CSV timecodes : {e}")
+            frames = np.arange(len(timecodes))
+            return frames, frame_times(frames, fps=source_fps or 60)
+        if len(frames) == 0:
+            return frames, frame_times(frames, fps=source_fps)
+        # a take recorded over midnight wraps back to 00:00:00:00
+        frames = frames - frames[0]
+        frames[frames < 0] += 24 * 60 * 60 * source_fps
+        missing = int(np.maximum(np.diff(frames) - 1, 0).sum())
+        if missing > 0:
+            print(f"{missing} frames missing from the CSV timecodes")
+        return frames, frame_times(frames, sub_frames - sub_frames[0], source_fps)
 
-        targets = [LiveLinkTarget(target, num_frames, action_name=action_name) for target in targets]
-        for idx,blendshape in enumerate(LIVE_LINK_FACE_HEADER):
-            if idx < 2:
-                continue
-            
-            rest_weight = float(csvdata[1][idx])
-                        
-            for i in range(1, num_frames):
-                val = float(csvdata[i][idx])
-                if use_first_frame_as_zero:
-                    val -= rest_weight
-                for target in targets:
-                    ll_idx = idx - 2
-                    frame=i-1
-                    target.set_frame_value(ll_idx, i, val)
+    '''
+    Loads many CSVs at once, parsing them in parallel in a pool of worker processes (see take.ParallelCSVReader).
+    Each take is keyed into its own action(s), named after the file, which are kept (fake user) even when they're no longer assigned to the target.
+    Returns a dict mapping each path to its list of LiveLinkTargets, or to the exception raised while loading it.
+    '''
+    @staticmethod
+    def from_csv_batch(targets,paths,use_first_frame_as_zero=False,max_workers=None,tolerance=0.0,filter=None,rate=None,source_fps=None):
+        reader = ParallelCSVReader(paths, max_workers)
+        results = {}
+        try:
+            while not reader.done:
+                for path, parsed, error in reader.poll(timeout=None):
+                    results[path] = error if error is not None else \
+                        LiveLinkTarget.from_parsed_csv(targets, path, parsed, use_first_frame_as_zero, tolerance, filter, rate, source_fps)
+        finally:
+            reader.close()
+        return results
+
+    '''
+    Keys a CSV parsed by take.read_csv (e.g. in a worker process) onto the targets, in an action named after the file.
+    '''
+    @staticmethod
+    def from_parsed_csv(targets,path,parsed,use_first_frame_as_zero=False,tolerance=0.0,filter=None,rate=None,source_fps=None):
+        timecodes, values = parsed
+        action_name = os.path.splitext(os.path.basename(path))[0]
+        frames, times = LiveLinkTarget.csv_frame_times(timecodes, source_fps)
+        targets = LiveLinkTarget.from_values(targets, values, action_name, use_first_frame_as_zero, tolerance, filter, times, rate, frames)
+        for target in targets:
+            for action in (target.sk_action, target.custom_prop_action):
+                if action is not None:
+                    action.use_fake_user = True
+        return targets
+
+    '''
+    Loads a binary take (see take.py). The take is memory-mapped, and its frames are applied to each target a whole column at a time.
+    Channels are matched to ARKit blendshapes by name, so takes with channels in any order (or with only some channels) can be loaded.
+    '''
+    @staticmethod
+    def from_take(targets,path,action_name="LiveLinkAction",use_first_frame_as_zero=False,tolerance=0.0,filter=None,rate=None):
+        reader = TakeReader(path)
+        values = reader.values
+        if reader.channel_names != TAKE_CHANNELS:
+            columns = np.zeros((len(reader), BLENDSHAPE_COUNT), dtype=np.float32)
+            for i, name in enumerate(reader.channel_names):
+                if name in TAKE_CHANNELS:
+                    columns[:, TAKE_CHANNELS.index(name)] = values[:, i]
+            values = columns
+        frames = reader.frames - reader.frames[0] if len(reader) > 0 else None
+        times = frame_times(frames, reader.sub_frames, reader.fps, reader.denominator) if len(reader) > 0 else None
+        return LiveLinkTarget.from_values(targets, values, action_name, use_first_frame_as_zero, tolerance, filter, times, rate, frames)
 
+    '''
+    Creates a LiveLinkTarget (and action) for each target object and keys the (num_frames, 61) matrix [values] onto it, one keyframe per row.
+    If [use_first_frame_as_zero] is True, the first frame is subtracted from every frame (so it becomes the rest pose).
+    If [tolerance] is greater than zero, the keyframes are then decimated to that tolerance (see decimate).
+    If a [filter] (see filters.py) is given, it is reset and the frames are smoothed with it before anything else.
+    If the [times] (seconds) of the rows and a frame [rate] (e.g. the scene's) are given, the rows are resampled onto that rate (see timing.py).
+    Otherwise each row is keyed on its own frame: the given [frames] (e.g. from the rows' timecodes, counted from the first row), so rows missing from a sequence leave gaps, or one row per frame.
+    '''
+    @staticmethod
+    def from_values(targets,values,action_name="LiveLinkAction",use_first_frame_as_zero=False,tolerance=0.0,filter=None,times=None,rate=None,frames=None):
+        if filter is not None:
+            filter.reset()
+            values = filter.process(values).astype(np.float32)
+        if rate and times is not None and len(values) > 0:
+            frames, values = resample(times - times[0], values, rate)
+        if use_first_frame_as_zero and len(values) > 0:
+            values = values - values[0]
+        targets = [LiveLinkTarget(target, len(values), action_name=action_name) for target in targets]
         for target in targets:
+            if frames is not None:
+                target.set_key_frames(frames)
+            target.set_take_values(values)
             target.update_keyframes()
-        
+            if tolerance > 0:
+                target.decimate(tolerance)
         return targets
-    
       
     def create_action(self, action_name, num_frames):
     
-        # create a new Action so we can directly create fcurves and set the keyframe points
-        try:
-            self.sk_action = bpy.data.actions[f"{action_name}_shapekey"]
-        except: 
-            self.sk_action = bpy.data.actions.new(f"{action_name}_shapekey") 
-                
         # create the bone AnimData if it doesn't exist 
         # important - we create this on the target (e.g. bpy.context.object), not its data (bpy.context.object.data)
         if self.target.animation_data is None:
             self.target.animation_data_create()
-                                   
-        # create the shape key AnimData if it doesn't exist 
-        if self.target.data.shape_keys.animation_data is None:
-            self.target.data.shape_keys.animation_data_create()
-            
-        self.target.data.shape_keys.animation_data.action = self.sk_action
-        
+
         self.sk_fcurves = []
         self.custom_prop_fcurves = []
-        
-        for sk in self.target.data.shape_keys.key_blocks:
-            datapath = f"{sk.path_from_id()}.value"
+        self.sk_action = None
+
+        shape_keys = self.target.data.shape_keys
+        if shape_keys is not None:
+            # create a new Action so we can directly create fcurves and set the keyframe points
+            self.sk_action = LiveLinkTarget.get_or_create_action(f"{action_name}_shapekey")
+                                   
+            # create the shape key AnimData if it doesn't exist 
+            if shape_keys.animation_data is None:
+                shape_keys.animation_data_create()
+                
+            shape_keys.animation_data.action = self.sk_action
             
-            fc = self.sk_action.fcurves.find(datapath)
-            if fc is None:
-                print(f"Creating fcurve for shape key {sk.path_from_id()}")
-                fc = self.sk_action.fcurves.new(datapath)
-                fc.extrapolation="CONSTANT"                
-                fc.keyframe_points.add(count=num_frames)
-            else:
-                print(f"Found fcurve for shape key {sk.path_from_id()}")
-            self.sk_fcurves += [fc]
+            for sk in shape_keys.key_blocks:
+                self.sk_fcurves += [ LiveLinkTarget.create_fcurve(self.sk_action, f"{sk.path_from_id()}.value", num_frames) ]
+
+        # custom properties are animated on the object itself, always in this take's own action (so every take keeps its own curves)
+        # an action of the user's own that was active (e.g. bone animation) is moved to an NLA track, so it still plays underneath the take
+        LiveLinkTarget.push_user_action(self.target.animation_data)
+        self.custom_prop_action = LiveLinkTarget.get_or_create_action(f"{action_name}_customprop")
+        self.target.animation_data.action = self.custom_prop_action
 
+        # allocate the custom property curves in bulk too, rather than with one keyframe_insert per frame
         for custom_prop in self.custom_props:
-            datapath = f"[\"{custom_prop}\"]"
-            for i in range(num_frames):
-                self.target.keyframe_insert(datapath,frame=i)
-            self.custom_prop_fcurves += [fc for fc in self.target.animation_data.action.fcurves if fc.data_path == datapath]
+            self.custom_prop_fcurves += [ LiveLinkTarget.create_fcurve(self.custom_prop_action, f"[\"{custom_prop}\"]", num_frames) ]
+
+        self.mark_all_dirty()
+
+    '''
+    Find the action with the given name, or create it (marked as a LiveLinkFace action) if there is none.
+    '''
+    @staticmethod
+    def get_or_create_action(name):
+        try:
+            return bpy.data.actions[name]
+        except: 
+            action = bpy.data.actions.new(name)
+            action["livelinkface"] = True
+            return action
+
+    '''
+    If [anim_data] has an active action that wasn't created by LiveLinkFace, move it to an NLA track of its own (unless one already plays it) and clear the active action.
+    '''
+    @staticmethod
+    def push_user_action(anim_data):
+        action = anim_data.action
+        if action is None or action.get("livelinkface") is not None:
+            return
+        if not any(strip.action == action for track in anim_data.nla_tracks for strip in track.strips):
+            track = anim_data.nla_tracks.new()
+            track.name = action.name
+            track.strips.new(action.name, int(action.frame_range[0]), action)
+        anim_data.action = None
+
+    '''
+    Find or create the fcurve for [datapath] in [action], with exactly [num_frames] keyframe points allocated (the points are filled in by update_keyframes).
+    An existing curve with a different number of points is recreated.
+    '''
+    @staticmethod
+    def create_fcurve(action, datapath, num_frames):
+        fc = action.fcurves.find(datapath)
+        if fc is not None and len(fc.keyframe_points) != num_frames:
+            action.fcurves.remove(fc)
+            fc = None
+        if fc is None:
+            print(f"Creating fcurve for {datapath}")
+            fc = action.fcurves.new(datapath)
+            fc.extrapolation="CONSTANT"                
+            fc.keyframe_points.add(count=num_frames)
+        else:
+            print(f"Found fcurve for {datapath}")
+        return fc
     
     # this method actually sets the keyframe values via bpy
+    # only curves that changed since the last call are uploaded (and only the changed keyframe points, if few enough frames have changed)
     def update_keyframes(self):
         # a bit slow to use bpy.context.object.data.shape_keys.keyframe_insert(datapath,frame=frame)
         # (where datapath is something like 'key_blocks["MouthOpen"].value') 
         # better to add a new fcurve for each shape key then set the points in one go        
+        if self.dirty_start == -1:
+            return
+        self.upload_curves(self.sk_fcurves, self.sk_frame_data, self.sk_dirty, self.sk_action)
+        self.upload_curves(self.custom_prop_fcurves, self.custom_prop_framedata, self.custom_prop_dirty, self.custom_prop_action)
+        self.sk_dirty[:] = False
+        self.custom_prop_dirty[:] = False
+        self.dirty_start = self.dirty_end = -1
 
-        for i_sk,fc in enumerate(self.sk_fcurves):
-            fc.keyframe_points.foreach_set('co',self.sk_frame_data[i_sk])
-            fc.update()
-            
-        for i_b,fc, in enumerate(self.custom_prop_fcurves):
-            fc.keyframe_points.foreach_set('co',self.custom_prop_framedata[i_b])
+    def upload_curves(self, fcurves, frame_data, dirty, action):
+        start, end = self.dirty_start, self.dirty_end
+        partial = end - start < PARTIAL_UPLOAD_FRAMES
+        # each row of the keyframe store is already a contiguous float32 buffer of (frame, weight) pairs, so flatten (without copying) and pass it straight through
+        co = frame_data.reshape(len(frame_data), -1)
+        for i in np.flatnonzero(dirty[:len(fcurves)]).tolist():
+            fc = fcurves[i]
+            if len(fc.keyframe_points) != self.num_frames:
+                # the curve has been decimated, so it needs all its points back before it can take per-frame values again
+                fc = fcurves[i] = LiveLinkTarget.create_fcurve(action, fc.data_path, self.num_frames)
+                fc.keyframe_points.foreach_set('co',co[i])
+            elif partial:
+                keyframe_points = fc.keyframe_points
+                for frame in range(start, end + 1):
+                    keyframe_points[frame].co = frame_data[i, frame].tolist()
+            else:
+                fc.keyframe_points.foreach_set('co',co[i])
             fc.update()
+
+    '''
+    Reduce the keyframes on every curve to those needed to reproduce it, with linear interpolation, to within [tolerance] (see decimate.simplify_mask).
+    Only the first [num_frames] frames are kept (defaults to all of them, pass the number of frames actually recorded to trim a stream).
+    The keyframe store is left untouched, so setting frame values afterwards restores the full curves.
+    Returns the number of keyframes kept and the number there were before.
+    '''
+    def decimate(self, tolerance, num_frames=None):
+        if num_frames is None:
+            num_frames = self.num_frames
+        kept = total = 0
+        for fcurves, frame_data, action in ((self.sk_fcurves, self.sk_frame_data, self.sk_action), 
+                                           (self.custom_prop_fcurves, self.custom_prop_framedata, self.custom_prop_action)):
+            if len(fcurves) == 0:
+                continue
+            keys = frame_data[:len(fcurves), :num_frames]
+            mask = simplify_mask(keys[:, :, 1], tolerance, self.key_frames[:num_frames])
+            # every kept keyframe is linear, set through foreach_set like co (1 is 'LINEAR' in Blender's interpolation enum)
+            linear = np.ones(keys.shape[1], dtype=np.int32)
+            for i, fc in enumerate(fcurves):
+                co = np.ascontiguousarray(keys[i][mask[i]])
+                datapath = fc.data_path
+                action.fcurves.remove(fc)
+                fc = fcurves[i] = action.fcurves.new(datapath)
+                fc.extrapolation="CONSTANT"
+                fc.keyframe_points.add(count=len(co))
+                fc.keyframe_points.foreach_set('co',co.reshape(-1))
+                fc.keyframe_points.foreach_set('interpolation',linear[:len(co)])
+                fc.update()
+            kept += int(mask.sum())
+            total += mask.size
+        if total > 0:
+            print(f"Reduced {total} keyframes to {kept} ({100 * kept / total:.1f}%)")
+        return kept, total
        
+    '''
+    Poses the target at frame [frame] of the keyframe store by writing the shape key weights/custom properties directly (no fcurves are touched).
+    '''
     def update_to_frame(self, frame=0):
-        self.target.data.shape_keys.key_blocks.foreach_set("value", self.sk_frames[frame])        
+        if len(self.sk_frame_data) > 0:
+            self.sk_values[:] = self.sk_frame_data[:, frame, 1]
+            self.target.data.shape_keys.key_blocks.foreach_set("value", self.sk_values)
         for i,custom_prop in enumerate(self.custom_props):
-            self.target[custom_prop] = self.custom_prop_framedata[i][(2*frame)+1]
-        self.target.data.shape_keys.user.update()
+            self.target[custom_prop] = float(self.custom_prop_framedata[i, frame, 1])
+        self.target.data.update()
+
+    '''
+    Low-latency live preview: poses the target with [values] (indexed by ARKit blendshape-id, i.e. a decoded packet) by writing the shape key weights and custom properties directly.
+    Unlike set_frame_values/update_keyframes, this doesn't need an action and never touches fcurves, so the pose is visible as soon as Blender redraws.
+    '''
+    def set_live_values(self, values):
+        self.check_channels()
+        values = np.asarray(values)
+        if len(self.sk_indices) > 0:
+            self.sk_values[self.sk_indices] = values[self.sk_channels]
+            self.target.data.shape_keys.key_blocks.foreach_set("value", self.sk_values)
+        for i_b, val in zip(self.custom_prop_indices.tolist(), values[self.custom_prop_channels].tolist()):
+            self.target[self.custom_props[i_b]] = val
+        self.target.data.update()
+
+    # the TargetBackend interface (see backends.py), used by the streaming pipeline
+
+    def write_frame(self, frame, values):
+        self.set_frame_values(frame, values)
+
+    def write_take(self, values, start_frame=0):
+        self.set_take_values(values, start_frame)
+
+    def write_live(self, values):
+        self.set_live_values(values)
+
+    def flush(self):
+        self.update_keyframes()
+
+    def finish(self, num_frames, tolerance=0.0):
+        if tolerance > 0:
+            self.decimate(tolerance, num_frames)
+
 
 class LiveLinkFaceServer:
 
-    def __init__(self, targets, record, host, udp_port):
+    '''
+    Receives LiveLinkFace streams on [host]:[udp_port] and feeds them, from a Blender timer, through a LiveLinkFacePipeline (see pipeline.py) that writes to a LiveLinkTarget per target object.
+    If [threaded] is True, packets are received on a background thread (LiveLinkFaceReceiver) into a preallocated ring buffer, and the timer only drains and applies what has arrived.
+    This means packets aren't lost to kernel buffer overflows while Blender's main thread is blocked (file saves, heavy depsgraph evaluation, modal operators).
+    Packets that arrive while the ring is full are counted in ring.overruns.
+    If recording and [tolerance] is greater than zero, the recorded keyframes are decimated to that tolerance when the server is closed.
+    If a [filter] (see filters.py) is given, every received frame is passed through it, in the order received, before being applied (each device gets its own copy).
+    Several devices can stream to the same port. [routes] maps a device id or subject name to the target objects it drives (recorded into actions named after the key); devices without a route drive [targets].
+    Each device keeps its own state (see pipeline.DeviceState) in [devices], so frames are numbered from the device's own first frame.
+    If [latency] is greater than zero, each device's packets are held in a JitterBuffer for that many seconds and applied in frame order, with short gaps interpolated and late/duplicate packets dropped.
+    If a frame [rate] (e.g. the scene's) is given, recorded frames are resampled from the device's frame rate (and sub-frames) onto that rate (see timing.py); otherwise every device frame is keyed on its own frame.
+    Packet counts, drops (including kernel buffer overflows, where the platform reports them), socket errors, per-tick timings and latency are kept in [metrics] (see metrics.py) and shown in the LiveLinkFace panel.
+    '''
+    def __init__(self, targets, record, host, udp_port, threaded=False, tolerance=0.0, filter=None, routes=None, latency=0.0, rate=None):
         self.record = record
-        self.start_frame = -1
         self.listening = False
         self.host = host
         self.port = udp_port
-        self.targets = [ LiveLinkTarget(x,num_frames=3600,action_name=f"LiveLinkFace") for x in targets ]
+        # when recording, frames are keyed into a preallocated action
+        # otherwise (live preview) the incoming weights are written straight to the shape keys/custom properties, so no action is needed
+        self.num_frames = 3600 if record else 0
+        self.pipeline = LiveLinkFacePipeline(
+            [ self.create_target(x, "LiveLinkFace") for x in targets ], record, self.num_frames, tolerance, filter, 
+            { key : [ self.create_target(x, f"LiveLinkFace_{key}") for x in objects ] for key, objects in (routes or {}).items() }, 
+            latency, rate)
+
+        # preallocated receive buffer (one MAX_PACKET_SIZE slot per packet in a batch), reused on every tick
+        self.packets = bytearray(MAX_PACKET_SIZE * MAX_BATCH_SIZE)
+        self.packet_slots = [ memoryview(self.packets)[i*MAX_PACKET_SIZE:(i+1)*MAX_PACKET_SIZE] for i in range(MAX_BATCH_SIZE) ]
+
+        self.ring = PacketRingBuffer() if threaded else None
+        self.receiver = None
+        self.last_redraw = 0.0
         
         bpy.app.timers.register(self.read_from_socket)
         self.create_socket()
         print(f"Ready to receive network stream on {self.host}:{self.port}")
     
+    def create_target(self, obj, action_name):
+        return LiveLinkTarget(obj, num_frames=self.num_frames, action_name=action_name if self.record else None)
+
+    @property
+    def targets(self):
+        return self.pipeline.targets
+
+    @property
+    def routes(self):
+        return self.pipeline.routes
+
+    @property
+    def devices(self):
+        return self.pipeline.devices
+
+    @property
+    def frames_recorded(self):
+        return self.pipeline.frames_recorded
+
+    @property
+    def metrics(self):
+        return self.pipeline.metrics
+
+    '''
+    Every LiveLinkTarget the server can drive, routed or not.
+    '''
+    def all_targets(self):
+        return self.pipeline.all_targets()
+
     def isListening(self):
         return self.listening
 
     def listen(self):
         self.listening = True
-        self.start_frame = -1
+        self.pipeline.reset()
+        self.metrics.reset()
+        if self.ring is not None and self.receiver is None:
+            # packets left over from the last session must not start the new one
+            self.ring.clear()
+            self.receiver = LiveLinkFaceReceiver(self.sock, self.ring)
+            self.receiver.start()
 
     def stopListening(self):
         self.listening = False;
+        if self.receiver is not None:
+            self.receiver.stop()
+            self.receiver = None
 
     def create_socket(self):
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         #s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.sock.setblocking(False)
+        if self.ring is not None:
+            # the receiver thread blocks on the socket (with a timeout), and gives the kernel some more room to absorb bursts
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        else:
+            self.sock.setblocking(False)
+        self.count_overflow = enable_overflow_count(self.sock)
         self.sock.bind((self.host, self.port)) 
                                                 
     def read_from_socket(self):
@@ -259,42 +722,81 @@ class LiveLinkFaceServer:
         interval = 1 / 60
         frame = None
         try:
-            # continue reading from the socket until the buffer is drained
+            # continue reading from the socket until the buffer is drained, decoding whatever has queued up in batches
             while True:
-                data, addr = self.sock.recvfrom(312) 
-                success, live_link_face = PyLiveLinkFace.decode(data)
-                if success:
-                    if self.start_frame == -1:
-                        self.start_frame = live_link_face._frames
-                    if self.record:
-                        frame = live_link_face._frames - self.start_frame
-                    else:
-                        frame = 0
-                    for t in self.targets:
-                        for i in range(len(FaceBlendShape)):
-                            val = live_link_face.get_blendshape(FaceBlendShape(i))
-                            t.set_frame_value(i, frame, val)
-        except socket.error as e:
-            pass
+                if self.ring is not None:
+                    datagrams, timestamps = self.ring.read(MAX_BATCH_SIZE)
+                else:
+                    datagrams, timestamps = self.drain_socket(), None
+                try:
+                    self.pipeline.receive(datagrams, timestamps)
+                finally:
+                    if self.ring is not None:
+                        self.ring.release(len(datagrams))
+                if len(datagrams) < MAX_BATCH_SIZE:
+                    break
+            # write what the jitter buffers release and upload the new keyframes
+            frame = self.pipeline.tick()
         except Exception as e:
+            self.metrics.error(e)
             print(traceback.format_exc())
             print(e)
-        if frame is not None:
-            if self.record:
-                bpy.context.scene.frame_current = frame 
-            else:
-                bpy.context.scene.frame_current = 0 
-            for t in self.targets:
-                t.update_keyframes()
+        if self.receiver is not None:
+            self.metrics.ring_overruns = self.ring.overruns
+            self.metrics.kernel_drops = self.receiver.kernel_drops
+        if frame is not None and self.record:
+            bpy.context.scene.frame_current = frame 
+        self.redraw_panel()
            
         return interval
-    
+
+    '''
+    Redraw the 3D views (where the LiveLinkFace panel is) about once a second, so the metrics it shows stay live.
+    '''
+    def redraw_panel(self):
+        now = time.monotonic()
+        if now - self.last_redraw < 1.0:
+            return
+        self.last_redraw = now
+        try:
+            for window in bpy.context.window_manager.windows:
+                for area in window.screen.areas:
+                    if area.type == "VIEW_3D":
+                        area.tag_redraw()
+        except AttributeError:
+            # no UI (e.g. running in the background)
+            pass
+
+    '''
+    Read every packet currently queued on the (non-blocking) socket, up to MAX_BATCH_SIZE, into the preallocated packet slots.
+    Returns a list of memoryviews over the received bytes.
+    Socket errors (other than there being nothing left to read) are counted in the metrics.
+    '''
+    def drain_socket(self):
+        datagrams = []
+        try:
+            for slot in self.packet_slots:
+                if self.count_overflow:
+                    nbytes, dropped = recv_into_counting_overflow(self.sock, slot)
+                    if dropped is not None:
+                        self.metrics.kernel_drops = dropped
+                else:
+                    nbytes, addr = self.sock.recvfrom_into(slot)
+                datagrams.append(slot[:nbytes])
+        except BlockingIOError:
+            pass
+        except socket.error as e:
+            self.metrics.error(e)
+        return datagrams
+
     def close(self):
+        self.stopListening()
+        self.pipeline.close()
         try:
-            bpy.app.timers.unregister(self.handle_data)
+            if bpy.app.timers.is_registered(self.read_from_socket):
+                bpy.app.timers.unregister(self.read_from_socket)
         except:
             print("Failed to unregister timer")
             pass
         self.sock.close()
-        self.start_frame = 0
        
@@ -0,0 +1,102 @@
+"""Tolerance-based keyframe reduction for dense per-frame animation curves.
+
+simplify_mask is a Ramer-Douglas-Peucker style simplification: starting from
+the first and last key of every curve, the key that deviates most from the
+straight line between its kept neighbours is kept, until no key deviates by
+more than the tolerance. Deviation is measured vertically (in value units),
+which is what matters for weights evaluated per frame, so curves rebuilt from
+the kept keys with linear interpolation stay within the tolerance of the
+original everywhere.
+
+Rather than recursing per segment, every iteration splits all open segments
+(those not yet known to be within tolerance) of a block of curves at once,
+with a handful of NumPy operations over just the keys inside them, so an
+iteration costs less as the work left shrinks. Curves are processed
+CHUNK_KEYS keys at a time, so the working arrays stay in cache however many
+curves there are.
+"""
+import numpy as np
+
+# about how many keys are simplified together (whole curves at a time)
+CHUNK_KEYS = 1 << 17
+
+
+def simplify_mask(values: np.ndarray, tolerance: float, times: np.ndarray = None) -> np.ndarray:
+    """ Returns a boolean mask of the keys to keep.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        (n_curves, n_keys) key values, or a single (n_keys,) curve.
+    tolerance : float
+        Maximum allowed deviation of the simplified curve from the original.
+    times : np.ndarray
+        (n_keys,) key times shared by every curve (defaults to 0..n_keys-1).
+
+    Returns
+    -------
+    np.ndarray
+        Boolean mask with the same shape as values.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    single = values.ndim == 1
+    values = np.atleast_2d(values)
+    n_curves, n_keys = values.shape
+    if times is None:
+        times = np.arange(n_keys, dtype=np.float64)
+    times = np.asarray(times, dtype=np.float64)
+
+    keep = np.zeros(values.shape, dtype=bool)
+    if n_keys > 0:
+        keep[:, 0] = keep[:, -1] = True
+    if n_keys > 2:
+        chunk = max(1, CHUNK_KEYS // n_keys)
+        for start in range(0, n_curves, chunk):
+            _simplify(values[start:start + chunk], times, tolerance, keep[start:start + chunk])
+    return keep[0] if single else keep
+
+
+def _simplify(values: np.ndarray, times: np.ndarray, tolerance: float, keep: np.ndarray) -> None:
+    """ Marks the keys of the (n_curves, n_keys > 2) values to keep in keep,
+    whose first and last columns are already set. """
+    n_curves, n_keys = values.shape
+    # the open segments, in order: the (time, value) of the kept keys at
+    # either end and the number of keys between them
+    t0, t1 = np.full(n_curves, times[0]), np.full(n_curves, times[-1])
+    v0, v1 = values[:, 0].copy(), values[:, -1].copy()
+    counts = np.full(n_curves, n_keys - 2)
+    # the keys inside them, in the same order, as flat (curve * n_keys + key)
+    # indices with their times and values
+    pending = np.flatnonzero(~keep)
+    t = np.tile(times[1:-1], n_curves)
+    v = values[:, 1:-1].ravel()
+
+    while len(pending) > 0:
+        span = t1 - t0
+        slope = (v1 - v0) / np.where(span > 0, span, 1.0)
+        error = np.abs(v - np.repeat(v0 - t0 * slope, counts) - t * np.repeat(slope, counts))
+
+        starts = np.cumsum(counts) - counts
+        max_error = np.maximum.reduceat(error, starts)
+        split = max_error > tolerance
+
+        # segments that are still out of tolerance keep their (first) worst
+        # key and are split there, every other segment is done
+        is_max = np.flatnonzero(error == np.repeat(max_error, counts))
+        worst = is_max[np.searchsorted(is_max, starts[split])]
+        keep.ravel()[pending[worst]] = True
+        left = worst - starts[split]
+        right = counts[split] - left - 1
+        still_open = np.repeat(split, counts)
+        still_open[worst] = False
+        tw, vw = t[worst], v[worst]
+        pending, t, v = pending[still_open], t[still_open], v[still_open]
+
+        # each split segment becomes its left and right halves, empty halves are dropped
+        t0 = np.stack([t0[split], tw], axis=1).ravel()
+        t1 = np.stack([tw, t1[split]], axis=1).ravel()
+        v0 = np.stack([v0[split], vw], axis=1).ravel()
+        v1 = np.stack([vw, v1[split]], axis=1).ravel()
+        counts = np.stack([left, right], axis=1).ravel()
+        nonempty = counts > 0
+        t0, t1, v0, v1, counts = t0[nonempty], t1[nonempty], v0[nonempty], v1[nonempty], counts[nonempty]
@@ -0,0 +1,376 @@
+"""A lightweight stand-in for the parts of ``bpy`` the add-on uses.
+
+    from livelinkface import fakebpy
+    bpy = fakebpy.install()
+    obj = fakebpy.make_object("Face")      # every ARKit shape key
+    import livelinkface.bpylivelinkface as llf
+
+This lets the streaming and import code (bpylivelinkface.py) run, be
+benchmarked and profiled on plain CPython without Blender. It only covers
+what the add-on calls: shape key blocks, custom properties, actions with
+fcurves and keyframe points, animation data (with NLA tracks), the scene and app timers.
+
+Bulk accessors (foreach_set/foreach_get) copy through NumPy, as Blender
+copies through the buffer protocol, so their cost scales with the amount of
+data rather than being dominated by Python, and per-item access (a keyframe
+point's co, a key block's value) goes through small proxy objects, as it does
+through Blender's RNA. Timings are a guide to how the add-on's own code
+scales, not a prediction of Blender's absolute speed.
+"""
+import sys
+import types
+import numpy as np
+
+from livelinkface.pylivelinkface import LIVE_LINK_FACE_HEADER
+
+ARKIT_SHAPE_KEYS = LIVE_LINK_FACE_HEADER[2:54]
+# keyframe interpolation modes, in the order of Blender's enum (foreach_set/foreach_get use the index)
+INTERPOLATION_MODES = ("CONSTANT", "LINEAR", "BEZIER")
+
+
+class IDProperties:
+    """Custom properties (obj["name"]) of an ID."""
+
+    def __init__(self) -> None:
+        self._props = {}
+
+    def __getitem__(self, key):
+        return self._props[key]
+
+    def __setitem__(self, key, value) -> None:
+        self._props[key] = value
+
+    def __contains__(self, key) -> bool:
+        return key in self._props
+
+    def get(self, key, default=None):
+        return self._props.get(key, default)
+
+    def keys(self):
+        return list(self._props.keys())
+
+
+class NlaStrip:
+    def __init__(self, name: str, start: int, action) -> None:
+        self.name = name
+        self.frame_start = float(start)
+        self.action = action
+
+
+class NlaStrips(list):
+    def new(self, name: str, start: int, action) -> NlaStrip:
+        strip = NlaStrip(name, start, action)
+        self.append(strip)
+        return strip
+
+
+class NlaTrack:
+    def __init__(self) -> None:
+        self.name = "NlaTrack"
+        self.strips = NlaStrips()
+
+
+class NlaTracks(list):
+    def new(self) -> NlaTrack:
+        track = NlaTrack()
+        self.append(track)
+        return track
+
+
+class AnimData:
+    def __init__(self) -> None:
+        self.action = None
+        self.nla_tracks = NlaTracks()
+
+
+class ID(IDProperties):
+    def __init__(self, name: str = "") -> None:
+        super().__init__()
+        self.name = name
+        self.animation_data = None
+
+    def animation_data_create(self) -> AnimData:
+        if self.animation_data is None:
+            self.animation_data = AnimData()
+        return self.animation_data
+
+
+class KeyframePoint:
+    """A view of one point in KeyframePoints."""
+
+    def __init__(self, points: "KeyframePoints", index: int) -> None:
+        self._points = points
+        self._index = index
+
+    @property
+    def co(self):
+        return tuple(self._points._co[self._index].tolist())
+
+    @co.setter
+    def co(self, value) -> None:
+        self._points._co[self._index] = value
+
+    @property
+    def interpolation(self) -> str:
+        return INTERPOLATION_MODES[self._points._interpolation[self._index]]
+
+    @interpolation.setter
+    def interpolation(self, value: str) -> None:
+        self._points._interpolation[self._index] = INTERPOLATION_MODES.index(value)
+
+
+class KeyframePoints:
+    def __init__(self) -> None:
+        self._co = np.zeros((0, 2), dtype=np.float32)
+        self._interpolation = np.zeros(0, dtype=np.int32)
+
+    def __len__(self) -> int:
+        return len(self._co)
+
+    def __getitem__(self, index: int) -> KeyframePoint:
+        if index < 0:
+            index += len(self._co)
+        if not 0 <= index < len(self._co):
+            raise IndexError("keyframe point index out of range")
+        return KeyframePoint(self, index)
+
+    def __iter__(self):
+        return (KeyframePoint(self, i) for i in range(len(self._co)))
+
+    def add(self, count: int = 1) -> None:
+        self._co = np.concatenate([self._co, np.zeros((count, 2), dtype=np.float32)])
+        self._interpolation = np.concatenate([self._interpolation, np.full(count, INTERPOLATION_MODES.index("BEZIER"), dtype=np.int32)])
+
+    def clear(self) -> None:
+        self._co = self._co[:0]
+        self._interpolation = self._interpolation[:0]
+
+    def foreach_set(self, attr: str, seq) -> None:
+        target = self._co if attr == "co" else self._interpolation
+        values = np.asarray(seq, dtype=target.dtype).reshape(-1)
+        if len(values) != target.size:
+            raise RuntimeError(f"foreach_set: expected {target.size} values for {attr}, got {len(values)}")
+        target.reshape(-1)[:] = values
+
+    def foreach_get(self, attr: str, seq) -> None:
+        source = self._co if attr == "co" else self._interpolation
+        np.asarray(seq).reshape(-1)[:] = source.reshape(-1)
+
+
+class FCurve:
+    def __init__(self, data_path: str, index: int = 0, action_group: str = "") -> None:
+        self.data_path = data_path
+        self.array_index = index
+        self.group = action_group
+        self.extrapolation = "CONSTANT"
+        self.keyframe_points = KeyframePoints()
+        self.updates = 0
+
+    def update(self) -> None:
+        self.updates += 1
+
+    def evaluate(self, frame: float) -> float:
+        co = self.keyframe_points._co
+        if len(co) == 0:
+            return 0.0
+        return float(np.interp(frame, co[:, 0], co[:, 1]))
+
+
+class FCurves(list):
+    def new(self, data_path: str, index: int = 0, action_group: str = "") -> FCurve:
+        if self.find(data_path, index) is not None:
+            raise RuntimeError(f"F-Curve '{data_path}' already exists in action")
+        fcurve = FCurve(data_path, index, action_group)
+        self.append(fcurve)
+        return fcurve
+
+    def find(self, data_path: str, index: int = 0):
+        for fcurve in self:
+            if fcurve.data_path == data_path and fcurve.array_index == index:
+                return fcurve
+        return None
+
+
+class Action(ID):
+    def __init__(self, name: str) -> None:
+        super().__init__(name)
+        self.fcurves = FCurves()
+        self.use_fake_user = False
+
+    @property
+    def frame_range(self):
+        keyed = [fcurve.keyframe_points._co[:, 0] for fcurve in self.fcurves if len(fcurve.keyframe_points)]
+        if not keyed:
+            return (0.0, 1.0)
+        frames = np.concatenate(keyed)
+        return (float(frames.min()), float(frames.max()))
+
+
+class Actions(dict):
+    def new(self, name: str) -> Action:
+        action = self[name] = Action(name)
+        return action
+
+    def remove(self, action: Action) -> None:
+        del self[action.name]
+
+
+class KeyBlock:
+    """A view of one shape key in KeyBlocks."""
+
+    def __init__(self, blocks: "KeyBlocks", index: int, name: str) -> None:
+        self._blocks = blocks
+        self._index = index
+        self._name = name
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @name.setter
+    def name(self, value: str) -> None:
+        del self._blocks._index[self._name]
+        self._blocks._index[value] = self._index
+        self._name = value
+
+    @property
+    def value(self) -> float:
+        return float(self._blocks._values[self._index])
+
+    @value.setter
+    def value(self, value: float) -> None:
+        self._blocks._values[self._index] = value
+
+    def path_from_id(self) -> str:
+        return f'key_blocks["{self.name}"]'
+
+
+class KeyBlocks:
+    def __init__(self, names) -> None:
+        self._blocks = [KeyBlock(self, i, name) for i, name in enumerate(names)]
+        self._index = {name: i for i, name in enumerate(names)}
+        self._values = np.zeros(len(self._blocks), dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self._blocks)
+
+    def __getitem__(self, key) -> KeyBlock:
+        if isinstance(key, str):
+            return self._blocks[self._index[key]]
+        return self._blocks[key]
+
+    def __iter__(self):
+        return iter(self._blocks)
+
+    def find(self, name: str) -> int:
+        return self._index.get(name, -1)
+
+    def keys(self):
+        return [block.name for block in self._blocks]
+
+    def foreach_set(self, attr: str, seq) -> None:
+        if attr != "value":
+            raise AttributeError(attr)
+        values = np.asarray(seq, dtype=np.float32).reshape(-1)
+        if len(values) != len(self._values):
+            raise RuntimeError(f"foreach_set: expected {len(self._values)} values, got {len(values)}")
+        self._values[:] = values
+
+    def foreach_get(self, attr: str, seq) -> None:
+        if attr != "value":
+            raise AttributeError(attr)
+        np.asarray(seq).reshape(-1)[:] = self._values
+
+
+class ShapeKeys(ID):
+    def __init__(self, user, names) -> None:
+        super().__init__("Key")
+        self.user = user
+        self.key_blocks = KeyBlocks(names)
+
+
+class Mesh(ID):
+    def __init__(self, name: str = "Mesh") -> None:
+        super().__init__(name)
+        self.shape_keys = None
+        self.updates = 0
+
+    def update(self) -> None:
+        self.updates += 1
+
+
+class Object(ID):
+    def __init__(self, name: str, data: Mesh = None) -> None:
+        super().__init__(name)
+        self.data = data if data is not None else Mesh(name)
+
+
+class Render:
+    fps = 60
+    fps_base = 1.0
+
+
+class Scene(ID):
+    def __init__(self) -> None:
+        super().__init__("Scene")
+        self.frame_current = 0
+        self.render = Render()
+        self.invert_lr_mouth = False
+
+
+class Timers:
+    """bpy.app.timers. Registered functions are only called by run()."""
+
+    def __init__(self) -> None:
+        self._functions = []
+
+    def register(self, function, first_interval: float = 0, persistent: bool = False) -> None:
+        if function not in self._functions:
+            self._functions.append(function)
+
+    def unregister(self, function) -> None:
+        self._functions.remove(function)
+
+    def is_registered(self, function) -> bool:
+        return function in self._functions
+
+    def run(self) -> None:
+        """ Calls every registered function once, as one timer tick,
+        unregistering those that return None. """
+        for function in list(self._functions):
+            if function() is None and function in self._functions:
+                self._functions.remove(function)
+
+
+def make_object(name: str = "Face", shape_keys=ARKIT_SHAPE_KEYS, custom_props=()) -> Object:
+    """ Creates a mesh object with a "Basis" shape key followed by the given
+    shape keys (None for no shape keys at all) and custom properties. """
+    obj = Object(name)
+    if shape_keys is not None:
+        obj.data.shape_keys = ShapeKeys(obj.data, ["Basis"] + list(shape_keys))
+    for prop in custom_props:
+        obj[prop] = 0.0
+    return obj
+
+
+def install() -> types.ModuleType:
+    """ Returns bpy, installing the stand-in as the bpy module first unless
+    one (real or fake) has already been imported. """
+    if "bpy" in sys.modules:
+        return sys.modules["bpy"]
+    bpy = types.ModuleType("bpy")
+    bpy.data = types.SimpleNamespace(actions=Actions(), objects={})
+    bpy.context = types.SimpleNamespace(scene=Scene())
+    bpy.app = types.SimpleNamespace(timers=Timers())
+    bpy.is_fake = True
+    sys.modules["bpy"] = bpy
+    return bpy
+
+
+def reset() -> None:
+    """ Clears the fake bpy's data (actions) and scene. """
+    bpy = sys.modules["bpy"]
+    if not getattr(bpy, "is_fake", False):
+        raise RuntimeError("Only the fake bpy can be reset")
+    bpy.data.actions.clear()
+    bpy.context.scene = Scene()
@@ -0,0 +1,193 @@
+"""Real-time smoothing filters over whole blendshape frames.
+
+Every filter keeps its state in NumPy arrays with one entry per channel and
+filters a complete frame (all channels) with a few vector operations, so
+smoothing a 61 channel frame costs microseconds rather than a Python-level
+computation per channel. Parameters can be a scalar (the same for every
+channel) or one value per channel, e.g. to smooth the eyes less than the
+brows.
+
+    update(values, channels=None)   filters one frame (or just some channels)
+    process(values)                 filters (N, channels) frames in order,
+                                    continuing from the current state
+    reset()                         forgets the history
+
+The same filter objects are used for the live stream (one frame, or one
+batch of packets, at a time) and for offline imports (a whole take passed to
+process on a fresh filter).
+"""
+import math
+import numpy as np
+
+FILTER_NONE = "none"
+FILTER_AVERAGE = "average"
+FILTER_EXPONENTIAL = "exponential"
+FILTER_ONE_EURO = "one_euro"
+
+# the number of ARKit blendshapes in a LiveLinkFace frame
+DEFAULT_CHANNELS = 61
+
+
+def _per_channel(value, channels: int, dtype=np.float64) -> np.ndarray:
+    """ Broadcasts a scalar or per-channel parameter to a (channels,) array. """
+    return np.array(np.broadcast_to(np.asarray(value, dtype=dtype), (channels,)))
+
+
+class Filter:
+    """Base class of the filters; passes frames through unchanged."""
+
+    def __init__(self, channels: int = DEFAULT_CHANNELS) -> None:
+        self.channels = channels
+
+    def reset(self) -> None:
+        pass
+
+    def update(self, values, channels=None) -> np.ndarray:
+        """ Filters one frame. values is a (channels,) array, or the values
+        of just the given channels (an index, slice or index array), which
+        leaves the state of every other channel untouched. Returns the
+        filtered values, in the same shape. """
+        return np.array(values, dtype=np.float64)
+
+    def process(self, values) -> np.ndarray:
+        """ Filters (N, channels) frames, oldest first. Returns a (N, channels)
+        float64 array. """
+        values = np.asarray(values, dtype=np.float64)
+        out = np.empty(values.shape, dtype=np.float64)
+        for k in range(len(values)):
+            out[k] = self.update(values[k])
+        return out
+
+
+class MovingAverageFilter(Filter):
+    """Mean of the last ``size`` values of every channel.
+
+    The history is a (max size, channels) ring with one write position per
+    channel, so single channels can be updated on their own and every channel
+    can have its own window size. Until a channel has seen ``size`` values,
+    the mean is over the values seen so far.
+    """
+
+    def __init__(self, size=5, channels: int = DEFAULT_CHANNELS) -> None:
+        super().__init__(channels)
+        self.size = _per_channel(size, channels, np.int64)
+        if np.any(self.size < 1):
+            raise ValueError("The moving average size must be at least 1")
+        self._history = np.zeros((int(self.size.max()), channels), dtype=np.float64)
+        self._position = np.zeros(channels, dtype=np.int64)
+        self._count = np.zeros(channels, dtype=np.int64)
+        self._columns = np.arange(channels)
+
+    def reset(self, initial=None) -> None:
+        """ Forgets the history. If initial values are given, they are kept
+        as the first value of every channel's window. """
+        self._history[:] = 0
+        self._position[:] = 0
+        self._count[:] = 0
+        if initial is not None:
+            self.update(initial)
+
+    def update(self, values, channels=None) -> np.ndarray:
+        columns = self._columns if channels is None else self._columns[channels]
+        position = self._position[columns]
+        self._history[position, columns] = values
+        self._position[columns] = (position + 1) % self.size[columns]
+        count = np.minimum(self._count[columns] + 1, self.size[columns])
+        self._count[columns] = count
+        # slots past a channel's window size are never written, so stay zero
+        return self._history[:, columns].sum(axis=0) / count
+
+
+class ExponentialFilter(Filter):
+    """Exponential smoothing, y += alpha * (x - y). An alpha of 1 passes
+    values through unchanged; smaller values smooth more."""
+
+    def __init__(self, alpha=0.5, channels: int = DEFAULT_CHANNELS) -> None:
+        super().__init__(channels)
+        self.alpha = _per_channel(alpha, channels)
+        if np.any((self.alpha <= 0) | (self.alpha > 1)):
+            raise ValueError("The smoothing factor must be in (0, 1]")
+        self._value = np.zeros(channels, dtype=np.float64)
+        self._initialized = np.zeros(channels, dtype=bool)
+
+    def reset(self) -> None:
+        self._value[:] = 0
+        self._initialized[:] = False
+
+    def update(self, values, channels=None) -> np.ndarray:
+        if channels is None:
+            channels = slice(None)
+        values = np.asarray(values, dtype=np.float64)
+        previous = np.where(self._initialized[channels], self._value[channels], values)
+        value = previous + self.alpha[channels] * (values - previous)
+        self._value[channels] = value
+        self._initialized[channels] = True
+        return value
+
+
+class OneEuroFilter(Filter):
+    """The 1€ filter (Casiez et al., CHI 2012): a low-pass filter whose cutoff
+    frequency rises with the speed of the signal, so slow movements are
+    smoothed heavily (no jitter) while fast ones are followed closely (little
+    lag).
+
+    min_cutoff is the cutoff frequency (Hz) at rest, beta how quickly it
+    rises with speed and d_cutoff the cutoff used to smooth the speed itself.
+    rate is the number of frames per second, used unless update is given the
+    time since the previous frame.
+    """
+
+    def __init__(self, min_cutoff=1.0, beta=0.0, d_cutoff=1.0, rate: float = 60,
+                    channels: int = DEFAULT_CHANNELS) -> None:
+        super().__init__(channels)
+        self.min_cutoff = _per_channel(min_cutoff, channels)
+        self.beta = _per_channel(beta, channels)
+        self.d_cutoff = _per_channel(d_cutoff, channels)
+        if np.any(self.min_cutoff <= 0) or np.any(self.d_cutoff <= 0):
+            raise ValueError("Cutoff frequencies must be greater than 0")
+        self.rate = rate
+        self._value = np.zeros(channels, dtype=np.float64)
+        self._speed = np.zeros(channels, dtype=np.float64)
+        self._initialized = np.zeros(channels, dtype=bool)
+
+    @staticmethod
+    def _alpha(cutoff, dt: float):
+        return 1.0 / (1.0 + 1.0 / (2 * math.pi * cutoff * dt))
+
+    def reset(self) -> None:
+        self._value[:] = 0
+        self._speed[:] = 0
+        self._initialized[:] = False
+
+    def update(self, values, channels=None, dt: float = None) -> np.ndarray:
+        if channels is None:
+            channels = slice(None)
+        if dt is None or dt <= 0:
+            dt = 1.0 / self.rate
+        values = np.asarray(values, dtype=np.float64)
+        initialized = self._initialized[channels]
+        previous = np.where(initialized, self._value[channels], values)
+        speed = (values - previous) / dt
+        speed = np.where(initialized,
+            self._speed[channels] + self._alpha(self.d_cutoff[channels], dt) * (speed - self._speed[channels]), 0.0)
+        cutoff = self.min_cutoff[channels] + self.beta[channels] * np.abs(speed)
+        value = previous + self._alpha(cutoff, dt) * (values - previous)
+        self._value[channels] = value
+        self._speed[channels] = speed
+        self._initialized[channels] = True
+        return value
+
+
+def create_filter(kind: str, channels: int = DEFAULT_CHANNELS, size=5, alpha=0.5,
+                    min_cutoff=1.0, beta=0.0, d_cutoff=1.0, rate: float = 60) -> Filter:
+    """ Creates a filter by name (one of the FILTER_ constants), taking only
+    the parameters that apply to it. Returns None for FILTER_NONE. """
+    if kind == FILTER_NONE:
+        return None
+    if kind == FILTER_AVERAGE:
+        return MovingAverageFilter(size, channels)
+    if kind == FILTER_EXPONENTIAL:
+        return ExponentialFilter(alpha, channels)
+    if kind == FILTER_ONE_EURO:
+        return OneEuroFilter(min_cutoff, beta, d_cutoff, rate, channels)
+    raise ValueError(f"Unknown filter {kind}")
@@ -0,0 +1,163 @@
+"""Jitter buffer that puts a LiveLinkFace stream back in frame order.
+
+Over Wi-Fi, UDP packets arrive late, out of order, duplicated or not at all.
+JitterBuffer holds every packet for a fixed latency window after it arrives,
+then releases it together with every older packet, sorted on (frame number,
+sub-frame). Packets that turn up after a newer one has been released are too
+late to be used and are dropped, as are duplicates.
+
+Short runs of missing frames (up to max_gap) are filled in by linear
+interpolation between the frames either side; longer ones are counted as
+lost. Sorting and gap filling work on whole batches of packets with NumPy,
+so the cost per packet stays small however many are buffered.
+"""
+import time
+from typing import NamedTuple
+import numpy as np
+
+
+class BufferedFrames(NamedTuple):
+    """ Frames released by JitterBuffer.pop, in order. """
+    frames: np.ndarray          # (N,) int64 frame numbers
+    sub_frames: np.ndarray      # (N,) float32 sub-frames
+    values: np.ndarray          # (N, channels) float32 weights
+    interpolated: np.ndarray    # (N,) bool, True for frames filled in by interpolation
+
+
+class JitterBuffer:
+    """Reorders packets on (frame, sub-frame), releasing each one latency
+    seconds after it arrived.
+
+    Counters: ``received``, ``duplicates`` (same frame and sub-frame as a
+    packet already held or just released), ``late`` (older than a packet
+    already released), ``interpolated`` (missing frames filled in) and
+    ``lost`` (missing frames in gaps longer than max_gap).
+    """
+
+    def __init__(self, latency: float = 0.1, max_gap: int = 4, channels: int = 61) -> None:
+        self.latency = latency
+        self.max_gap = max_gap
+        self.channels = channels
+        self.received = 0
+        self.duplicates = 0
+        self.late = 0
+        self.interpolated = 0
+        self.lost = 0
+        self._keys = np.zeros(0, dtype=np.float64)
+        self._frames = np.zeros(0, dtype=np.int64)
+        self._sub_frames = np.zeros(0, dtype=np.float32)
+        self._values = np.zeros((0, channels), dtype=np.float32)
+        self._arrivals = np.zeros(0, dtype=np.float64)
+        # the last packet released, to order and interpolate against
+        self._last_key = -np.inf
+        self._last_frame = None
+        self._last_values = None
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def push(self, frames, sub_frames, values, arrivals=None) -> None:
+        """ Buffers (N,) packets. arrivals are their time.monotonic() arrival
+        times (defaults to now). """
+        frames = np.asarray(frames, dtype=np.int64)
+        sub_frames = np.asarray(sub_frames, dtype=np.float32)
+        if arrivals is None:
+            arrivals = np.full(len(frames), time.monotonic())
+        self.received += len(frames)
+        keys = frames + sub_frames.astype(np.float64)
+
+        late = keys < self._last_key
+        duplicate = (keys == self._last_key) | np.isin(keys, self._keys)
+        # duplicates within the pushed packets themselves
+        _, first = np.unique(keys, return_index=True)
+        repeated = np.ones(len(keys), dtype=bool)
+        repeated[first] = False
+        duplicate |= repeated
+        self.late += int(np.count_nonzero(late))
+        self.duplicates += int(np.count_nonzero(duplicate & ~late))
+        keep = ~(late | duplicate)
+        if not keep.all():
+            keys, frames, sub_frames, arrivals = keys[keep], frames[keep], sub_frames[keep], np.asarray(arrivals)[keep]
+            values = np.asarray(values)[keep]
+
+        self._keys = np.concatenate([self._keys, keys])
+        self._frames = np.concatenate([self._frames, frames])
+        self._sub_frames = np.concatenate([self._sub_frames, sub_frames])
+        self._values = np.concatenate([self._values, np.asarray(values, dtype=np.float32)])
+        self._arrivals = np.concatenate([self._arrivals, arrivals])
+
+    def pop(self, now: float = None) -> BufferedFrames:
+        """ Releases, in order, every packet that has been held for the
+        latency window along with every older packet, filling short gaps. """
+        if now is None:
+            now = time.monotonic()
+        ready = self._arrivals <= now - self.latency
+        if not ready.any():
+            return self._release(np.zeros(0, dtype=np.intp))
+        newest = self._keys[ready].max()
+        return self._release(np.flatnonzero(self._keys <= newest))
+
+    def flush(self) -> BufferedFrames:
+        """ Releases every packet held, e.g. when the stream stops. """
+        return self._release(np.arange(len(self._keys)))
+
+    def reset(self) -> None:
+        """ Drops every packet held and forgets the last packet released
+        (the counters are kept). """
+        held = np.zeros(0, dtype=np.intp)
+        self._keys, self._frames, self._sub_frames, self._values, self._arrivals = \
+            self._keys[held], self._frames[held], self._sub_frames[held], self._values[held], self._arrivals[held]
+        self._last_key = -np.inf
+        self._last_frame = None
+        self._last_values = None
+
+    def _release(self, rows: np.ndarray) -> BufferedFrames:
+        order = rows[np.argsort(self._keys[rows], kind="stable")]
+        frames = self._frames[order]
+        sub_frames = self._sub_frames[order]
+        values = self._values[order]
+        held = np.ones(len(self._keys), dtype=bool)
+        held[rows] = False
+        self._keys, self._frames, self._sub_frames, self._values, self._arrivals = \
+            self._keys[held], self._frames[held], self._sub_frames[held], self._values[held], self._arrivals[held]
+        if len(order) == 0:
+            return BufferedFrames(frames, sub_frames, values, np.zeros(0, dtype=bool))
+
+        frames, sub_frames, values, interpolated = self._fill_gaps(frames, sub_frames, values)
+        self._last_key = float(frames[-1]) + float(sub_frames[-1])
+        self._last_frame = int(frames[-1])
+        self._last_values = values[-1]
+        return BufferedFrames(frames, sub_frames, values, interpolated)
+
+    def _fill_gaps(self, frames, sub_frames, values):
+        """ Inserts linearly interpolated frames into gaps of up to max_gap
+        frames between consecutive (sorted) frames, including the gap since
+        the last frame released. """
+        if self._last_frame is not None:
+            previous_frames = np.concatenate([[self._last_frame], frames[:-1]])
+            previous_values = np.concatenate([self._last_values[None], values[:-1]])
+            next_frames, next_values = frames, values
+        else:
+            previous_frames, previous_values = frames[:-1], values[:-1]
+            next_frames, next_values = frames[1:], values[1:]
+        missing = np.maximum(next_frames - previous_frames - 1, 0)
+        fill = (missing > 0) & (missing <= self.max_gap)
+        self.lost += int(missing[~fill].sum())
+        if not fill.any():
+            return frames, sub_frames, values, np.zeros(len(frames), dtype=bool)
+
+        counts = missing[fill]
+        self.interpolated += int(counts.sum())
+        # the offset (1..count) of every inserted frame within its gap
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + 1
+        start = np.repeat(previous_frames[fill], counts)
+        weight = (offsets / np.repeat(counts + 1, counts))[:, None]
+        v0 = np.repeat(previous_values[fill], counts, axis=0)
+        v1 = np.repeat(next_values[fill], counts, axis=0)
+
+        frames = np.concatenate([frames, start + offsets])
+        sub_frames = np.concatenate([sub_frames, np.zeros(len(offsets), dtype=np.float32)])
+        values = np.concatenate([values, (v0 + weight * (v1 - v0)).astype(np.float32)])
+        interpolated = np.concatenate([np.zeros(len(frames) - len(offsets), dtype=bool), np.ones(len(offsets), dtype=bool)])
+        order = np.argsort(frames + sub_frames, kind="stable")
+        return frames[order], sub_frames[order], values[order], interpolated[order]
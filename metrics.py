@@ -0,0 +1,169 @@
+"""Live metrics for the streaming pipeline.
+
+When a stream stutters, these tell where the time or the packets went:
+
+- counters of packets ``received``, ``decoded`` and dropped: ``malformed``
+  (not a face packet), ``late`` and ``duplicates`` (dropped by a jitter
+  buffer), ``out_of_order`` (arrived after a newer frame), ``lost`` (gaps in
+  the frame numbers), ``kernel_drops`` (dropped by the kernel because the
+  socket's buffer was full, where the platform reports it),
+  ``ring_overruns`` (dropped by the receiver thread's ring buffer) and
+  ``socket_errors`` (with the ``last_error``);
+- rolling histograms (the last ``window`` samples) of the time each tick
+  spends decoding, applying and flushing, and of the end-to-end ``latency``
+  of each packet: the time it arrived less the time of day of its
+  timecode. The device and this machine have separate clocks, so latency
+  includes any offset between them; it is its changes (and spread) that
+  matter.
+
+    snapshot = pipeline.metrics.snapshot()
+    snapshot["latency"]["p99"], snapshot["malformed"]
+
+Times are in seconds.
+"""
+import time
+from typing import Dict, List
+import numpy as np
+
+COUNTERS = ("received", "decoded", "malformed", "late", "duplicates", "out_of_order", "lost",
+            "interpolated", "kernel_drops", "ring_overruns", "socket_errors", "ticks")
+HISTOGRAMS = ("decode_time", "apply_time", "flush_time", "tick_time", "latency")
+
+_DAY = 24 * 60 * 60
+
+
+def time_of_day(now: float = None) -> float:
+    """ The local time of day (seconds since midnight) of a time.time()
+    reading, as Timecode.from_clock (and the LiveLinkFace app) count it. """
+    if now is None:
+        now = time.time()
+    return (now + time.localtime(now).tm_gmtoff) % _DAY
+
+
+class RollingHistogram:
+    """The last size samples of a measurement, kept in a ring, with their
+    percentiles and histogram computed on demand. ``count`` and ``max``
+    cover every sample since the last reset."""
+
+    def __init__(self, size: int = 1024) -> None:
+        self._samples = np.zeros(size, dtype=np.float64)
+        self.count = 0
+        self.max = 0.0
+
+    def __len__(self) -> int:
+        return min(self.count, len(self._samples))
+
+    def add(self, value: float) -> None:
+        self._samples[self.count % len(self._samples)] = value
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def add_many(self, values) -> None:
+        values = np.asarray(values, dtype=np.float64).reshape(-1)
+        if len(values) == 0:
+            return
+        size = len(self._samples)
+        n = len(values)
+        if n >= size:
+            # only the last size values stay in the window, but every one is counted
+            values = values[-size:]
+            self.count += n - size
+        positions = (self.count + np.arange(len(values))) % size
+        self._samples[positions] = values
+        self.count += len(values)
+        self.max = max(self.max, float(values.max()))
+
+    def samples(self) -> np.ndarray:
+        """ The samples in the window (in ring order, not arrival order). """
+        return self._samples[:len(self)]
+
+    def percentiles(self, qs=(50, 90, 99)) -> List[float]:
+        if len(self) == 0:
+            return [float("nan")] * len(qs)
+        return np.percentile(self.samples(), qs).tolist()
+
+    def histogram(self, bins=10):
+        """ The (counts, bin edges) of the samples in the window. """
+        return np.histogram(self.samples(), bins)
+
+    def summary(self) -> Dict[str, float]:
+        p50, p90, p99 = self.percentiles()
+        samples = self.samples()
+        return { "count": self.count, "mean": float(samples.mean()) if len(samples) else float("nan"),
+                 "p50": p50, "p90": p90, "p99": p99, "max": self.max }
+
+    def reset(self) -> None:
+        self.count = 0
+        self.max = 0.0
+
+
+class PipelineMetrics:
+    """Counters (COUNTERS) and rolling histograms (HISTOGRAMS) of a
+    LiveLinkFacePipeline, as attributes (see the module docstring)."""
+
+    def __init__(self, window: int = 1024) -> None:
+        self.window = window
+        self.reset()
+
+    def reset(self) -> None:
+        for name in COUNTERS:
+            setattr(self, name, 0)
+        for name in HISTOGRAMS:
+            setattr(self, name, RollingHistogram(self.window))
+        self.last_error = None
+        self.started = time.monotonic()
+        self._rate_time = self.started
+        self._rate_received = 0
+        self._rate = 0.0
+
+    def error(self, error: Exception) -> None:
+        """ Counts a socket (or other receive) error. """
+        self.socket_errors += 1
+        self.last_error = f"{type(error).__name__}: {error}"
+
+    def packets_arrived(self, frames, sub_frames, fps, denominators, arrivals=None) -> None:
+        """ Adds the latency of decoded packets (columns of a DecodedBatch).
+        arrivals are their time.monotonic() arrival times (defaults to now). """
+        if len(frames) == 0:
+            return
+        now = time.monotonic()
+        arrived = time_of_day() - (0.0 if arrivals is None else now - np.asarray(arrivals, dtype=np.float64))
+        # timecode frame counts start from 1 (see Timecode.from_clock)
+        sent = (np.asarray(frames, dtype=np.float64) - 1 + sub_frames) * denominators / np.maximum(fps, 1)
+        # the clocks can be either side of midnight
+        self.latency.add_many((arrived - sent + _DAY / 2) % _DAY - _DAY / 2)
+
+    def packets_per_second(self) -> float:
+        """ The rate packets have been received at, over the last second or so. """
+        now = time.monotonic()
+        if now - self._rate_time >= 1.0:
+            self._rate = (self.received - self._rate_received) / (now - self._rate_time)
+            self._rate_time, self._rate_received = now, self.received
+        return self._rate
+
+    def snapshot(self) -> dict:
+        """ Every counter, and a summary (count, mean, p50, p90, p99, max) of
+        every histogram, as a dict. """
+        snapshot = { name: getattr(self, name) for name in COUNTERS }
+        snapshot.update({ name: getattr(self, name).summary() for name in HISTOGRAMS })
+        snapshot["packets_per_second"] = self.packets_per_second()
+        snapshot["last_error"] = self.last_error
+        snapshot["elapsed"] = time.monotonic() - self.started
+        return snapshot
+
+    def lines(self) -> List[str]:
+        """ A short human-readable summary, e.g. for the LiveLinkFace panel. """
+        def ms(histogram):
+            p50, _, p99 = histogram.percentiles()
+            return "-" if histogram.count == 0 else f"{p50 * 1000:.1f}/{p99 * 1000:.1f}"
+        lines = [
+            f"{self.packets_per_second():.0f} packets/s, {self.received} received, {self.decoded} decoded",
+            f"Dropped: {self.malformed} malformed, {self.late} late, {self.duplicates} duplicate, "
+            f"{self.out_of_order} out of order, {self.lost} lost",
+            f"Overflows: {self.kernel_drops} kernel, {self.ring_overruns} ring",
+            f"Tick ms (p50/p99): decode {ms(self.decode_time)}, apply {ms(self.apply_time)}, flush {ms(self.flush_time)}",
+            f"Latency ms (p50/p99): {ms(self.latency)}",
+        ]
+        if self.last_error is not None:
+            lines.append(f"{self.socket_errors} errors, last: {self.last_error}")
+        return lines
@@ -1,3 +1,4 @@
+import os
 import bpy
 from bpy_extras.io_utils import ImportHelper
 
@@ -14,6 +15,8 @@ from bpy.types import (Operator,
                        UIList)
 
 import livelinkface.bpylivelinkface as llf
+from livelinkface.take import ParallelCSVReader
+from livelinkface.filters import create_filter
 
 def checkPrereqs(context):
     if len(context.scene.ll_targets) == 0:
@@ -26,17 +29,37 @@ def checkPrereqs(context):
         return True
     return False
 
+def sceneFilter(scene):
+    return create_filter(scene.ll_filter, size=scene.ll_filter_size, alpha=scene.ll_filter_alpha,
+        min_cutoff=scene.ll_filter_min_cutoff, beta=scene.ll_filter_beta, rate=scene.render.fps / scene.render.fps_base)
+
+def sceneRate(scene):
+    return scene.render.fps / scene.render.fps_base if scene.ll_match_scene_rate else None
+
+def sceneRoutes(scene):
+    targets, routes = [], {}
+    for t in scene.ll_targets:
+        if t.obj.ll_subject:
+            routes.setdefault(t.obj.ll_subject, []).append(t.obj)
+        else:
+            targets.append(t.obj)
+    return targets, routes
+
+# the frame rate CSV timecodes are read at, 0 reads it from the timecodes themselves
+CSV_FPS_PROPERTY = IntProperty(name="CSV frame rate", description="Frame rate the CSV was recorded at (0 to read it from its timecodes)", default=0, min=0)
+
 class LoadCSVOperator(Operator, ImportHelper):
     bl_idname = "scene.load_csv_operator"
     bl_label = "Load from CSV"
         
     filename_ext = ".csv"
     filter_glob: bpy.props.StringProperty(options={'HIDDEN'}, default='*.csv',maxlen=255)
+    source_fps: CSV_FPS_PROPERTY
 
     def execute(self, context):
         if checkPrereqs(context):
             #try:
-            llf.LiveLinkTarget.from_csv([t.obj for t in context.scene.ll_targets], self.filepath)
+            llf.LiveLinkTarget.from_csv([t.obj for t in context.scene.ll_targets], self.filepath, tolerance=context.scene.ll_decimate_tolerance, filter=sceneFilter(context.scene), rate=sceneRate(context.scene), source_fps=self.source_fps or None)
             self.report({"INFO"}, "Loaded")
             return {'FINISHED'}
             #except Exception as e:
@@ -44,6 +67,90 @@ class LoadCSVOperator(Operator, ImportHelper):
             #    self.report({"ERROR"}, f"Error loading from CSV : {self.filepath}")
         return {'CANCELLED'}
         
+class LoadCSVBatchOperator(Operator, ImportHelper):
+    bl_idname = "scene.load_csv_batch_operator"
+    bl_label = "Load CSVs (batch)"
+    bl_description = "Load many CSVs, parsing them in parallel, into one action per file"
+
+    filename_ext = ".csv"
+    filter_glob: bpy.props.StringProperty(options={'HIDDEN'}, default='*.csv',maxlen=255)
+    files: CollectionProperty(type=bpy.types.OperatorFileListElement, options={'HIDDEN', 'SKIP_SAVE'})
+    directory: StringProperty(subtype='DIR_PATH')
+    source_fps: CSV_FPS_PROPERTY
+
+    _timer = None
+    _reader = None
+
+    def execute(self, context):
+        if not checkPrereqs(context):
+            return {'CANCELLED'}
+        paths = [os.path.join(self.directory, f.name) for f in self.files if f.name.lower().endswith(".csv")]
+        if len(paths) == 0:
+            self.report({"ERROR"}, "No CSV files selected")
+            return {'CANCELLED'}
+        self._targets = [t.obj for t in context.scene.ll_targets]
+        self._filter = sceneFilter(context.scene)
+        self._reader = ParallelCSVReader(paths)
+        self._errors = []
+        wm = context.window_manager
+        wm.progress_begin(0, len(paths))
+        self._timer = wm.event_timer_add(0.1, window=context.window)
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if event.type == 'ESC':
+            # cancel() shuts the pool down without waiting for the CSVs being parsed, so Blender isn't blocked
+            self._reader.cancel()
+            self.finish(context, wait=False)
+            self.report({"WARNING"}, f"Cancelled after loading {self._reader.completed - len(self._errors)} of {len(self._reader.paths)} CSVs")
+            return {'CANCELLED'}
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+
+        # the parsing happens in the worker processes, only the (quick) action creation happens here on the main thread
+        for path, parsed, error in self._reader.poll():
+            if error is None:
+                try:
+                    llf.LiveLinkTarget.from_parsed_csv(self._targets, path, parsed, tolerance=context.scene.ll_decimate_tolerance, filter=self._filter, rate=sceneRate(context.scene), source_fps=self.source_fps or None)
+                except Exception as e:
+                    error = e
+            if error is not None:
+                print(f"Error loading from CSV {path} : {error}")
+                self._errors.append(path)
+        context.window_manager.progress_update(self._reader.completed)
+
+        if self._reader.done:
+            self.finish(context)
+            loaded = len(self._reader.paths) - len(self._errors)
+            if self._errors:
+                self.report({"ERROR"}, f"Loaded {loaded} CSVs, failed to load : {', '.join(os.path.basename(p) for p in self._errors)}")
+            else:
+                self.report({"INFO"}, f"Loaded {loaded} CSVs")
+            return {'FINISHED'}
+        return {'RUNNING_MODAL'}
+
+    def finish(self, context, wait=True):
+        wm = context.window_manager
+        wm.event_timer_remove(self._timer)
+        wm.progress_end()
+        if wait:
+            self._reader.close()
+
+class LoadTakeOperator(Operator, ImportHelper):
+    bl_idname = "scene.load_take_operator"
+    bl_label = "Load from take"
+        
+    filename_ext = ".llftake"
+    filter_glob: bpy.props.StringProperty(options={'HIDDEN'}, default='*.llftake',maxlen=255)
+
+    def execute(self, context):
+        if checkPrereqs(context):
+            llf.LiveLinkTarget.from_take([t.obj for t in context.scene.ll_targets], self.filepath, tolerance=context.scene.ll_decimate_tolerance, filter=sceneFilter(context.scene), rate=sceneRate(context.scene))
+            self.report({"INFO"}, "Loaded")
+            return {'FINISHED'}
+        return {'CANCELLED'}
+        
 class ConnectOperator(bpy.types.Operator):
     bl_idname = "scene.connect_operator"
     bl_label = "connectbutton"
@@ -61,7 +168,8 @@ class ConnectOperator(bpy.types.Operator):
         else:
             if checkPrereqs(context):
                 try:
-                    llf.create_instance([t.obj for t in context.scene.ll_targets], context.scene.ll_record_stream, context.scene.ll_host_ip, context.scene.ll_host_port)
+                    targets, routes = sceneRoutes(context.scene)
+                    llf.create_instance(targets, context.scene.ll_record_stream, context.scene.ll_host_ip, context.scene.ll_host_port, threaded=context.scene.ll_threaded_receiver, tolerance=context.scene.ll_decimate_tolerance, filter=sceneFilter(context.scene), routes=routes, latency=context.scene.ll_jitter_latency / 1000, rate=sceneRate(context.scene))
                     llf.instance.listen()
                     self.report({"INFO"}, "Started")
                 except Exception as e:
@@ -94,6 +202,8 @@ class LiveLinkFacePanel(bpy.types.Panel):
         col = row.column(align=True)
         col.operator("ll_custom.list_action", icon='ADD', text="").action = 'ADD'
         col.operator("ll_custom.list_action", icon='REMOVE', text="").action = 'REMOVE'
+        if 0 <= context.scene.ll_index < len(context.scene.ll_targets) and context.scene.ll_targets[context.scene.ll_index].obj is not None:
+            box.prop(context.scene.ll_targets[context.scene.ll_index].obj, "ll_subject")
         
         box = self.layout.box()
         box.label(text="Stream")
@@ -103,14 +213,37 @@ class LiveLinkFacePanel(bpy.types.Panel):
         row = box.row()
 
         row.prop(context.scene, "ll_record_stream", text="Record?")
+        row.prop(context.scene, "ll_threaded_receiver", text="Background")
+        row.prop(context.scene, "ll_jitter_latency", text="Buffer (ms)")
         row.operator("scene.connect_operator", text="Disconnect" if llf.instance is not None and llf.instance.isListening() else "Connect")
+        if llf.instance is not None:
+            for device in llf.instance.devices.values():
+                box.label(text=f"{device.name}: {device.received} received, {device.lost} lost, {len(device.targets)} target(s)")
+                if device.jitter is not None:
+                    box.label(text=f"    {device.jitter.late} late, {device.jitter.duplicates} duplicates, {device.jitter.interpolated} interpolated")
+            if llf.instance.isListening():
+                for line in llf.instance.metrics.lines():
+                    box.label(text=line)
 
         box = self.layout.box()
         box.label(text="Import")
         load_csv = box.operator("scene.load_csv_operator")
+        load_csv_batch = box.operator("scene.load_csv_batch_operator")
+        load_take = box.operator("scene.load_take_operator")
         
         box = self.layout.box()
         box.label(text="Adjustments")
         row = box.row()
         box.prop(context.scene, "invert_lr_mouth", text="Invert Mouth L/R")
+        box.prop(context.scene, "ll_match_scene_rate")
+        box.prop(context.scene, "ll_decimate_tolerance", text="Reduce keyframes")
+        box.prop(context.scene, "ll_filter")
+        if context.scene.ll_filter == "average":
+            box.prop(context.scene, "ll_filter_size")
+        elif context.scene.ll_filter == "exponential":
+            box.prop(context.scene, "ll_filter_alpha")
+        elif context.scene.ll_filter == "one_euro":
+            row = box.row()
+            row.prop(context.scene, "ll_filter_min_cutoff")
+            row.prop(context.scene, "ll_filter_beta")
 
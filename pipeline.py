@@ -0,0 +1,298 @@
+"""The streaming pipeline: from received packets to target backends.
+
+    pipeline = LiveLinkFacePipeline([NumpyBackend(3600)], record=True)
+    pipeline.receive(datagrams)     # decode and apply a batch of packets
+    pipeline.tick()                 # release buffered frames, flush
+    pipeline.close()
+
+For every batch of packets, the pipeline decodes them (all at once, with
+PyLiveLinkFace.decode_batch), splits them by device, routes each device to
+its targets, and then (per device) buffers them in a JitterBuffer, filters,
+resamples onto the recording frame rate and writes them to the target
+backends (see backends.py). It is pure Python/NumPy: LiveLinkFaceServer
+only feeds it packets from its socket and drives it from a Blender timer,
+and it can equally be driven headlessly, e.g. from a capture or a benchmark.
+"""
+import copy
+import time
+from typing import Dict, List, Optional
+import numpy as np
+
+from livelinkface.backends import TargetBackend
+from livelinkface.jitter import JitterBuffer
+from livelinkface.metrics import PipelineMetrics
+from livelinkface.pylivelinkface import PyLiveLinkFace, BLENDSHAPE_COUNT
+from livelinkface.timing import Resampler, frame_times
+
+
+class DeviceState:
+    """State kept for each device streaming to the pipeline (keyed by device
+    id): the targets it drives, its own copy of the filter, its jitter
+    buffer and resampler (if any), its frame rate, the frame it started at
+    and the packets received/lost/out of order."""
+
+    def __init__(self, device_id: str, name: str, targets: List[TargetBackend], filter=None,
+                    jitter: JitterBuffer = None, resampler: Resampler = None) -> None:
+        self.device_id = device_id
+        self.name = name
+        self.targets = targets
+        self.filter = filter
+        self.jitter = jitter
+        self.resampler = resampler
+        self.fps = 60
+        self.denominator = 1
+        self.start_frame = -1
+        self.start_sub_frame = 0.0
+        self.last_frame = -1
+        self.received = 0
+        self.lost = 0
+        self.out_of_order = 0
+
+    def frames_received(self, frames: np.ndarray) -> None:
+        """ Counts the packets in frames, those that are no newer than a
+        frame already seen (out of order) and any gaps (lost packets) in the
+        frame numbers since the last frame seen. """
+        self.received += len(frames)
+        if len(frames) > 0:
+            newest = np.maximum.accumulate(np.concatenate([[self.last_frame], frames[:-1]]))
+            self.out_of_order += int(np.count_nonzero(frames <= newest))
+        newer = np.unique(frames[frames > self.last_frame])
+        if len(newer) == 0:
+            return
+        first = self.last_frame if self.last_frame >= 0 else newer[0] - 1
+        self.lost += int(newer[-1] - first) - len(newer)
+        self.last_frame = int(newer[-1])
+
+
+class LiveLinkFacePipeline:
+    """Applies packets from any number of devices to target backends.
+
+    If record is True, frames are written (write_frame) at their offset from
+    the device's first frame, up to num_frames, and flushed on every tick;
+    otherwise only the most recent frame of each batch is posed (write_live).
+    If recording and tolerance is greater than zero, the recordings are
+    reduced to that tolerance when the pipeline is closed.
+    If a filter (see filters.py) is given, every frame is passed through it,
+    in the order received (each device gets its own copy).
+    routes maps a device id or subject name to the targets it drives;
+    devices without a route drive targets.
+    If latency is greater than zero, each device's packets are held in a
+    JitterBuffer for that many seconds and written in frame order.
+    If a frame rate is given, recorded frames are resampled from the
+    device's frame rate (and sub-frames) onto it (see timing.py).
+    Packet counts, drops, per-tick timings and latency are kept in metrics
+    (see metrics.py).
+    """
+
+    def __init__(self, targets: List[TargetBackend], record: bool = False, num_frames: int = 3600,
+                    tolerance: float = 0.0, filter=None, routes: Dict[str, List[TargetBackend]] = None,
+                    latency: float = 0.0, rate: float = None, metrics: PipelineMetrics = None) -> None:
+        self.targets = list(targets)
+        self.routes = dict(routes or {})
+        self.record = record
+        self.num_frames = num_frames
+        self.tolerance = tolerance
+        self.filter = filter
+        self.latency = latency
+        self.rate = rate
+        self.frames_recorded = 0
+        self.devices: Dict[str, DeviceState] = {}
+        self.metrics = metrics if metrics is not None else PipelineMetrics()
+        # the last frame recorded, and the time spent decoding/applying packets, since the last tick
+        self._tick_frame = None
+        self._tick_decode = self._tick_apply = 0.0
+
+    def all_targets(self) -> List[TargetBackend]:
+        """ Every target the pipeline can drive, routed or not. """
+        targets = list(self.targets)
+        for routed in self.routes.values():
+            targets.extend(routed)
+        return targets
+
+    def route(self, device_id: str, name: str) -> List[TargetBackend]:
+        """ The targets driven by a device: those routed to its device id,
+        then those routed to its subject name, otherwise the default
+        targets. """
+        if device_id in self.routes:
+            return self.routes[device_id]
+        if name in self.routes:
+            return self.routes[name]
+        return self.targets
+
+    def device_state(self, device_id: str, name: str) -> DeviceState:
+        """ Looks up (or creates, on the first packet from a device) the
+        DeviceState for a device. Devices are re-routed if their subject
+        name changes. """
+        device = self.devices.get(device_id)
+        if device is None:
+            jitter = JitterBuffer(self.latency, channels=BLENDSHAPE_COUNT) if self.latency > 0 else None
+            resampler = Resampler(self.rate) if self.rate else None
+            device = self.devices[device_id] = DeviceState(device_id, name, self.route(device_id, name),
+                copy.deepcopy(self.filter), jitter, resampler)
+            print(f"Receiving from {name} ({device_id}), driving {len(device.targets)} target(s)")
+        elif device.name != name:
+            device.name = name
+            device.targets = self.route(device_id, name)
+        return device
+
+    def reset(self) -> None:
+        """ Forgets every device (e.g. when the stream restarts). """
+        self.devices = {}
+        self._tick_frame = None
+
+    def receive(self, datagrams, timestamps: np.ndarray = None) -> Optional[int]:
+        """ Decodes and applies a batch of packets, returning the last frame
+        written (or None if nothing was written). timestamps are the
+        packets' time.monotonic() arrival times, if known, for the jitter
+        buffers. """
+        if len(datagrams) == 0:
+            return None
+        start = time.perf_counter()
+        batch = PyLiveLinkFace.decode_batch(datagrams)
+        decoded = time.perf_counter()
+        metrics = self.metrics
+        metrics.received += len(datagrams)
+        metrics.decoded += len(batch.frames)
+        metrics.malformed += len(datagrams) - len(batch.frames)
+        metrics.packets_arrived(batch.frames, batch.sub_frames, batch.fps, batch.denominators,
+            timestamps[batch.indices] if timestamps is not None else None)
+        frame = self.apply_batch(batch, timestamps)
+        self._tick_decode += decoded - start
+        self._tick_apply += time.perf_counter() - decoded
+        return frame
+
+    def apply_batch(self, batch, timestamps: np.ndarray = None) -> Optional[int]:
+        """ Writes a DecodedBatch to the targets of each device in it,
+        returning the last frame written (or None if nothing was written).
+        timestamps are the arrival times of the datagrams the batch was
+        decoded from. """
+        if len(batch.frames) == 0:
+            return None
+        device_ids = batch.device_ids
+        if (device_ids == device_ids[0]).all():
+            # the usual case, a single device
+            groups = [slice(None)]
+        else:
+            unique, first = np.unique(device_ids, return_index=True)
+            groups = [device_ids == device_ids[i] for i in np.sort(first)]
+        frame = None
+        for rows in groups:
+            names = batch.names[rows]
+            device = self.device_state(str(device_ids[rows][0]), str(names[-1]))
+            device.fps, device.denominator = int(batch.fps[rows][-1]), int(batch.denominators[rows][-1])
+            arrivals = timestamps[batch.indices[rows]] if timestamps is not None else None
+            device_frame = self.apply_device(device, batch.frames[rows], batch.sub_frames[rows], batch.blendshapes[rows], arrivals)
+            if device_frame is not None and (frame is None or device_frame > frame):
+                frame = device_frame
+        return frame
+
+    def apply_device(self, device: DeviceState, frames, sub_frames, blendshapes, arrivals=None) -> Optional[int]:
+        """ Handles the packets received from a single device, returning the
+        last frame written (or None if nothing was written). With a jitter
+        buffer, the packets are only buffered (they are written by
+        release_buffered). """
+        metrics = self.metrics
+        lost, out_of_order = device.lost, device.out_of_order
+        device.frames_received(frames)
+        metrics.lost += device.lost - lost
+        metrics.out_of_order += device.out_of_order - out_of_order
+        if device.jitter is not None:
+            late, duplicates = device.jitter.late, device.jitter.duplicates
+            device.jitter.push(frames, sub_frames, blendshapes, arrivals)
+            metrics.late += device.jitter.late - late
+            metrics.duplicates += device.jitter.duplicates - duplicates
+            return None
+        return self.write_frames(device, frames, sub_frames, blendshapes)
+
+    def release_buffered(self, flush: bool = False) -> Optional[int]:
+        """ Writes every frame that has been held long enough in the
+        devices' jitter buffers (or every frame held, if flush is True),
+        returning the last frame written (or None if nothing was written). """
+        frame = None
+        for device in self.devices.values():
+            if device.jitter is None:
+                continue
+            interpolated = device.jitter.interpolated
+            released = device.jitter.flush() if flush else device.jitter.pop()
+            self.metrics.interpolated += device.jitter.interpolated - interpolated
+            if len(released.frames) == 0:
+                continue
+            device_frame = self.write_frames(device, released.frames, released.sub_frames, released.values)
+            if device_frame is not None and (frame is None or device_frame > frame):
+                frame = device_frame
+        return frame
+
+    def write_frames(self, device: DeviceState, frames, sub_frames, blendshapes) -> Optional[int]:
+        """ Writes frames from a single device to its targets, returning the
+        last frame written (or None if nothing was written). When recording,
+        each frame is written at its offset from the first frame written for
+        the device (resampled to the pipeline's rate, if any); otherwise
+        only the most recent frame is posed (and 0 is returned). """
+        if device.start_frame == -1:
+            device.start_frame = int(frames[0])
+            device.start_sub_frame = float(sub_frames[0])
+        if device.filter is not None:
+            blendshapes = device.filter.process(blendshapes)
+        if not self.record:
+            for t in device.targets:
+                t.write_live(blendshapes[-1])
+            return 0
+        if device.resampler is not None:
+            times = frame_times(frames - device.start_frame, sub_frames - device.start_sub_frame, device.fps, device.denominator)
+            frame_offsets, blendshapes = device.resampler.push(times, blendshapes)
+        else:
+            frame_offsets = frames - device.start_frame
+        frame = None
+        for frame_offset, values in zip(frame_offsets.tolist(), blendshapes):
+            if frame_offset < 0 or frame_offset >= self.num_frames:
+                continue
+            frame = frame_offset
+            self.frames_recorded = max(self.frames_recorded, frame + 1)
+            for t in device.targets:
+                t.write_frame(frame, values)
+        if frame is not None and (self._tick_frame is None or frame > self._tick_frame):
+            self._tick_frame = frame
+        return frame
+
+    def flush(self) -> None:
+        """ Flushes every target (when recording). """
+        if self.record:
+            for t in self.all_targets():
+                t.flush()
+
+    def tick(self) -> Optional[int]:
+        """ Called after each batch (or each timer tick): writes the frames
+        the jitter buffers release, then flushes the targets if any frame
+        has been recorded since the last tick. Returns the last frame
+        recorded since the last tick (or None). """
+        start = time.perf_counter()
+        if self.latency > 0:
+            self.release_buffered()
+        released = time.perf_counter()
+        frame, self._tick_frame = self._tick_frame, None
+        if frame is not None:
+            self.flush()
+        flushed = time.perf_counter()
+
+        decode, apply = self._tick_decode, self._tick_apply + released - start
+        self._tick_decode = self._tick_apply = 0.0
+        metrics = self.metrics
+        metrics.ticks += 1
+        if decode > 0 or frame is not None:
+            # only ticks with something to do, so idle ticks don't hide the cost of busy ones
+            metrics.decode_time.add(decode)
+            metrics.apply_time.add(apply)
+            metrics.flush_time.add(flushed - released)
+            metrics.tick_time.add(decode + apply + flushed - released)
+        return frame
+
+    def close(self) -> None:
+        """ Writes every frame still buffered and finishes the recordings. """
+        if self.latency > 0:
+            self.release_buffered(flush=True)
+        if self.record and self.frames_recorded > 0:
+            for t in self.all_targets():
+                t.flush()
+                t.finish(self.frames_recorded, self.tolerance)
+        self.devices = {}
+        self._tick_frame = None
@@ -1,12 +1,12 @@
+import asyncio
 from collections import deque
-from statistics import mean
 from enum import Enum
 import struct
-from typing import Tuple
-import datetime
+from typing import Tuple, NamedTuple
 import uuid
 import numpy as np
 from livelinkface.timecode import Timecode
+from livelinkface.filters import Filter, MovingAverageFilter
 
 class FaceBlendShape(Enum):
     EyeBlinkLeft = 0
@@ -72,6 +72,134 @@ class FaceBlendShape(Enum):
     RightEyeRoll = 60
 
 
+# Column layout of the CSV files exported by the LiveLinkFace app. Columns 2 
+# onwards are the ARKit blendshape ids used throughout (e.g. by 
+# LiveLinkTarget), in the order the app writes them.
+LIVE_LINK_FACE_HEADER = "Timecode,BlendShapeCount,EyeBlinkLeft,EyeLookDownLeft,EyeLookInLeft,EyeLookOutLeft,EyeLookUpLeft,EyeSquintLeft,EyeWideLeft,EyeBlinkRight,EyeLookDownRight,EyeLookInRight,EyeLookOutRight,EyeLookUpRight,EyeSquintRight,EyeWideRight,JawForward,JawRight,JawLeft,JawOpen,MouthClose,MouthFunnel,MouthPucker,MouthRight,MouthLeft,MouthSmileLeft,MouthSmileRight,MouthFrownLeft,MouthFrownRight,MouthDimpleLeft,MouthDimpleRight,MouthStretchLeft,MouthStretchRight,MouthRollLower,MouthRollUpper,MouthShrugLower,MouthShrugUpper,MouthPressLeft,MouthPressRight,MouthLowerDownLeft,MouthLowerDownRight,MouthUpperUpLeft,MouthUpperUpRight,BrowDownLeft,BrowDownRight,BrowInnerUp,BrowOuterUpLeft,BrowOuterUpRight,CheekPuff,CheekSquintLeft,CheekSquintRight,NoseSneerLeft,NoseSneerRight,TongueOut,HeadYaw,HeadPitch,HeadRoll,LeftEyeYaw,LeftEyePitch,LeftEyeRoll,RightEyeYaw,RightEyePitch,RightEyeRoll".split(",")
+
+# Layout of the rows filled by PyLiveLinkFace.decode_into: the 61 blendshape
+# weights, followed by the frame number, sub-frame, fps and fps denominator.
+BLENDSHAPE_COUNT = 61
+FRAME_COLUMN = 61
+SUB_FRAME_COLUMN = 62
+FPS_COLUMN = 63
+DENOMINATOR_COLUMN = 64
+ROW_SIZE = 65
+
+# Large enough for any device id/subject name the app sends (a packet with a 
+# 36 character device id and a 6 character subject name is 312 bytes).
+MAX_PACKET_SIZE = 1024
+
+# Precompiled packet layouts (see PyLiveLinkFace.decode for the field order).
+# The sub-frame is the float half of Unreal's FFrameTime, so it is unpacked as
+# a float here rather than as the raw integer bits returned by decode.
+_VERSION_DEVICE_ID_LENGTH = struct.Struct("!Bi")
+_NAME_LENGTH = struct.Struct("!i")
+_FRAME_TIME_RATE_COUNT = struct.Struct("!ifiiB")
+_BLEND_SHAPES = struct.Struct("!61f")
+_BLEND_SHAPES_DTYPE = np.dtype(">f4")
+# native dtypes used to view array.array('f'/'d') rows, so the weights are
+# byte-swapped straight into them
+_NATIVE_DTYPES = { "f": np.dtype("=f4"), "d": np.dtype("=f8") }
+
+# Layouts written by PyLiveLinkFace.encode_into. The version is written as a 
+# little-endian uint32, so its upper bytes are the device id length and the 
+# '$' the uuid starts with (chr(36)) completes it. The tail is the frame 
+# number, sub-frame (as raw FFrameTime bits), fps, denominator, blendshape 
+# count, followed by the weights (_BLEND_SHAPES_DTYPE).
+_ENCODE_VERSION = struct.Struct("<I")
+_ENCODE_FRAME_TIME_RATE_COUNT = struct.Struct("!iiiiB")
+_ENCODE_SUB_FRAME = struct.Struct("!f")
+
+# size of a face packet excluding the device id and subject name bytes
+_FACE_PACKET_OVERHEAD = _VERSION_DEVICE_ID_LENGTH.size + _NAME_LENGTH.size + \
+    _FRAME_TIME_RATE_COUNT.size + _BLEND_SHAPES.size
+
+
+class DecodedBatch(NamedTuple):
+    """ Columns decoded from a batch of packets by PyLiveLinkFace.decode_batch.
+    Row k of every column belongs to the same packet, in input order. """
+    frames: np.ndarray          # (N,) int32 frame numbers
+    sub_frames: np.ndarray      # (N,) float32 sub-frames
+    fps: np.ndarray             # (N,) int32 frame rate numerators
+    denominators: np.ndarray    # (N,) int32 frame rate denominators
+    device_ids: np.ndarray      # (N,) str
+    names: np.ndarray           # (N,) str subject names
+    blendshapes: np.ndarray     # (N, 61) float32 weights
+    indices: np.ndarray         # (N,) position of each packet in the input
+
+
+def _packet_dtype(device_id_len: int, name_length: int) -> np.dtype:
+    """ Structured (big-endian) dtype overlaying a whole face packet with 
+    the given device id and subject name lengths. """
+    header_len = 5 + device_id_len + 4 + name_length
+    names = ["version", "device_id_len", "name_length", "frame", "sub_frame",
+             "fps", "denominator", "count", "blendshapes"]
+    formats = ["u1", ">i4", ">i4", ">i4", ">f4", ">i4", ">i4", "u1", (">f4", (BLENDSHAPE_COUNT,))]
+    offsets = [0, 1, 5 + device_id_len, header_len, header_len + 4,
+               header_len + 8, header_len + 12, header_len + 16, header_len + 17]
+    # zero-length strings can't be represented as a field
+    if device_id_len > 0:
+        names.append("device_id")
+        formats.append(f"S{device_id_len}")
+        offsets.append(5)
+    if name_length > 0:
+        names.append("name")
+        formats.append(f"S{name_length}")
+        offsets.append(9 + device_id_len)
+    return np.dtype({ "names": names, "formats": formats, "offsets": offsets,
+                      "itemsize": header_len + 17 + _BLEND_SHAPES.size })
+
+
+def _read_be_int32(raw: np.ndarray, offsets) -> np.ndarray:
+    """ Reads a big-endian int32 at the given column offset (one per row, or 
+    the same for all rows) of a (N, L) uint8 array. """
+    cols = np.reshape(offsets, (-1, 1)) + np.arange(4)
+    b = np.take_along_axis(raw, np.broadcast_to(cols, (raw.shape[0], 4)), axis=1).astype(np.int64)
+    value = (b[:, 0] << 24) | (b[:, 1] << 16) | (b[:, 2] << 8) | b[:, 3]
+    return np.where(value >= 1 << 31, value - (1 << 32), value)
+
+
+def _decode_rows(raw: np.ndarray, indices: np.ndarray, parts: list) -> None:
+    """ Decodes a (N, L) uint8 array of equally sized packets, appending one 
+    tuple of columns per distinct header layout to parts. Rows that are not 
+    well-formed face packets of length L are skipped. """
+    length = raw.shape[1]
+    if length < _FACE_PACKET_OVERHEAD:
+        return
+    device_id_len = _read_be_int32(raw, 1)
+    # a face packet of this length leaves exactly this many bytes for the name
+    name_length = length - _FACE_PACKET_OVERHEAD - device_id_len
+    ok = (device_id_len >= 0) & (name_length >= 0)
+    ok[ok] &= _read_be_int32(raw[ok], 5 + device_id_len[ok]) == name_length[ok]
+
+    for id_len in np.unique(device_id_len[ok]):
+        selected = ok & (device_id_len == id_len)
+        dtype = _packet_dtype(int(id_len), length - _FACE_PACKET_OVERHEAD - int(id_len))
+        packets = np.ascontiguousarray(raw[selected]).view(dtype)[:, 0]
+        valid = packets["count"] == BLENDSHAPE_COUNT
+        packets = packets[valid]
+        empty = np.full(len(packets), "")
+        parts.append((
+            packets["frame"].astype(np.int32),
+            packets["sub_frame"].astype(np.float32),
+            packets["fps"].astype(np.int32),
+            packets["denominator"].astype(np.int32),
+            np.char.decode(packets["device_id"], "utf-8") if "device_id" in dtype.names else empty,
+            np.char.decode(packets["name"], "utf-8") if "name" in dtype.names else empty,
+            packets["blendshapes"].astype(np.float32),
+            indices[selected][valid]))
+
+
+def _decode_datagrams(datagrams, parts: list) -> None:
+    """ Groups a list of packets by length and decodes each group. """
+    by_length = {}
+    for i, datagram in enumerate(datagrams):
+        by_length.setdefault(len(datagram), []).append(i)
+    for length, idx in by_length.items():
+        raw = np.frombuffer(b"".join([datagrams[i] for i in idx]), np.uint8)
+        _decode_rows(raw.reshape(len(idx), length), np.array(idx), parts)
+
 class PyLiveLinkFace:
     """PyLiveLinkFace class
 
@@ -89,16 +217,16 @@ class PyLiveLinkFace:
         self._filter_size = filter_size
 
         self._version = 6
-        now = datetime.datetime.now()
-        timcode = Timecode(
-            self._fps, f'{now.hour}:{now.minute}:{now.second}:{now.microsecond * 0.001}')
-        self._frames = timcode.frames
+        self._frames = Timecode.from_clock(self._fps).frames
         self._sub_frame = 1056060032                # I don't know how to calculate this
-        self._denominator = int(self._fps / 60)     # 1 most of the time
+        self._denominator = 1                       # fps is always a whole number here
+        # the encoded packet, rebuilt when the version, uuid or name change
+        self._packet = None
+        self._packet_key = None
         self._blend_shapes = [0.000] * 61
-        self._old_blend_shapes = []                 # used for filtering
-        for i in range(61):
-            self._old_blend_shapes.append(deque([0.0], maxlen = self._filter_size))
+        # used for filtering, starts from a rest pose of zeros
+        self._filter = MovingAverageFilter(self._filter_size, BLENDSHAPE_COUNT)
+        self._filter.reset(np.zeros(BLENDSHAPE_COUNT))
 
     @property
     def uuid(self) -> str:
@@ -130,24 +258,117 @@ class PyLiveLinkFace:
             raise ValueError("Only fps values greater than 1 are allowed.")
         self._fps = value
 
-    def encode(self) -> bytes:
+    @property
+    def filter(self) -> Filter:
+        """ The filter applied by set_blendshape(s), a moving average over 
+        filter_size values by default (see livelinkface.filters). """
+        return self._filter
+
+    @filter.setter
+    def filter(self, value: Filter) -> None:
+        self._filter = value if value is not None else Filter(BLENDSHAPE_COUNT)
+
+    @property
+    def denominator(self) -> int:
+        """ The frame rate denominator sent (the frame rate is fps / 
+        denominator, e.g. 30000 / 1001). """
+        return self._denominator
+
+    @denominator.setter
+    def denominator(self, value: int) -> None:
+        if value < 1:
+            raise ValueError("Only denominators of 1 or more are allowed.")
+        self._denominator = value
+
+    def encode(self, frames: int = None) -> bytes:
         """ Encodes the PyLiveLinkFace object into a bytes object so it can be 
-        send over a network. """              
-        
-        version_packed = struct.pack('<I', self._version)
-        uuiid_packed = bytes(self._uuid, 'utf-8')
-        name_lenght_packed = struct.pack('!i', len(self._name))
-        name_packed = bytes(self._name, 'utf-8')
-
-        now = datetime.datetime.now()
-        timcode = Timecode(
-            self._fps, f'{now.hour}:{now.minute}:{now.second}:{now.microsecond * 0.001}')
-        frames_packed = struct.pack("!II", timcode.frames, self._sub_frame)  
-        frame_rate_packed = struct.pack("!II", self._fps, self._denominator)
-        data_packed = struct.pack('!B61f', 61, *self._blend_shapes)
-        
-        return version_packed + uuiid_packed + name_lenght_packed + name_packed + \
-            frames_packed + frame_rate_packed + data_packed
+        send over a network. 
+
+        Parameters
+        ----------
+        frames : int
+            The frame number to send, the current time of day (as a 
+            timecode at fps) if None.
+
+        Returns
+        -------
+        bytes
+            The encoded packet.
+        """
+        return bytes(self.encode_view(frames))
+
+    def _encoded_header(self) -> bytes:
+        name = bytes(self._name, 'utf-8')
+        return _ENCODE_VERSION.pack(self._version) + bytes(self._uuid, 'utf-8') + \
+            _NAME_LENGTH.pack(len(name)) + name
+
+    def encode_view(self, frames: int = None, values=None, sub_frame: float = None) -> memoryview:
+        """ Encodes the PyLiveLinkFace object into a packet kept by the 
+        object, returning a view of it (valid until the next encode).
+
+        The version, uuid and name are only written when they change; every 
+        call just packs the frame fields in place with a precompiled struct 
+        and copies the weights into the packet through a NumPy view, without 
+        allocating.
+
+        Parameters
+        ----------
+        frames : int
+            The frame number to send, the current time of day (as a 
+            timecode at fps) if None.
+        values : np.ndarray
+            The 61 weights to send, instead of the current blendshapes 
+            (which are left unchanged).
+        sub_frame : float
+            The sub-frame to send (e.g. when replaying a take), instead of 
+            the default.
+
+        Returns
+        -------
+        memoryview
+            The encoded packet.
+        """
+        key = (self._version, self._uuid, self._name)
+        if key != self._packet_key:
+            header = self._encoded_header()
+            self._packet = bytearray(len(header) + _ENCODE_FRAME_TIME_RATE_COUNT.size + _BLEND_SHAPES.size)
+            self._packet[:len(header)] = header
+            self._packet_view = memoryview(self._packet)
+            self._packet_weights = np.frombuffer(self._packet, _BLEND_SHAPES_DTYPE, BLENDSHAPE_COUNT, 
+                len(header) + _ENCODE_FRAME_TIME_RATE_COUNT.size)
+            self._packet_key = key
+        if frames is None:
+            frames = Timecode.from_clock(self._fps).frames
+        offset = len(self._packet) - _BLEND_SHAPES.size - _ENCODE_FRAME_TIME_RATE_COUNT.size
+        _ENCODE_FRAME_TIME_RATE_COUNT.pack_into(self._packet, offset, 
+            frames, self._sub_frame, self._fps, self._denominator, BLENDSHAPE_COUNT)
+        if sub_frame is not None:
+            _ENCODE_SUB_FRAME.pack_into(self._packet, offset + 4, sub_frame)
+        self._packet_weights[:] = self._blend_shapes if values is None else values
+        return self._packet_view
+
+    def encode_into(self, buffer, offset: int = 0, frames: int = None) -> int:
+        """ Encodes the PyLiveLinkFace object into a writable buffer (e.g. a 
+        preallocated bytearray) at the given offset.
+
+        Parameters
+        ----------
+        buffer : bytearray or memoryview
+            Buffer to write the packet to, with room for it at offset.
+        offset : int
+            Position in the buffer to write the packet at.
+        frames : int
+            The frame number to send, the current time of day (as a 
+            timecode at fps) if None.
+
+        Returns
+        -------
+        int
+            The number of bytes written.
+        """
+        packet = self.encode_view(frames)
+        buffer[offset:offset + len(packet)] = packet
+        return len(packet)
 
     def get_blendshape(self, index: FaceBlendShape) -> float:
         """ Get the current value of the blend shape. 
@@ -168,8 +389,9 @@ class PyLiveLinkFace:
                         no_filter: bool = False) -> None:
         """ Sets the value of the blendshape. 
         
-        The function will use mean to filter between the old and the new 
-        values, unless `no_filter` is set to True.
+        The function will use the filter (a moving average unless changed) 
+        to filter between the old and the new values, unless `no_filter` is 
+        set to True.
 
         Parameters
         ----------
@@ -191,9 +413,32 @@ class PyLiveLinkFace:
         if no_filter:
             self._blend_shapes[index.value] = value
         else:
-            self._old_blend_shapes[index.value].append(value)
-            filterd_value = mean(self._old_blend_shapes[index.value])
-            self._blend_shapes[index.value] = filterd_value
+            filterd_value = self._filter.update(value, index.value)
+            self._blend_shapes[index.value] = float(filterd_value)
+
+    def set_blendshapes(self, values, no_filter: bool = False) -> None:
+        """ Sets the values of all the blendshapes at once. 
+        
+        Filters the whole frame in one step, which is much cheaper than 
+        calling set_blendshape for every blendshape.
+
+        Parameters
+        ----------
+        values : array-like
+            The 61 values, ordered as FaceBlendShape.
+        no_filter: bool
+            If set to True, the blendshapes will be set to the values without 
+            filtering.
+        
+        Returns
+        ----------
+        None
+        """
+        if len(values) != BLENDSHAPE_COUNT:
+            raise ValueError(f"Expected {BLENDSHAPE_COUNT} values, got {len(values)}")
+        if not no_filter:
+            values = self._filter.update(values)
+        self._blend_shapes = np.asarray(values, dtype=np.float64).tolist()
 
     @staticmethod
     def decode(bytes_data: bytes):
@@ -249,3 +494,266 @@ class PyLiveLinkFace:
             return True, live_link_face
         return False, None
 
+    @staticmethod
+    def decode_into(buffer, out, nbytes: int = None) -> bool:
+        """ Decodes the given packet straight into a caller-owned row, 
+        without creating a PyLiveLinkFace (or any Timecode/filter) per packet.
+
+        The row must hold at least ROW_SIZE values. The 61 blendshape weights 
+        are written to out[0:61], followed by the frame number, sub-frame, fps 
+        and denominator at FRAME_COLUMN, SUB_FRAME_COLUMN, FPS_COLUMN and 
+        DENOMINATOR_COLUMN. NumPy rows are filled with a single vectorized 
+        copy, array.array rows through a NumPy view of their buffer.
+
+        Parameters
+        ----------
+        buffer : bytes-like
+            Packet data, e.g. a bytearray filled by socket.recvfrom_into.
+        out : numpy.ndarray or array.array
+            Row to write the decoded values into (array.array rows must use 
+            the 'f' or 'd' typecode).
+        nbytes : int
+            Number of valid bytes in buffer (defaults to the whole buffer).
+
+        Returns
+        -------
+        bool
+            True if the packet contained a face and out was written, False if 
+            not (out is left untouched).
+        """
+        if nbytes is None:
+            nbytes = len(buffer)
+        device_id_len = _VERSION_DEVICE_ID_LENGTH.unpack_from(buffer, 0)[1]
+        name_length = _NAME_LENGTH.unpack_from(buffer, 5 + device_id_len)[0]
+        name_end_pos = 5 + device_id_len + 4 + name_length
+
+        if nbytes <= name_end_pos + 16:
+            return False
+
+        frame_number, sub_frame, fps, denominator, bs_count = \
+            _FRAME_TIME_RATE_COUNT.unpack_from(buffer, name_end_pos)
+        if bs_count != BLENDSHAPE_COUNT:
+            raise ValueError(
+                f'Blend shape length is {bs_count} but should be 61, something is wrong with the data.')
+        data_pos = name_end_pos + 17
+        if nbytes < data_pos + _BLEND_SHAPES.size:
+            raise ValueError(
+                f'Packet is {nbytes} bytes long but should be {data_pos + _BLEND_SHAPES.size}, something is wrong with the data.')
+
+        if isinstance(out, np.ndarray):
+            out[:BLENDSHAPE_COUNT] = np.frombuffer(
+                buffer, _BLEND_SHAPES_DTYPE, BLENDSHAPE_COUNT, data_pos)
+        else:
+            np.frombuffer(out, _NATIVE_DTYPES[out.typecode], BLENDSHAPE_COUNT)[:] = np.frombuffer(
+                buffer, _BLEND_SHAPES_DTYPE, BLENDSHAPE_COUNT, data_pos)
+        out[FRAME_COLUMN] = frame_number
+        out[SUB_FRAME_COLUMN] = sub_frame
+        out[FPS_COLUMN] = fps
+        out[DENOMINATOR_COLUMN] = denominator
+        return True
+
+    @staticmethod
+    def decode_batch(datagrams) -> DecodedBatch:
+        """ Decodes many packets at once into NumPy columns.
+
+        Packets are grouped by length and header layout, and each group is 
+        parsed with a single structured view over its bytes, so the cost is 
+        dominated by a handful of NumPy calls rather than by the number of 
+        packets. Packets that don't contain a face, or are malformed, are 
+        skipped (DecodedBatch.indices maps each row back to its packet).
+
+        Parameters
+        ----------
+        datagrams : list of bytes-like, or bytes-like
+            Either a list of packets, or a single buffer holding face packets 
+            back to back (e.g. a raw capture).
+
+        Returns
+        -------
+        DecodedBatch
+            The decoded columns, in input order.
+        """
+        parts = []
+        if isinstance(datagrams, (bytes, bytearray, memoryview)):
+            PyLiveLinkFace._decode_concatenated(datagrams, parts)
+        else:
+            _decode_datagrams(datagrams, parts)
+
+        if not parts:
+            return DecodedBatch(
+                np.zeros(0, np.int32), np.zeros(0, np.float32), np.zeros(0, np.int32),
+                np.zeros(0, np.int32), np.zeros(0, str), np.zeros(0, str),
+                np.zeros((0, BLENDSHAPE_COUNT), np.float32), np.zeros(0, np.int64))
+        if len(parts) == 1:
+            return DecodedBatch(*parts[0])
+        columns = [np.concatenate(column) for column in zip(*parts)]
+        order = np.argsort(columns[-1], kind="stable")
+        return DecodedBatch(*[column[order] for column in columns])
+
+    @staticmethod
+    def decode_frame(bytes_data, received: float = 0.0):
+        """ Decodes the given bytes into a LiveLinkFaceFrame (a lightweight 
+        alternative to decode that doesn't construct a PyLiveLinkFace).
+        Returns None if the data doesn't contain a face. """
+        row = np.empty(ROW_SIZE, dtype=np.float64)
+        if not PyLiveLinkFace.decode_into(bytes_data, row):
+            return None
+        device_id_len = _VERSION_DEVICE_ID_LENGTH.unpack_from(bytes_data, 0)[1]
+        name_length = _NAME_LENGTH.unpack_from(bytes_data, 5 + device_id_len)[0]
+        name_start_pos = 5 + device_id_len + 4
+        return LiveLinkFaceFrame(
+            bytes(bytes_data[5:5 + device_id_len]).decode("utf-8"),
+            bytes(bytes_data[name_start_pos:name_start_pos + name_length]).decode("utf-8"),
+            int(row[FRAME_COLUMN]), float(row[SUB_FRAME_COLUMN]),
+            int(row[FPS_COLUMN]), int(row[DENOMINATOR_COLUMN]),
+            row[:BLENDSHAPE_COUNT].astype(np.float32), received)
+
+    @staticmethod
+    def _decode_concatenated(buffer, parts: list) -> None:
+        """ Splits a buffer of back-to-back face packets and decodes them. 
+        When every packet has the same length as the first (the common case 
+        for a single device), the buffer is viewed as one (N, L) array; 
+        otherwise it is walked packet by packet to find the boundaries. """
+        raw = np.frombuffer(buffer, np.uint8)
+        total = len(raw)
+        starts, lengths = [], []
+        pos = 0
+        while pos + _FACE_PACKET_OVERHEAD <= total:
+            device_id_len = _VERSION_DEVICE_ID_LENGTH.unpack_from(buffer, pos)[1]
+            if device_id_len < 0 or pos + 9 + device_id_len > total:
+                break
+            name_length = _NAME_LENGTH.unpack_from(buffer, pos + 5 + device_id_len)[0]
+            length = _FACE_PACKET_OVERHEAD + device_id_len + name_length
+            if name_length < 0 or pos + length > total:
+                break
+            if pos == 0 and total % length == 0:
+                rows = raw.reshape(-1, length)
+                if np.all(_read_be_int32(rows, 1) == device_id_len) and \
+                        np.all(_read_be_int32(rows, 5 + device_id_len) == name_length):
+                    _decode_rows(rows, np.arange(len(rows)), parts)
+                    return
+            starts.append(pos)
+            lengths.append(length)
+            pos += length
+        _decode_datagrams([buffer[start:start + length] 
+                           for start, length in zip(starts, lengths)], parts)
+
+
+class LiveLinkFaceFrame(NamedTuple):
+    """ A single decoded packet, as delivered by LiveLinkFaceProtocol. """
+    device_id: str
+    name: str
+    frame: int
+    sub_frame: float
+    fps: int
+    denominator: int
+    blendshapes: np.ndarray     # (61,) float32 weights
+    received: float             # event loop time the packet arrived
+
+
+# drop policies for LiveLinkFaceProtocol
+POLICY_QUEUE = "queue"      # deliver every frame, dropping new frames when the queue is full
+POLICY_LATEST = "latest"    # only ever hold the most recent frame
+
+
+class LiveLinkFaceProtocol(asyncio.DatagramProtocol):
+    """asyncio protocol that receives PyLiveLinkFace packets without Blender.
+
+    Decoded frames are either passed to ``callback`` as they arrive, or 
+    queued and consumed with ``async for frame in protocol``. With 
+    POLICY_QUEUE, up to ``maxsize`` frames are buffered and anything beyond 
+    that is dropped; with POLICY_LATEST, a new frame replaces any frame that 
+    hasn't been consumed yet, so a slow consumer always sees the newest pose. 
+    Dropped and malformed packets are counted in ``dropped`` and 
+    ``malformed``.
+    """
+
+    def __init__(self, callback=None, policy: str = POLICY_QUEUE, 
+                    maxsize: int = 1024) -> None:
+        if policy not in (POLICY_QUEUE, POLICY_LATEST):
+            raise ValueError(f"Unknown drop policy {policy}")
+        self.callback = callback
+        self.policy = policy
+        self.maxsize = maxsize
+        self.transport = None
+        self.received = 0
+        self.dropped = 0
+        self.malformed = 0
+        self._frames = deque()
+        self._ready = asyncio.Event()
+        self._closed = False
+
+    def connection_made(self, transport) -> None:
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        self.received += 1
+        try:
+            frame = PyLiveLinkFace.decode_frame(data, asyncio.get_running_loop().time())
+        except (ValueError, struct.error, UnicodeDecodeError):
+            self.malformed += 1
+            return
+        if frame is None:
+            return
+        if self.callback is not None:
+            self.callback(frame)
+            return
+        if self.policy == POLICY_LATEST:
+            self.dropped += len(self._frames)
+            self._frames.clear()
+        elif len(self._frames) >= self.maxsize:
+            self.dropped += 1
+            return
+        self._frames.append(frame)
+        self._ready.set()
+
+    def error_received(self, exc: Exception) -> None:
+        # ICMP errors (e.g. port unreachable) aren't fatal for a UDP listener
+        pass
+
+    def connection_lost(self, exc) -> None:
+        self._closed = True
+        self._ready.set()
+
+    def close(self) -> None:
+        """ Stops listening; iteration ends once the queued frames are consumed. """
+        if self.transport is not None:
+            self.transport.close()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> LiveLinkFaceFrame:
+        while not self._frames:
+            if self._closed:
+                raise StopAsyncIteration
+            self._ready.clear()
+            await self._ready.wait()
+        return self._frames.popleft()
+
+
+async def serve(host: str = "0.0.0.0", port: int = 11111, callback=None, 
+                policy: str = POLICY_QUEUE, maxsize: int = 1024) -> LiveLinkFaceProtocol:
+    """ Starts listening for PyLiveLinkFace packets on the running event loop.
+
+    Parameters
+    ----------
+    host, port : str, int
+        Interface and UDP port to listen on.
+    callback : callable
+        Called with each LiveLinkFaceFrame as it arrives. If None, frames are 
+        queued and can be consumed with ``async for`` on the returned protocol.
+    policy : str
+        POLICY_QUEUE or POLICY_LATEST (see LiveLinkFaceProtocol).
+    maxsize : int
+        Maximum number of queued frames with POLICY_QUEUE.
+
+    Returns
+    -------
+    LiveLinkFaceProtocol
+        The listening protocol; call close() on it to stop.
+    """
+    loop = asyncio.get_running_loop()
+    transport, protocol = await loop.create_datagram_endpoint(
+        lambda: LiveLinkFaceProtocol(callback, policy, maxsize), local_addr=(host, port))
+    return protocol
@@ -0,0 +1,158 @@
+import socket
+import struct
+import sys
+import threading
+import time
+import numpy as np
+from livelinkface.pylivelinkface import MAX_PACKET_SIZE
+
+# with this socket option set, Linux attaches to every datagram the number of datagrams the socket has dropped so far because its buffer was full
+SO_RXQ_OVFL = getattr(socket, "SO_RXQ_OVFL", 40 if sys.platform.startswith("linux") else None)
+_OVERFLOW_ANCILLARY_SIZE = socket.CMSG_SPACE(4) if hasattr(socket, "CMSG_SPACE") else 0
+_OVERFLOW_COUNT = struct.Struct("=I")
+
+
+def enable_overflow_count(sock: socket.socket) -> bool:
+    """ Asks the kernel to report the datagrams sock drops (see 
+    recv_into_counting_overflow). Returns False where that isn't supported. """
+    if SO_RXQ_OVFL is None or not hasattr(sock, "recvmsg_into"):
+        return False
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, SO_RXQ_OVFL, 1)
+    except OSError:
+        return False
+    return True
+
+
+def recv_into_counting_overflow(sock: socket.socket, buffer):
+    """ Receives a datagram into buffer, like sock.recv_into, on a socket 
+    set up with enable_overflow_count. Returns the number of bytes received 
+    and the number of datagrams the kernel has dropped so far (None if it 
+    didn't say, i.e. none had been dropped when this one was queued). """
+    nbytes, ancdata, flags, address = sock.recvmsg_into([buffer], _OVERFLOW_ANCILLARY_SIZE)
+    for level, kind, data in ancdata:
+        if level == socket.SOL_SOCKET and kind == SO_RXQ_OVFL and len(data) >= _OVERFLOW_COUNT.size:
+            return nbytes, _OVERFLOW_COUNT.unpack_from(data)[0]
+    return nbytes, None
+
+
+class PacketRingBuffer:
+    """Fixed-size ring of packet slots, filled by a single receiver thread and 
+    drained by a single consumer (e.g. the Blender timer).
+
+    All memory is allocated up front: packets are received straight into 
+    their slot, and the consumer reads memoryviews over the slots, so nothing 
+    is allocated per packet. When the ring is full, new packets are dropped 
+    (so nothing the consumer is reading is ever overwritten) and counted in 
+    ``overruns``.
+    """
+
+    def __init__(self, capacity: int = 4096, packet_size: int = MAX_PACKET_SIZE) -> None:
+        self.capacity = capacity
+        self.packet_size = packet_size
+        self._data = bytearray(capacity * packet_size)
+        view = memoryview(self._data)
+        self._slots = [view[i * packet_size:(i + 1) * packet_size] for i in range(capacity)]
+        self._lengths = [0] * capacity
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        # total number of packets written/released; only the producer 
+        # advances _head and only the consumer advances _tail
+        self._head = 0
+        self._tail = 0
+        self.overruns = 0
+
+    def __len__(self) -> int:
+        return self._head - self._tail
+
+    def reserve(self):
+        """ Returns the slot the next packet should be received into, or None 
+        if the ring is full. """
+        if self._head - self._tail >= self.capacity:
+            return None
+        return self._slots[self._head % self.capacity]
+
+    def commit(self, nbytes: int, timestamp: float) -> None:
+        """ Publishes the packet received into the last reserved slot. """
+        i = self._head % self.capacity
+        self._lengths[i] = nbytes
+        self.timestamps[i] = timestamp
+        self._head += 1
+
+    def read(self, max_count: int = None):
+        """ Returns the queued packets (oldest first) as a list of memoryviews, 
+        together with their arrival timestamps. The slots stay valid until 
+        they are handed back with release(). """
+        tail = self._tail
+        count = self._head - tail
+        if max_count is not None:
+            count = min(count, max_count)
+        datagrams = []
+        idx = np.empty(count, dtype=np.int64)
+        for k in range(count):
+            i = (tail + k) % self.capacity
+            datagrams.append(self._slots[i][:self._lengths[i]])
+            idx[k] = i
+        return datagrams, self.timestamps[idx]
+
+    def release(self, count: int) -> None:
+        """ Hands the oldest count slots back to the producer. """
+        self._tail += count
+
+    def clear(self) -> None:
+        """ Drops every queued packet and resets ``overruns``, e.g. before a 
+        new session. Only call it while no receiver thread is running. """
+        self._tail = self._head
+        self.overruns = 0
+
+
+class LiveLinkFaceReceiver(threading.Thread):
+    """Background thread that receives packets from a UDP socket into a 
+    PacketRingBuffer, timestamping each one on arrival (time.monotonic).
+
+    Reading the socket off the main thread means the kernel buffer keeps 
+    being drained while Blender is busy (saving, evaluating the depsgraph, 
+    running a modal operator), so frames are only lost if the ring itself 
+    overruns. Where the platform reports it, the number of packets the 
+    kernel dropped anyway is kept in ``kernel_drops``.
+    """
+
+    def __init__(self, sock: socket.socket, ring: PacketRingBuffer, 
+                    poll_interval: float = 0.1) -> None:
+        super().__init__(name="LiveLinkFaceReceiver", daemon=True)
+        self.sock = sock
+        self.ring = ring
+        self.poll_interval = poll_interval
+        self._stop_event = threading.Event()
+        # packets that arrive while the ring is full are received here and discarded
+        self._scratch = bytearray(ring.packet_size)
+        self.kernel_drops = 0
+        self.count_overflow = enable_overflow_count(sock)
+
+    def run(self) -> None:
+        self.sock.settimeout(self.poll_interval)
+        ring = self.ring
+        count_overflow = self.count_overflow
+        while not self._stop_event.is_set():
+            slot = ring.reserve()
+            try:
+                if count_overflow:
+                    nbytes, dropped = recv_into_counting_overflow(self.sock, self._scratch if slot is None else slot)
+                    if dropped is not None:
+                        self.kernel_drops = dropped
+                else:
+                    nbytes = self.sock.recv_into(self._scratch if slot is None else slot)
+            except socket.timeout:
+                continue
+            except OSError:
+                # the socket was closed underneath us
+                break
+            if slot is None:
+                ring.overruns += 1
+                continue
+            ring.commit(nbytes, time.monotonic())
+
+    def stop(self) -> None:
+        """ Stops the thread, waiting at most one poll interval for it to exit. """
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(self.poll_interval * 2)
@@ -0,0 +1,218 @@
+"""Headless recorder that captures LiveLinkFace streams straight to disk.
+
+    python -m livelinkface.record --port 11111 --output takes/
+
+Every valid face packet is appended, as received, to a capture file
+(``*.llfcap``): the magic CAPTURE_MAGIC followed by one record per packet,
+each a little-endian (arrival time as a float64 UNIX timestamp, uint16
+length) header and the raw packet bytes. Keeping the raw packets means
+nothing (device ids, subject names, sub-frames) is lost, and captures can be
+decoded later with PyLiveLinkFace.decode_batch, converted to takes or
+replayed.
+
+Writes go through a large fixed-size file buffer, so they are batched and
+memory use stays flat however long the session runs. Files are rotated by
+size and/or duration.
+"""
+import argparse
+import os
+import socket
+import struct
+import sys
+import time
+from typing import Iterator, Tuple
+import numpy as np
+
+from livelinkface.pylivelinkface import PyLiveLinkFace, MAX_PACKET_SIZE, ROW_SIZE, FRAME_COLUMN
+from livelinkface.receiver import enable_overflow_count, recv_into_counting_overflow
+
+CAPTURE_MAGIC = b"LLFCAP1\n"
+CAPTURE_EXTENSION = ".llfcap"
+_RECORD_HEADER = struct.Struct("<dH")
+
+
+class CaptureWriter:
+    """Appends packets to capture files, rotating to a new file once the
+    current one reaches ``rotate_bytes`` bytes or ``rotate_seconds`` seconds
+    (either can be 0 to disable it)."""
+
+    def __init__(self, directory: str, prefix: str = "livelinkface",
+                    rotate_bytes: int = 0, rotate_seconds: float = 0,
+                    buffer_size: int = 1 << 20) -> None:
+        self.directory = directory
+        self.prefix = prefix
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.buffer_size = buffer_size
+        self.files = []
+        self.packets = 0
+        self._file = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _open(self, now: float) -> None:
+        if self._file is not None:
+            self._file.close()
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(now))
+        name = f"{self.prefix}-{stamp}-{len(self.files):04d}"
+        # never append to an existing capture (e.g. from another recorder started in the same second),
+        # its magic would end up mid-file; add a suffix instead
+        suffix = 0
+        while True:
+            path = os.path.join(self.directory,
+                (name if suffix == 0 else f"{name}-{suffix}") + CAPTURE_EXTENSION)
+            try:
+                self._file = open(path, "xb", buffering=self.buffer_size)
+                break
+            except FileExistsError:
+                suffix += 1
+        self._file.write(CAPTURE_MAGIC)
+        self._opened = now
+        self._size = len(CAPTURE_MAGIC)
+        self.files.append(path)
+
+    def write(self, packet, timestamp: float) -> None:
+        """ Appends one packet (a bytes-like) received at timestamp. """
+        if self._file is None or \
+                (self.rotate_bytes and self._size >= self.rotate_bytes) or \
+                (self.rotate_seconds and timestamp - self._opened >= self.rotate_seconds):
+            self._open(timestamp)
+        self._file.write(_RECORD_HEADER.pack(timestamp, len(packet)))
+        self._file.write(packet)
+        self._size += _RECORD_HEADER.size + len(packet)
+        self.packets += 1
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def iter_capture(path: str) -> Iterator[Tuple[float, bytes]]:
+    """ Yields (arrival timestamp, packet) for every record in a capture file. """
+    with open(path, "rb") as f:
+        if f.read(len(CAPTURE_MAGIC)) != CAPTURE_MAGIC:
+            raise ValueError(f"{path} is not a LiveLinkFace capture")
+        while True:
+            header = f.read(_RECORD_HEADER.size)
+            if len(header) < _RECORD_HEADER.size:
+                return
+            timestamp, length = _RECORD_HEADER.unpack(header)
+            packet = f.read(length)
+            if len(packet) < length:
+                # truncated by a crash mid-write
+                return
+            yield timestamp, packet
+
+
+def read_capture(path: str) -> Tuple[np.ndarray, list]:
+    """ Reads a whole capture file, returning the arrival timestamps and the
+    packets (ready for PyLiveLinkFace.decode_batch). """
+    timestamps, packets = [], []
+    for timestamp, packet in iter_capture(path):
+        timestamps.append(timestamp)
+        packets.append(packet)
+    return np.array(timestamps, dtype=np.float64), packets
+
+
+class RecorderStats:
+    """Running packet counters, with per-device frame tracking so gaps in the
+    frame numbers can be reported as lost packets."""
+
+    def __init__(self) -> None:
+        self.received = 0
+        self.written = 0
+        self.malformed = 0
+        self.lost = 0
+        # dropped by the kernel because the socket's buffer was full (where the platform reports it)
+        self.kernel_drops = 0
+        self.last_frames = {}
+
+    def frame_received(self, device_id: bytes, frame: int) -> None:
+        last = self.last_frames.get(device_id)
+        if last is not None and frame > last + 1:
+            self.lost += frame - last - 1
+        if last is None or frame > last:
+            self.last_frames[device_id] = frame
+
+
+def record(host: str, port: int, writer: CaptureWriter, duration: float = 0,
+            stats_interval: float = 1.0, out=sys.stderr) -> RecorderStats:
+    """ Receives packets on host:port and appends every face packet to
+    writer until duration seconds have passed (0 records until interrupted).
+    Packets/sec, lost and malformed packets (and the packets the kernel
+    dropped because the socket's buffer was full, where the platform reports
+    it) are printed every stats_interval seconds. """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 << 20)
+    count_overflow = enable_overflow_count(sock)
+    sock.bind((host, port))
+    # always poll with a timeout, so duration (and Ctrl+C) are honoured even without stats
+    sock.settimeout(min(stats_interval, 0.5) if stats_interval > 0 else 0.5)
+
+    packet = bytearray(MAX_PACKET_SIZE)
+    view = memoryview(packet)
+    row = np.zeros(ROW_SIZE, dtype=np.float64)
+    stats = RecorderStats()
+    start = last_report = time.monotonic()
+    reported = 0
+    try:
+        while not duration or time.monotonic() - start < duration:
+            try:
+                if count_overflow:
+                    nbytes, dropped = recv_into_counting_overflow(sock, packet)
+                    if dropped is not None:
+                        stats.kernel_drops = dropped
+                else:
+                    nbytes = sock.recv_into(packet)
+                stats.received += 1
+                try:
+                    is_face = PyLiveLinkFace.decode_into(packet, row, nbytes)
+                except (ValueError, struct.error):
+                    is_face = False
+                    stats.malformed += 1
+                if is_face:
+                    device_id_len = struct.unpack_from("!i", packet, 1)[0]
+                    stats.frame_received(bytes(view[5:5 + device_id_len]), int(row[FRAME_COLUMN]))
+                    writer.write(view[:nbytes], time.time())
+                    stats.written += 1
+            except socket.timeout:
+                pass
+
+            now = time.monotonic()
+            if stats_interval > 0 and now - last_report >= stats_interval:
+                rate = (stats.received - reported) / (now - last_report)
+                print(f"{rate:8.1f} packets/s  {stats.written} written  {stats.lost} lost  "
+                      f"{stats.malformed} malformed  {stats.kernel_drops} kernel drops  {len(stats.last_frames)} devices  "
+                      f"{len(writer.files)} files", file=out)
+                last_report, reported = now, stats.received
+    except KeyboardInterrupt:
+        pass
+    finally:
+        writer.close()
+        sock.close()
+    return stats
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m livelinkface.record",
+        description="Record LiveLinkFace streams to capture files without Blender.")
+    parser.add_argument("--host", default="0.0.0.0", help="IP address of the interface to listen on")
+    parser.add_argument("--port", type=int, default=11111, help="UDP port to listen on")
+    parser.add_argument("--output", default=".", help="directory to write capture files to")
+    parser.add_argument("--prefix", default="livelinkface", help="capture file name prefix")
+    parser.add_argument("--rotate-mb", type=float, default=0, help="start a new file after this many megabytes (0 to disable)")
+    parser.add_argument("--rotate-minutes", type=float, default=0, help="start a new file after this many minutes (0 to disable)")
+    parser.add_argument("--duration", type=float, default=0, help="stop after this many seconds (0 to record until interrupted)")
+    parser.add_argument("--stats-interval", type=float, default=1.0, help="seconds between statistics reports (0 to disable)")
+    args = parser.parse_args(argv)
+
+    writer = CaptureWriter(args.output, args.prefix,
+        rotate_bytes=int(args.rotate_mb * (1 << 20)), rotate_seconds=args.rotate_minutes * 60)
+    print(f"Recording from {args.host}:{args.port} to {args.output}", file=sys.stderr)
+    stats = record(args.host, args.port, writer, args.duration, args.stats_interval)
+    print(f"Wrote {stats.written} packets to {len(writer.files)} files "
+          f"({stats.lost} lost, {stats.malformed} malformed, {stats.kernel_drops} dropped by the kernel)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
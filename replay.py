@@ -0,0 +1,276 @@
+"""Replays takes as a stand-in for the LiveLinkFace app.
+
+    python -m livelinkface.replay take.csv other.llftake --port 11111 --speed 2 --loop
+
+Every file becomes a subject (captures become one subject per device in
+them), encoded with PyLiveLinkFace and sent to host:port:
+
+- CSV files (the LiveLinkFace app's export, LIVE_LINK_FACE_HEADER columns)
+  and ``.llftake`` takes are sent at the times given by their frame numbers
+  and sub-frames. CSVs don't record their frame rate, so it is read from
+  their timecodes (see timecode.infer_framerate) unless given.
+- ``.llfcap`` captures are sent at the times the packets originally arrived,
+  so the jitter and reordering of the original stream are reproduced.
+
+speed scales the timing (2 replays at twice real-time, 0 as fast as
+possible). When looping, each subject starts over after its last frame with
+its frame numbers carrying on from where they stopped, so receivers see one
+continuous stream. Subjects can be duplicated (copies) to generate load, and
+packets can be dropped or swapped with the subject's next packet (loss,
+reorder) using a seeded random generator, so every run sends exactly the
+same packets.
+"""
+import argparse
+import heapq
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+from typing import List
+import numpy as np
+
+from livelinkface.pylivelinkface import PyLiveLinkFace, BLENDSHAPE_COUNT
+from livelinkface.record import read_capture, CAPTURE_EXTENSION
+from livelinkface.sender import wait_until
+from livelinkface.take import TakeReader, read_csv, TAKE_EXTENSION
+from livelinkface.timecode import infer_framerate, parse_timecodes
+from livelinkface.timing import frame_times
+
+# LiveLinkFace CSVs don't record their frame rate, this is assumed when it can't be read from their timecodes
+CSV_FPS = 60
+
+
+class ReplaySubject:
+    """A subject replayed by LiveLinkFaceReplayer: its PyLiveLinkFace and the
+    frames it sends, each at times[i] seconds from the start."""
+
+    def __init__(self, face: PyLiveLinkFace, times, frames, sub_frames, values) -> None:
+        self.face = face
+        self.times = np.asarray(times, dtype=np.float64)
+        self.frames = np.asarray(frames, dtype=np.int64)
+        self.sub_frames = np.asarray(sub_frames, dtype=np.float32)
+        self.values = np.ascontiguousarray(values, dtype=np.float32).reshape(-1, BLENDSHAPE_COUNT)
+        if not len(self.times) == len(self.frames) == len(self.sub_frames) == len(self.values):
+            raise ValueError("times, frames, sub_frames and values must have the same length")
+        if len(self.times) == 0:
+            raise ValueError(f"{face.name} has no frames to replay")
+        self.times -= self.times[0]
+        # one loop lasts a frame longer than the take, and the next one
+        # carries on from the frame after the last
+        period = face.denominator / face.fps
+        self.loop_seconds = float(self.times[-1]) + period
+        self.loop_frames = int(self.frames.max() - self.frames.min()) + 1
+        self.sent = 0
+        self.dropped = 0
+        self.reordered = 0
+
+
+class LiveLinkFaceReplayer:
+    """Sends every subject's frames to host:port at their recorded times,
+    scaled by speed (0 sends as fast as possible)."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 11111, speed: float = 1.0,
+                    loss: float = 0.0, reorder: float = 0.0, seed: int = None,
+                    sock: socket.socket = None) -> None:
+        if speed < 0:
+            raise ValueError("speed can't be negative")
+        self.address = (host, port)
+        self.speed = speed
+        self.loss = loss
+        self.reorder = reorder
+        self.subjects: List[ReplaySubject] = []
+        self.sock = sock if sock is not None else socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sent = 0
+        self.dropped = 0
+        self.reordered = 0
+        self._random = np.random.default_rng(seed)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add_subject(self, face: PyLiveLinkFace, times, frames, sub_frames, values) -> ReplaySubject:
+        subject = ReplaySubject(face, times, frames, sub_frames, values)
+        self.subjects.append(subject)
+        return subject
+
+    def add_csv(self, path: str, name: str = None, fps: int = None) -> ReplaySubject:
+        """ Adds a CSV in the LiveLinkFace app's format, recorded at fps (read
+        from its timecodes if not given). The packets carry that frame rate. """
+        timecodes, values = read_csv(path)
+        try:
+            if fps is None:
+                fps = infer_framerate(timecodes, default=CSV_FPS)
+            frames, sub_frames = parse_timecodes(timecodes, str(fps))
+            # takes running past midnight wrap back to 0
+            day = 24 * 3600 * fps
+            frames = frames + day * np.concatenate([[0], np.cumsum(np.diff(frames) < -day // 2)])
+        except ValueError:
+            fps = fps or CSV_FPS
+            frames, sub_frames = np.arange(len(values)), np.zeros(len(values))
+        face = _face(name or _file_name(path), fps)
+        return self.add_subject(face, frame_times(frames, sub_frames, fps), frames, sub_frames, values)
+
+    def add_take(self, path: str, name: str = None) -> ReplaySubject:
+        """ Adds a binary take (see take.py). """
+        take = TakeReader(path)
+        face = _face(name or _file_name(path), take.fps, take.denominator)
+        frames, sub_frames = np.array(take.frames), np.array(take.sub_frames)
+        return self.add_subject(face, frame_times(frames, sub_frames, take.fps, take.denominator),
+            frames, sub_frames, take.values)
+
+    def add_capture(self, path: str) -> List[ReplaySubject]:
+        """ Adds every device in a capture (see record.py) as a subject,
+        sending each packet at the time it arrived. """
+        timestamps, packets = read_capture(path)
+        batch = PyLiveLinkFace.decode_batch(packets)
+        subjects = []
+        for device_id in dict.fromkeys(batch.device_ids):
+            rows = np.flatnonzero(batch.device_ids == device_id)
+            first = rows[0]
+            face = _face(str(batch.names[first]), int(batch.fps[first]), int(batch.denominators[first]), device_id)
+            subjects.append(self.add_subject(face, timestamps[batch.indices[rows]],
+                batch.frames[rows], batch.sub_frames[rows], batch.blendshapes[rows]))
+        return subjects
+
+    def add_file(self, path: str, csv_fps: int = None) -> List[ReplaySubject]:
+        """ Adds a CSV (recorded at csv_fps, see add_csv), take or capture,
+        by its extension. """
+        extension = os.path.splitext(path)[1].lower()
+        if extension == CAPTURE_EXTENSION:
+            return self.add_capture(path)
+        if extension == TAKE_EXTENSION:
+            return [self.add_take(path)]
+        return [self.add_csv(path, fps=csv_fps)]
+
+    def copy_subject(self, subject: ReplaySubject, name: str) -> ReplaySubject:
+        """ Adds another subject sending the same frames under a new name
+        (and device id), e.g. to generate load. """
+        face = _face(name, subject.face.fps, subject.face.denominator)
+        return self.add_subject(face, subject.times, subject.frames, subject.sub_frames, subject.values)
+
+    def run(self, duration: float = None, loop: bool = False) -> None:
+        """ Sends every subject's frames, until they have all been sent (or
+        forever when looping), duration seconds of them have been replayed or
+        stop() is called. """
+        self._stop.clear()
+        speed = self.speed
+        # (due time in replay seconds, subject, frame index)
+        schedule = [(float(subject.times[0]), i, 0) for i, subject in enumerate(self.subjects)]
+        heapq.heapify(schedule)
+        held = [None] * len(self.subjects)
+        start = time.monotonic()
+        while schedule and not self._stop.is_set():
+            due, i, index = heapq.heappop(schedule)
+            if duration is not None and due >= duration:
+                break
+            if speed:
+                wait_until(start + due / speed)
+            subject = self.subjects[i]
+            loops, row = divmod(index, len(subject.times))
+            self._send(i, subject, row, int(subject.frames[row]) + loops * subject.loop_frames, held)
+
+            row += 1
+            if row == len(subject.times):
+                if not loop:
+                    if held[i] is not None:
+                        self._send_held(i, subject, held)
+                    continue
+                row = 0
+                loops += 1
+            heapq.heappush(schedule, (float(subject.times[row]) + loops * subject.loop_seconds,
+                i, loops * len(subject.times) + row))
+        for i, subject in enumerate(self.subjects):
+            if held[i] is not None:
+                self._send_held(i, subject, held)
+
+    def _send(self, i: int, subject: ReplaySubject, row: int, frames: int, held: list) -> None:
+        if self.loss and self._random.random() < self.loss:
+            subject.dropped += 1
+            self.dropped += 1
+            return
+        packet = subject.face.encode_view(frames, subject.values[row], float(subject.sub_frames[row]))
+        if self.reorder and held[i] is None and self._random.random() < self.reorder:
+            # hold back until after the subject's next packet
+            held[i] = bytes(packet)
+            return
+        self.sock.sendto(packet, self.address)
+        subject.sent += 1
+        self.sent += 1
+        if held[i] is not None:
+            self._send_held(i, subject, held)
+            subject.reordered += 1
+            self.reordered += 1
+
+    def _send_held(self, i: int, subject: ReplaySubject, held: list) -> None:
+        self.sock.sendto(held[i], self.address)
+        held[i] = None
+        subject.sent += 1
+        self.sent += 1
+
+    def start(self, **kwargs) -> None:
+        """ Runs the replay on a background thread (see run for the arguments). """
+        self._thread = threading.Thread(target=self.run, kwargs=kwargs, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self) -> None:
+        self.stop()
+        self.sock.close()
+
+
+def _file_name(path: str) -> str:
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def _face(name: str, fps: int, denominator: int = 1, device_id: str = None) -> PyLiveLinkFace:
+    # packets are only understood with a 36 character (UUID) device id, so
+    # derive a stable one from the name when there isn't one
+    if device_id is None or len(device_id) != 36:
+        device_id = str(uuid.uuid5(uuid.NAMESPACE_URL, f"livelinkface-replay/{device_id or name}"))
+    face = PyLiveLinkFace(name=name, uuid=device_id, fps=fps)
+    face.denominator = denominator
+    return face
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m livelinkface.replay",
+        description="Replay LiveLinkFace CSVs, takes and captures to a host/port, like the LiveLinkFace app.")
+    parser.add_argument("files", nargs="+", help=f"CSV, {TAKE_EXTENSION} or {CAPTURE_EXTENSION} files, replayed at the same time")
+    parser.add_argument("--host", default="127.0.0.1", help="IP address to send to")
+    parser.add_argument("--port", type=int, default=11111, help="UDP port to send to")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed (2 is twice real-time, 0 as fast as possible)")
+    parser.add_argument("--csv-fps", type=int, default=None, help="frame rate of the CSVs (read from their timecodes if not given)")
+    parser.add_argument("--loop", action="store_true", help="start each subject over after its last frame")
+    parser.add_argument("--duration", type=float, default=None, help="stop after this many seconds of replay")
+    parser.add_argument("--copies", type=int, default=1, help="send each subject this many times under different names")
+    parser.add_argument("--loss", type=float, default=0.0, help="probability of dropping each packet")
+    parser.add_argument("--reorder", type=float, default=0.0, help="probability of sending each packet after the next one")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the loss and reordering")
+    args = parser.parse_args(argv)
+
+    replayer = LiveLinkFaceReplayer(args.host, args.port, args.speed, args.loss, args.reorder, args.seed)
+    for path in args.files:
+        for subject in replayer.add_file(path, args.csv_fps):
+            for copy in range(1, args.copies):
+                replayer.copy_subject(subject, f"{subject.face.name}_{copy + 1}")
+    print(f"Replaying {len(replayer.subjects)} subjects to {args.host}:{args.port}", file=sys.stderr)
+    start = time.monotonic()
+    try:
+        replayer.run(args.duration, args.loop)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        replayer.close()
+    elapsed = time.monotonic() - start
+    print(f"Sent {replayer.sent} packets in {elapsed:.1f}s ({replayer.dropped} dropped, "
+          f"{replayer.reordered} reordered)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Rate-controlled sender for one or many LiveLinkFace subjects.
+
+    sender = LiveLinkFaceSender("127.0.0.1", 11111, fps=60)
+    sender.add_subject(PyLiveLinkFace(name="Face1"), values=take_values)
+    sender.add_subject(PyLiveLinkFace(name="Face2"))
+    sender.run(duration=10)
+
+Every tick (1/fps seconds, scheduled on time.monotonic so the rate doesn't
+drift) each subject's packet is encoded in place (PyLiveLinkFace.encode_view)
+and sent. All subjects share the same frame number, counted up from the
+time-of-day timecode the sender started at, so they stay in sync. Ticks that
+are missed entirely (e.g. the process was descheduled) are skipped rather
+than sent in a burst, and counted in ``late``.
+"""
+import socket
+import threading
+import time
+from typing import Callable, List
+import numpy as np
+
+from livelinkface.pylivelinkface import PyLiveLinkFace, BLENDSHAPE_COUNT
+from livelinkface.timecode import Timecode
+
+# sleep until this close to a tick, then spin, so ticks are sent on time
+# without busy waiting for the whole period
+_SPIN_SECONDS = 0.001
+
+
+def wait_until(due: float) -> None:
+    """ Waits until time.monotonic() reaches due. """
+    now = time.monotonic()
+    if now < due - _SPIN_SECONDS:
+        time.sleep(due - now - _SPIN_SECONDS)
+    while time.monotonic() < due:
+        pass
+
+
+class SenderSubject:
+    """A subject sent by LiveLinkFaceSender: its PyLiveLinkFace and,
+    optionally, the (N, 61) frames it loops through."""
+
+    def __init__(self, face: PyLiveLinkFace, values: np.ndarray = None) -> None:
+        self.face = face
+        self.values = None if values is None else \
+            np.ascontiguousarray(values, dtype=np.float32).reshape(-1, BLENDSHAPE_COUNT)
+        self.sent = 0
+
+
+class LiveLinkFaceSender:
+    """Sends every subject's packet to host:port fps times a second.
+
+    Subjects without values send the face's current blendshapes, which can
+    be updated between ticks (e.g. from the on_tick callback).
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 11111, fps: int = 60,
+                    sock: socket.socket = None) -> None:
+        if fps <= 0:
+            raise ValueError("fps must be greater than 0")
+        self.address = (host, port)
+        self.fps = fps
+        self.subjects: List[SenderSubject] = []
+        self.sock = sock if sock is not None else socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.ticks = 0
+        self.sent = 0
+        self.late = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add_subject(self, face: PyLiveLinkFace, values: np.ndarray = None) -> SenderSubject:
+        """ Adds a subject, sending values (if given) a row per tick, looping. """
+        subject = SenderSubject(face, values)
+        self.subjects.append(subject)
+        return subject
+
+    def send_tick(self, tick: int, frames: int) -> None:
+        """ Encodes and sends every subject's packet for one tick. """
+        for subject in self.subjects:
+            values = None if subject.values is None else subject.values[tick % len(subject.values)]
+            self.sock.sendto(subject.face.encode_view(frames, values), self.address)
+            subject.sent += 1
+        self.sent += len(self.subjects)
+
+    def run(self, duration: float = None, ticks: int = None,
+            on_tick: Callable[[int], None] = None) -> None:
+        """ Sends ticks until duration seconds or the given number of ticks
+        have passed, or until stop() is called. on_tick(tick) is called
+        before each tick is sent. """
+        self._stop.clear()
+        period = 1.0 / self.fps
+        start = time.monotonic()
+        start_frame = Timecode.from_clock(self.fps).frames
+        tick = 0
+        while not self._stop.is_set():
+            if ticks is not None and tick >= ticks:
+                break
+            due = start + tick * period
+            if duration is not None and due - start >= duration:
+                break
+            wait_until(due)
+            if on_tick is not None:
+                on_tick(tick)
+            self.send_tick(tick, start_frame + tick)
+            self.ticks += 1
+            # skip any ticks that are already over instead of sending them late
+            behind = int((time.monotonic() - start) / period) - tick
+            if behind > 1:
+                self.late += behind - 1
+                tick += behind
+            else:
+                tick += 1
+
+    def start(self, **kwargs) -> None:
+        """ Runs the sender on a background thread (see run for the arguments). """
+        self._thread = threading.Thread(target=self.run, kwargs=kwargs, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self) -> None:
+        self.stop()
+        self.sock.close()
@@ -0,0 +1,293 @@
+"""Offline takes: the compact binary take format (``*.llftake``) and a
+streaming reader for the CSVs exported by the LiveLinkFace app (read_csv).
+
+A take is a fixed little-endian header, the channel names, then one
+fixed-size row per frame and finally a sparse frame index:
+
+    header      TAKE_MAGIC, version, channel count, fps numerator/denominator,
+                start timecode, frame count, index stride and the offsets of
+                the rows and of the index
+    names       the channel names, utf-8, newline separated
+    rows        (int32 frame number, float32 sub-frame, float32 value per
+                channel) for every frame, in frame order
+    index       (row, frame number) int64 pairs for every index_stride-th row
+
+The rows are read with np.memmap, so opening a take costs the same however
+long it is and scrubbing only pages in the frames that are actually touched.
+Seeking to a frame number or timecode bisects the sparse index and then a
+single index_stride block of the frame column (O(log n)).
+"""
+import itertools
+import multiprocessing
+import struct
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from typing import Tuple
+import numpy as np
+
+from livelinkface.pylivelinkface import PyLiveLinkFace, LIVE_LINK_FACE_HEADER, BLENDSHAPE_COUNT
+from livelinkface.timecode import Timecode
+
+TAKE_MAGIC = b"LLFTAKE1"
+TAKE_VERSION = 1
+TAKE_EXTENSION = ".llftake"
+# the ARKit blendshape ids, as used for the channels of takes written from packets or CSVs
+TAKE_CHANNELS = LIVE_LINK_FACE_HEADER[2:]
+
+# magic, version, channel count, fps, denominator, start timecode,
+# frame count, index stride, rows offset, index offset
+_HEADER = struct.Struct("<8sHHii16sqIqq")
+_INDEX_DTYPE = np.dtype([("row", "<i8"), ("frame", "<i8")])
+
+
+def row_dtype(channel_count: int) -> np.dtype:
+    """ The on-disk dtype of a single frame row. """
+    return np.dtype([("frame", "<i4"), ("sub_frame", "<f4"),
+                     ("values", "<f4", (channel_count,))])
+
+
+class TakeWriter:
+    """Writes a take, appending frames as they arrive.
+
+    Rows can be appended in any number of calls (so the writer can be fed
+    from a live stream). The frame count and the index are written by
+    close(); a take that was never closed is still readable, its rows are
+    just found from the file size and it has no index.
+    """
+
+    def __init__(self, path: str, channel_names=TAKE_CHANNELS, fps: int = 60,
+                    denominator: int = 1, start_timecode: str = "00:00:00:00",
+                    index_stride: int = 256) -> None:
+        self.path = path
+        self.channel_names = list(channel_names)
+        self.fps = fps
+        self.denominator = denominator
+        self.start_timecode = start_timecode
+        self.index_stride = index_stride
+        self.frame_count = 0
+        self._dtype = row_dtype(len(self.channel_names))
+        self._index = []
+
+        names = "\n".join(self.channel_names).encode("utf-8")
+        # keep the rows 8-byte aligned
+        names += b"\0" * (-(_HEADER.size + 4 + len(names)) % 8)
+        self._rows_offset = _HEADER.size + 4 + len(names)
+        self._file = open(path, "wb")
+        self._write_header(0)
+        self._file.write(struct.pack("<I", len(names)))
+        self._file.write(names)
+
+    def _write_header(self, index_offset: int) -> None:
+        self._file.write(_HEADER.pack(
+            TAKE_MAGIC, TAKE_VERSION, len(self.channel_names), self.fps,
+            self.denominator, self.start_timecode.encode("ascii"),
+            self.frame_count, self.index_stride, self._rows_offset, index_offset))
+
+    def write(self, frames, sub_frames, values) -> None:
+        """ Appends rows. frames/sub_frames are (N,) and values is
+        (N, channel count); frames must keep increasing across calls. """
+        values = np.asarray(values, dtype=np.float32)
+        rows = np.empty(len(values), dtype=self._dtype)
+        rows["frame"] = frames
+        rows["sub_frame"] = sub_frames
+        rows["values"] = values
+        first = -self.frame_count % self.index_stride
+        for k in range(first, len(rows), self.index_stride):
+            self._index.append((self.frame_count + k, int(rows["frame"][k])))
+        self._file.write(rows.tobytes())
+        self.frame_count += len(rows)
+
+    def close(self) -> None:
+        if self._file is None:
+            return
+        index_offset = self._file.tell()
+        self._file.write(np.array(self._index, dtype=_INDEX_DTYPE).tobytes())
+        self._file.seek(0)
+        self._write_header(index_offset)
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class TakeReader:
+    """Memory-mapped take reader.
+
+    ``frames``, ``sub_frames`` and ``values`` are views into the mapped file,
+    so nothing is read until it is used.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size or header[:8] != TAKE_MAGIC:
+                raise ValueError(f"{path} is not a LiveLinkFace take")
+            (_, version, channel_count, self.fps, self.denominator, start_timecode,
+                frame_count, self.index_stride, rows_offset, index_offset) = _HEADER.unpack(header)
+            if version > TAKE_VERSION:
+                raise ValueError(f"{path} is a version {version} take, only versions up to {TAKE_VERSION} are supported")
+            names_length = struct.unpack("<I", f.read(4))[0]
+            names = f.read(names_length).rstrip(b"\0").decode("utf-8")
+            f.seek(0, 2)
+            file_size = f.tell()
+
+        self.channel_names = names.split("\n") if names else []
+        self.start_timecode = start_timecode.rstrip(b"\0").decode("ascii")
+        self.dtype = row_dtype(channel_count)
+        if index_offset == 0:
+            # never closed, so recover whatever whole rows made it to disk
+            frame_count = (file_size - rows_offset) // self.dtype.itemsize
+        self.frame_count = frame_count
+        self.rows = np.memmap(path, dtype=self.dtype, mode="r",
+                              offset=rows_offset, shape=(frame_count,)) if frame_count > 0 \
+            else np.zeros(0, dtype=self.dtype)
+        if index_offset > 0 and file_size > index_offset:
+            self.index = np.memmap(path, dtype=_INDEX_DTYPE, mode="r", offset=index_offset)
+        else:
+            self.index = np.zeros(0, dtype=_INDEX_DTYPE)
+
+    def __len__(self) -> int:
+        return self.frame_count
+
+    @property
+    def frames(self) -> np.ndarray:
+        return self.rows["frame"]
+
+    @property
+    def sub_frames(self) -> np.ndarray:
+        return self.rows["sub_frame"]
+
+    @property
+    def values(self) -> np.ndarray:
+        return self.rows["values"]
+
+    @property
+    def framerate(self) -> str:
+        """ The frame rate in the form Timecode expects. """
+        return str(self.fps) if self.denominator == 1 else f"{self.fps}/{self.denominator}"
+
+    def find_frame(self, frame: int) -> int:
+        """ Returns the row of the first frame at or after the given frame
+        number (len(self) if there is none). """
+        lo, hi = 0, self.frame_count
+        if len(self.index) > 0:
+            block = int(np.searchsorted(self.index["frame"], frame, side="right")) - 1
+            if block >= 0:
+                lo = int(self.index["row"][block])
+            if block + 1 < len(self.index):
+                hi = int(self.index["row"][block + 1])
+        return lo + int(np.searchsorted(self.frames[lo:hi], frame))
+
+    def find_timecode(self, timecode: str) -> int:
+        """ Returns the row of the first frame at or after the given timecode. """
+        return self.find_frame(Timecode(self.framerate, timecode).frames)
+
+    def read(self, start: int = 0, stop: int = None) -> Tuple[np.ndarray, np.ndarray]:
+        """ Returns the frame numbers and the (N, channel count) values of
+        rows [start, stop), copied out of the mapping. """
+        rows = self.rows[start:stop]
+        return np.array(rows["frame"]), np.array(rows["values"])
+
+
+def capture_to_take(packets, path: str, device_id: str = None,
+                    index_stride: int = 256) -> int:
+    """ Writes a take from raw packets (e.g. from record.read_capture), keeping
+    a single device (the first one seen, unless device_id is given) and
+    dropping duplicated frames. Returns the number of frames written. """
+    batch = PyLiveLinkFace.decode_batch(packets)
+    if len(batch.frames) == 0:
+        raise ValueError("No faces found in the packets")
+    if device_id is None:
+        device_id = batch.device_ids[0]
+    selected = np.flatnonzero(batch.device_ids == device_id)
+    frames, first = np.unique(batch.frames[selected], return_index=True)
+    rows = selected[first]
+    fps, denominator = int(batch.fps[rows[0]]), int(batch.denominators[rows[0]])
+    framerate = str(fps) if denominator == 1 else f"{fps}/{denominator}"
+    start_timecode = repr(Timecode(framerate, frames=max(int(frames[0]), 1)))
+    with TakeWriter(path, TAKE_CHANNELS, fps, denominator, start_timecode, index_stride) as writer:
+        writer.write(frames, batch.sub_frames[rows], batch.blendshapes[rows])
+    return len(frames)
+
+
+def read_csv(path: str, chunk_rows: int = 4096) -> Tuple[np.ndarray, np.ndarray]:
+    """ Reads a CSV in the LiveLinkFace app's format (a header line, then one
+    line per frame: timecode, blendshape count, weights).
+
+    The file is streamed chunk_rows lines at a time and each chunk is parsed
+    straight into float32 by NumPy, so no Python object is kept per cell.
+    Columns are matched to ARKit blendshape ids by their header name
+    (missing ones are left at zero).
+
+    Returns the (N,) timecode strings and the (N, 61) float32 weights, with
+    columns ordered as TAKE_CHANNELS.
+    """
+    with open(path, "r") as csv_file:
+        header = csv_file.readline().strip().split(",")
+        columns = [i for i, name in enumerate(header) if name in TAKE_CHANNELS]
+        channels = [TAKE_CHANNELS.index(header[i]) for i in columns]
+        timecodes, chunks = [], []
+        while True:
+            lines = [line for line in itertools.islice(csv_file, chunk_rows) if line.strip()]
+            if not lines:
+                break
+            timecodes.extend(line.partition(",")[0] for line in lines)
+            chunk = np.loadtxt(lines, delimiter=",", usecols=columns, dtype=np.float32, ndmin=2)
+            if channels == list(range(BLENDSHAPE_COUNT)):
+                chunks.append(chunk)
+            else:
+                values = np.zeros((len(lines), BLENDSHAPE_COUNT), dtype=np.float32)
+                values[:, channels] = chunk
+                chunks.append(values)
+    values = np.concatenate(chunks) if chunks else np.zeros((0, BLENDSHAPE_COUNT), dtype=np.float32)
+    return np.array(timecodes, dtype=str), values
+
+
+class ParallelCSVReader:
+    """Parses many CSV takes in parallel, in a pool of worker processes.
+
+    Each worker runs read_csv and sends back only the compact (timecodes,
+    values) arrays, so the calling process (e.g. Blender's main thread) is
+    free while the files are parsed. Results are collected with poll(), which
+    never blocks unless asked to, so it can be driven from a timer or modal
+    operator. Workers are spawned rather than forked, so they don't inherit
+    the state of the host application.
+    """
+
+    def __init__(self, paths, max_workers: int = None) -> None:
+        self.paths = list(paths)
+        self.executor = ProcessPoolExecutor(max_workers,
+            mp_context=multiprocessing.get_context("spawn"))
+        self.pending = { self.executor.submit(read_csv, path): path for path in self.paths }
+        self.completed = 0
+
+    @property
+    def done(self) -> bool:
+        return not self.pending
+
+    def poll(self, timeout: float = 0):
+        """ Returns (path, (timecodes, values), None) for each take parsed
+        since the last call, or (path, None, exception) if it failed. Waits up
+        to timeout seconds (None waits indefinitely) for at least one. """
+        if not self.pending:
+            return []
+        finished, _ = wait(self.pending, timeout, return_when=FIRST_COMPLETED)
+        results = []
+        for future in finished:
+            path = self.pending.pop(future)
+            error = future.exception()
+            results.append((path, None if error else future.result(), error))
+        self.completed += len(results)
+        return results
+
+    def cancel(self) -> None:
+        """ Drops every take that hasn't started parsing and shuts the pool down. """
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.pending.clear()
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True)
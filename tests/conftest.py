@@ -0,0 +1,13 @@
+import importlib.util
+import os
+import sys
+
+# The repository is the livelinkface package (a Blender add-on, whose
+# __init__ only registers itself inside Blender), so make it importable as
+# livelinkface whatever directory it is checked out in.
+if "livelinkface" not in sys.modules:
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    spec = importlib.util.spec_from_file_location("livelinkface", os.path.join(root, "__init__.py"),
+        submodule_search_locations=[root])
+    module = sys.modules["livelinkface"] = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
@@ -0,0 +1,113 @@
+import numpy as np
+import pytest
+
+from livelinkface import fakebpy
+from livelinkface.pylivelinkface import BLENDSHAPE_COUNT, LIVE_LINK_FACE_HEADER, FaceBlendShape
+from livelinkface.timecode import format_timecodes
+
+fakebpy.install()
+import livelinkface.bpylivelinkface as llf
+
+
+@pytest.fixture(autouse=True)
+def fresh_bpy(monkeypatch):
+    fakebpy.reset()
+    # check for renamed/new channels on every write
+    monkeypatch.setattr(llf, "CHANNEL_CHECK_INTERVAL", 0)
+
+
+def ramp() -> np.ndarray:
+    return np.arange(BLENDSHAPE_COUNT, dtype=np.float32) / 100
+
+
+def shape_key_value(target, name: str, frame: int) -> float:
+    return float(target.sk_frame_data[target.target.data.shape_keys.key_blocks.find(name), frame, 1])
+
+
+def test_renamed_shape_keys_are_remapped():
+    obj = fakebpy.make_object("Face")
+    target = llf.LiveLinkTarget(obj, num_frames=4)
+    target.set_frame_values(0, ramp())
+    assert shape_key_value(target, "EyeBlinkLeft", 0) == ramp()[FaceBlendShape.EyeBlinkLeft.value]
+
+    # swapping two names keeps the number of shape keys
+    key_blocks = obj.data.shape_keys.key_blocks
+    key_blocks["EyeBlinkLeft"].name = "Swap"
+    key_blocks["EyeLookDownLeft"].name = "EyeBlinkLeft"
+    key_blocks["Swap"].name = "EyeLookDownLeft"
+    target.set_frame_values(1, ramp())
+    target.set_frame_value(FaceBlendShape.EyeBlinkLeft.value, 2, 0.5)
+    assert shape_key_value(target, "EyeBlinkLeft", 1) == ramp()[FaceBlendShape.EyeBlinkLeft.value]
+    assert shape_key_value(target, "EyeLookDownLeft", 1) == ramp()[FaceBlendShape.EyeLookDownLeft.value]
+    assert shape_key_value(target, "EyeBlinkLeft", 2) == 0.5
+
+
+def test_custom_properties_added_mid_session_are_mapped():
+    obj = fakebpy.make_object("Face", shape_keys=fakebpy.ARKIT_SHAPE_KEYS[:10])
+    target = llf.LiveLinkTarget(obj, num_frames=4, action_name="Take")
+    assert "JawOpen" not in target.custom_props
+
+    obj["JawOpen"] = 0.0
+    target.set_frame_value(FaceBlendShape.JawOpen.value, 1, 0.75)
+    i = target.custom_props.index("JawOpen")
+    assert target.custom_prop_framedata[i, 1, 1] == 0.75
+    target.update_keyframes()
+    assert target.custom_prop_fcurves[i].data_path == '["JawOpen"]'
+    assert target.custom_prop_fcurves[i].evaluate(1) == 0.75
+
+
+def test_each_take_keeps_its_own_custom_property_curves():
+    obj = fakebpy.make_object("Face", shape_keys=fakebpy.ARKIT_SHAPE_KEYS[:10])
+    obj["JawOpen"] = 0.0
+    bpy = fakebpy.install()
+    user_action = bpy.data.actions.new("Bones")
+    user_action.fcurves.new('pose.bones["jaw"].rotation_euler')
+    obj.animation_data_create().action = user_action
+
+    takes = {}
+    for name, weight in (("TakeA", 0.25), ("TakeB", 0.5)):
+        values = np.full((3, BLENDSHAPE_COUNT), weight, dtype=np.float32)
+        target, = llf.LiveLinkTarget.from_values([obj], values, action_name=name)
+        takes[name] = target.custom_prop_action
+
+    assert takes["TakeA"] is not takes["TakeB"]
+    for name, weight in (("TakeA", 0.25), ("TakeB", 0.5)):
+        assert takes[name].name == f"{name}_customprop"
+        assert takes[name].fcurves.find('["JawOpen"]').evaluate(1) == weight
+    assert obj.animation_data.action is takes["TakeB"]
+    # the user's action is left alone, and still plays from an NLA track (just the one)
+    assert [fcurve.data_path for fcurve in user_action.fcurves] == ['pose.bones["jaw"].rotation_euler']
+    assert [strip.action for track in obj.animation_data.nla_tracks for strip in track.strips] == [user_action]
+
+
+def write_csv(path, frames, values, fps=60):
+    with open(path, "w") as f:
+        f.write(",".join(LIVE_LINK_FACE_HEADER) + "\n")
+        for timecode, row in zip(format_timecodes(frames, str(fps), np.zeros(len(frames))), values):
+            f.write(f"{timecode},{BLENDSHAPE_COUNT}," + ",".join(f"{v:.6f}" for v in row) + "\n")
+
+
+def test_csv_rows_are_keyed_on_their_timecodes(tmp_path):
+    # rows 3 and 4 were dropped; the timecodes are two minutes in, and cross a second (so the frame rate can be read from them)
+    frames = np.array([0, 1, 2, 5, 6]) + 3627
+    values = np.outer(np.arange(5), ramp())
+    write_csv(str(tmp_path / "take.csv"), frames, values, fps=30)
+    obj = fakebpy.make_object("Face")
+    target, = llf.LiveLinkTarget.from_csv([obj], str(tmp_path / "take.csv"), action_name="Take")
+    fcurve = target.sk_fcurves[obj.data.shape_keys.key_blocks.find("JawOpen")]
+    assert [point.co[0] for point in fcurve.keyframe_points] == [0, 1, 2, 5, 6]
+    # the gap is interpolated over by the curve, and still is once decimated
+    jaw_open = values[:, FaceBlendShape.JawOpen.value]
+    assert fcurve.evaluate(4) == pytest.approx(jaw_open[2] + (jaw_open[3] - jaw_open[2]) * 2 / 3, abs=1e-6)
+    target.decimate(1e-4)
+    fcurve = target.sk_fcurves[obj.data.shape_keys.key_blocks.find("JawOpen")]
+    assert [point.co[0] for point in fcurve.keyframe_points] == [0, 2, 5, 6]
+
+
+def test_csv_rows_are_resampled_onto_a_rate(tmp_path):
+    frames = np.array([0, 1, 2, 5, 6]) + 3627
+    write_csv(str(tmp_path / "take.csv"), frames, np.outer(np.arange(5), ramp()), fps=30)
+    obj = fakebpy.make_object("Face")
+    target, = llf.LiveLinkTarget.from_csv([obj], str(tmp_path / "take.csv"), action_name="Take", rate=60)
+    fcurve = target.sk_fcurves[obj.data.shape_keys.key_blocks.find("JawOpen")]
+    assert [point.co[0] for point in fcurve.keyframe_points] == list(range(13))
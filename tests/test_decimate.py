@@ -0,0 +1,48 @@
+import numpy as np
+
+from livelinkface.decimate import simplify_mask
+
+
+def reconstruct(values, keep, times):
+    """ Linearly interpolates every curve between its kept keys. """
+    return np.array([np.interp(times, times[mask], curve[mask]) for curve, mask in zip(values, keep)])
+
+
+def takes():
+    random = np.random.default_rng(0)
+    yield np.clip(np.cumsum(random.normal(0, 0.02, (8, 5000)), axis=1) + random.normal(0, 0.005, (8, 5000)), 0, 1)
+    yield random.random((4, 300))
+    # flat stretches and steps, where many keys tie for the worst
+    yield np.round(random.random((4, 200)) * 3) / 3
+
+
+def test_dropped_keys_are_within_tolerance():
+    for values in takes():
+        times = np.arange(values.shape[1], dtype=np.float64)
+        for tolerance in (0.0, 0.001, 0.01, 0.1):
+            keep = simplify_mask(values, tolerance)
+            assert keep[:, 0].all() and keep[:, -1].all()
+            assert np.abs(reconstruct(values, keep, times) - values).max() <= tolerance + 1e-9
+
+
+def test_uneven_times():
+    values = np.random.default_rng(1).random((3, 400))
+    times = np.cumsum(np.random.default_rng(2).random(400) + 0.1)
+    keep = simplify_mask(values, 0.05, times)
+    assert np.abs(reconstruct(values, keep, times) - values).max() <= 0.05 + 1e-9
+
+
+def test_curves_are_simplified_independently_of_their_chunk(monkeypatch):
+    values = next(takes())
+    keep = simplify_mask(values, 0.01)
+    for chunk_keys in (1, 12000, 1 << 20):
+        monkeypatch.setattr("livelinkface.decimate.CHUNK_KEYS", chunk_keys)
+        np.testing.assert_array_equal(simplify_mask(values, 0.01), keep)
+    np.testing.assert_array_equal(simplify_mask(values[3], 0.01), keep[3])
+
+
+def test_lines_keep_only_their_ends():
+    keep = simplify_mask(np.linspace(0, 1, 100), 1e-9)
+    assert np.flatnonzero(keep).tolist() == [0, 99]
+    assert simplify_mask(np.zeros((2, 2)), 0.1).all()
+    assert simplify_mask(np.zeros((2, 0)), 0.1).shape == (2, 0)
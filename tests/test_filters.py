@@ -0,0 +1,134 @@
+import math
+from collections import deque
+from statistics import mean
+
+import numpy as np
+import pytest
+
+from livelinkface.filters import ExponentialFilter, MovingAverageFilter, OneEuroFilter, create_filter, \
+    FILTER_AVERAGE, FILTER_EXPONENTIAL, FILTER_NONE, FILTER_ONE_EURO
+from livelinkface.pylivelinkface import PyLiveLinkFace, FaceBlendShape
+
+CHANNELS = 4
+
+
+def signal(frames=50, channels=CHANNELS, seed=0):
+    return np.random.default_rng(seed).random((frames, channels))
+
+
+# straightforward one channel, one value at a time versions of the filters
+
+def reference_average(values, size):
+    window = deque(maxlen=int(size))
+    out = []
+    for value in values:
+        window.append(value)
+        out.append(mean(window))
+    return out
+
+
+def reference_exponential(values, alpha):
+    out, y = [], None
+    for value in values:
+        y = value if y is None else y + alpha * (value - y)
+        out.append(y)
+    return out
+
+
+def reference_one_euro(values, min_cutoff, beta, d_cutoff, rate):
+    def alpha(cutoff):
+        tau = 1.0 / (2 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau * rate)
+    out, y, dy = [], None, 0.0
+    for value in values:
+        if y is None:
+            y = value
+        else:
+            dy += alpha(d_cutoff) * ((value - y) * rate - dy)
+            y += alpha(min_cutoff + beta * abs(dy)) * (value - y)
+        out.append(y)
+    return out
+
+
+def reference(filter_kind, values, params):
+    """ Runs the reference over every channel of (N, channels) values, with
+    per-channel params. """
+    columns = []
+    for channel in range(values.shape[1]):
+        channel_params = { name: np.broadcast_to(value, (values.shape[1],))[channel] for name, value in params.items() }
+        columns.append(filter_kind(values[:, channel].tolist(), **channel_params))
+    return np.array(columns).T
+
+
+CASES = [
+    (MovingAverageFilter, reference_average, { "size": 3 }),
+    (MovingAverageFilter, reference_average, { "size": [1, 2, 5, 8] }),
+    (ExponentialFilter, reference_exponential, { "alpha": 0.3 }),
+    (ExponentialFilter, reference_exponential, { "alpha": [1.0, 0.5, 0.2, 0.05] }),
+    (OneEuroFilter, reference_one_euro, { "min_cutoff": 1.0, "beta": 0.0, "d_cutoff": 1.0, "rate": 60 }),
+    (OneEuroFilter, reference_one_euro, { "min_cutoff": [0.5, 1.0, 2.0, 4.0], "beta": [0.0, 0.1, 1.0, 10.0], "d_cutoff": 1.5, "rate": 30 }),
+]
+
+
+@pytest.mark.parametrize("filter_class, reference_filter, params", CASES)
+def test_update_matches_the_reference(filter_class, reference_filter, params):
+    values = signal()
+    expected = reference(reference_filter, values, params)
+    frame_filter = filter_class(channels=CHANNELS, **params)
+    np.testing.assert_allclose([frame_filter.update(frame) for frame in values], expected, rtol=1e-12, atol=1e-12)
+
+
+@pytest.mark.parametrize("filter_class, reference_filter, params", CASES)
+def test_process_matches_the_reference(filter_class, reference_filter, params):
+    values = signal()
+    expected = reference(reference_filter, values, params)
+    take_filter = filter_class(channels=CHANNELS, **params)
+    # continues from the state left by the first half, and starts over after reset
+    np.testing.assert_allclose(np.concatenate([take_filter.process(values[:20]), take_filter.process(values[20:])]),
+        expected, rtol=1e-12, atol=1e-12)
+    take_filter.reset()
+    np.testing.assert_allclose(take_filter.process(values), expected, rtol=1e-12, atol=1e-12)
+
+
+@pytest.mark.parametrize("filter_class, reference_filter, params", CASES)
+def test_single_channel_updates_leave_the_others_alone(filter_class, reference_filter, params):
+    values = signal()
+    expected = reference(reference_filter, values, params)
+    channel_filter = filter_class(channels=CHANNELS, **params)
+    out = np.empty(values.shape)
+    # channel 0 on every frame, the others interleaved with it one by one
+    for k, frame in enumerate(values):
+        out[k, 0] = channel_filter.update(frame[0], 0)
+        out[k, 1:] = channel_filter.update(frame[1:], slice(1, None))
+    np.testing.assert_allclose(out, expected, rtol=1e-12, atol=1e-12)
+
+
+def test_one_euro_uses_the_given_time_step():
+    values = signal(channels=1)
+    one_euro = OneEuroFilter(min_cutoff=1.0, beta=0.5, rate=60, channels=1)
+    out = [one_euro.update(frame, dt=1 / 30)[0] for frame in values]
+    np.testing.assert_allclose(out, reference_one_euro(values[:, 0], 1.0, 0.5, 1.0, 30), rtol=1e-12, atol=1e-12)
+
+
+def test_create_filter():
+    assert create_filter(FILTER_NONE) is None
+    assert isinstance(create_filter(FILTER_AVERAGE, size=2), MovingAverageFilter)
+    assert isinstance(create_filter(FILTER_EXPONENTIAL), ExponentialFilter)
+    assert isinstance(create_filter(FILTER_ONE_EURO), OneEuroFilter)
+    with pytest.raises(ValueError):
+        create_filter("median")
+    with pytest.raises(ValueError):
+        ExponentialFilter(alpha=0)
+
+
+def test_set_blendshape_averages_from_a_rest_pose():
+    # the original filtering: a mean over a deque of the last filter_size values, starting with a 0
+    face = PyLiveLinkFace(filter_size=3)
+    history = deque([0.0], maxlen=3)
+    for value in signal(channels=1)[:, 0]:
+        face.set_blendshape(FaceBlendShape.JawOpen, value)
+        history.append(value)
+        assert face.get_blendshape(FaceBlendShape.JawOpen) == pytest.approx(mean(history), abs=1e-12)
+    face.set_blendshape(FaceBlendShape.JawOpen, 0.25, no_filter=True)
+    assert face.get_blendshape(FaceBlendShape.JawOpen) == 0.25
+    assert face.get_blendshape(FaceBlendShape.EyeBlinkLeft) == 0.0
@@ -0,0 +1,98 @@
+import numpy as np
+
+from livelinkface.jitter import JitterBuffer
+
+CHANNELS = 3
+
+
+def weights(frames):
+    """ Values that are linear in the frame number, so interpolated frames
+    can be checked exactly. """
+    frames = np.asarray(frames, dtype=np.float32)
+    return np.stack([frames / 100, frames / 200, 1 - frames / 100], axis=1)
+
+
+def push(buffer, frames, arrival, sub_frames=None):
+    frames = np.asarray(frames)
+    buffer.push(frames, np.zeros(len(frames)) if sub_frames is None else sub_frames, weights(frames),
+        np.full(len(frames), arrival))
+
+
+def test_packets_are_released_in_order_after_the_latency():
+    buffer = JitterBuffer(latency=0.1, channels=CHANNELS)
+    push(buffer, [3, 1, 2], arrival=10.0)
+    push(buffer, [5, 4], arrival=10.05)
+    assert len(buffer.pop(now=10.05).frames) == 0
+    released = buffer.pop(now=10.1)
+    assert released.frames.tolist() == [1, 2, 3]
+    np.testing.assert_array_equal(released.values, weights([1, 2, 3]))
+    assert not released.interpolated.any()
+    assert len(buffer) == 2
+    assert buffer.pop(now=10.15).frames.tolist() == [4, 5]
+    assert (buffer.received, buffer.late, buffer.duplicates, buffer.interpolated, buffer.lost) == (5, 0, 0, 0, 0)
+
+
+def test_older_packets_are_released_with_a_ready_one():
+    buffer = JitterBuffer(latency=0.1, channels=CHANNELS)
+    push(buffer, [2], arrival=10.0)
+    # arrived later, but older than the packet that is ready
+    push(buffer, [1, 3], arrival=10.08)
+    assert buffer.pop(now=10.1).frames.tolist() == [1, 2]
+    assert buffer.flush().frames.tolist() == [3]
+
+
+def test_sub_frames_are_ordered_within_a_frame():
+    buffer = JitterBuffer(latency=0, channels=CHANNELS)
+    buffer.push([7, 7, 6], np.float32([0.5, 0.0, 0.0]), weights([7, 7, 6]), [1.0, 1.0, 1.0])
+    released = buffer.pop(now=1.0)
+    assert released.frames.tolist() == [6, 7, 7]
+    assert released.sub_frames.tolist() == [0.0, 0.0, 0.5]
+
+
+def test_short_gaps_are_interpolated_and_long_ones_lost():
+    buffer = JitterBuffer(latency=0, max_gap=2, channels=CHANNELS)
+    push(buffer, [10, 12, 15, 16], arrival=1.0)
+    released = buffer.pop(now=1.0)
+    # 11 is filled in, 13-14 is a gap of 2 so is too; the next batch's gap (17-19) is lost
+    assert released.frames.tolist() == [10, 11, 12, 13, 14, 15, 16]
+    assert released.interpolated.tolist() == [False, True, False, True, True, False, False]
+    np.testing.assert_allclose(released.values, weights(released.frames), rtol=1e-6)
+    push(buffer, [20, 22], arrival=2.0)
+    released = buffer.pop(now=2.0)
+    assert released.frames.tolist() == [20, 21, 22]
+    assert (buffer.interpolated, buffer.lost) == (4, 3)
+
+
+def test_gaps_since_the_last_release_are_filled():
+    buffer = JitterBuffer(latency=0, max_gap=4, channels=CHANNELS)
+    push(buffer, [1, 2], arrival=1.0)
+    buffer.pop(now=1.0)
+    push(buffer, [5], arrival=2.0)
+    released = buffer.pop(now=2.0)
+    assert released.frames.tolist() == [3, 4, 5]
+    np.testing.assert_allclose(released.values, weights([3, 4, 5]), rtol=1e-6)
+
+
+def test_late_and_duplicate_packets_are_dropped_and_counted():
+    buffer = JitterBuffer(latency=0, channels=CHANNELS)
+    push(buffer, [1, 2, 3], arrival=1.0)
+    # 3 is a duplicate of a held packet, 4 is repeated within the push
+    push(buffer, [3, 4, 4], arrival=1.0)
+    assert buffer.pop(now=1.0).frames.tolist() == [1, 2, 3, 4]
+    # 4 was just released, 2 is older than it
+    push(buffer, [4, 2, 5], arrival=2.0)
+    assert buffer.pop(now=2.0).frames.tolist() == [5]
+    assert (buffer.received, buffer.duplicates, buffer.late) == (9, 3, 1)
+
+
+def test_reset_drops_held_packets_but_keeps_the_counters():
+    buffer = JitterBuffer(latency=1.0, channels=CHANNELS)
+    push(buffer, [1, 2], arrival=1.0)
+    buffer.pop(now=2.0)
+    push(buffer, [3, 2], arrival=3.0)
+    buffer.reset()
+    assert len(buffer) == 0
+    # nothing was released since the reset, so older frames are accepted again
+    push(buffer, [1], arrival=4.0)
+    assert buffer.flush().frames.tolist() == [1]
+    assert (buffer.received, buffer.duplicates) == (5, 1)
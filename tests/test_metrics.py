@@ -0,0 +1,23 @@
+import numpy as np
+
+from livelinkface.metrics import RollingHistogram
+
+
+def test_rolling_histogram_keeps_the_last_samples():
+    histogram = RollingHistogram(4)
+    histogram.add_many([1.0, 2.0, 3.0])
+    histogram.add(4.0)
+    histogram.add_many([5.0, 6.0])
+    assert histogram.count == 6 and len(histogram) == 4
+    assert sorted(histogram.samples()) == [3.0, 4.0, 5.0, 6.0]
+    assert histogram.max == 6.0
+
+
+def test_rolling_histogram_counts_every_sample_of_large_batches():
+    histogram = RollingHistogram(4)
+    histogram.add(1.0)
+    histogram.add_many(np.arange(10.0))
+    assert histogram.count == 11
+    assert histogram.summary()["count"] == 11
+    assert sorted(histogram.samples()) == [6.0, 7.0, 8.0, 9.0]
+    assert histogram.max == 9.0
@@ -0,0 +1,110 @@
+import time
+import uuid
+import numpy as np
+import pytest
+
+from livelinkface.backends import NumpyBackend, TargetBackend
+from livelinkface.pipeline import LiveLinkFacePipeline
+from livelinkface.pylivelinkface import PyLiveLinkFace, BLENDSHAPE_COUNT
+
+START = 1000
+
+
+def weights(frame: int) -> np.ndarray:
+    """ Distinct weights for every frame and channel, linear in the frame. """
+    return ((frame - START) + np.arange(BLENDSHAPE_COUNT) / 100).astype(np.float32) / 10
+
+
+def packets(face: PyLiveLinkFace, frames) -> list:
+    return [bytes(face.encode_view(frame, weights(frame))) for frame in frames]
+
+
+def face(name: str = "Subject", fps: int = 60) -> PyLiveLinkFace:
+    # a device id per subject (the default is the same for every instance)
+    return PyLiveLinkFace(name=name, uuid=str(uuid.uuid5(uuid.NAMESPACE_DNS, name)), fps=fps)
+
+
+def test_records_frames_at_their_offset_from_the_first():
+    backend = NumpyBackend(16)
+    pipeline = LiveLinkFacePipeline([backend], record=True, num_frames=16)
+    frames = list(range(START, START + 10))
+    assert pipeline.receive(packets(face(), frames)) == 9
+    assert pipeline.tick() == 9
+    pipeline.close()
+
+    assert backend.recorded == 10
+    np.testing.assert_array_equal(backend.keyframes[:10], [weights(frame) for frame in frames])
+    assert not backend.keyframes[10:].any()
+    assert pipeline.metrics.decoded == 10 and pipeline.metrics.lost == 0
+
+
+def test_keyframes_only_change_on_flush():
+    backend = NumpyBackend(16)
+    pipeline = LiveLinkFacePipeline([backend], record=True, num_frames=16)
+    pipeline.receive(packets(face(), range(START, START + 4)))
+    assert not backend.keyframes.any()
+    pipeline.tick()
+    np.testing.assert_array_equal(backend.keyframes[:4], backend.frames[:4])
+    assert backend.flushed == 1
+
+
+def test_live_poses_the_most_recent_frame():
+    backend = NumpyBackend(0)
+    pipeline = LiveLinkFacePipeline([backend])
+    pipeline.receive(packets(face(), range(START, START + 5)))
+    np.testing.assert_array_equal(backend.live, weights(START + 4))
+
+
+def test_routes_devices_by_subject_name():
+    routed, default = NumpyBackend(8), NumpyBackend(8)
+    pipeline = LiveLinkFacePipeline([default], record=True, num_frames=8, routes={"Left": [routed]})
+    left, right = face("Left"), face("Right")
+    datagrams = []
+    for frame in range(START, START + 4):
+        datagrams += packets(left, [frame]) + packets(right, [frame + 100])
+    pipeline.receive(datagrams)
+    pipeline.close()
+
+    assert routed.recorded == default.recorded == 4
+    np.testing.assert_array_equal(routed.keyframes[:4], [weights(frame) for frame in range(START, START + 4)])
+    np.testing.assert_array_equal(default.keyframes[:4], [weights(frame) for frame in range(START + 100, START + 104)])
+
+
+def test_jitter_buffer_writes_frames_in_order_and_fills_gaps():
+    backend = NumpyBackend(8)
+    pipeline = LiveLinkFacePipeline([backend], record=True, num_frames=8, latency=0.05)
+    # frame 1003 is lost and 1002 arrives after 1004
+    frames = [START, START + 1, START + 4, START + 2, START + 5]
+    datagrams = packets(face(), frames)
+
+    now = time.monotonic()
+    pipeline.receive(datagrams[:2], np.full(2, now))
+    assert pipeline.tick() is None
+    assert backend.recorded == 0
+
+    # packets held for the latency window are released along with every older one
+    pipeline.receive(datagrams[2:], np.full(3, now - 1.0))
+    assert pipeline.tick() == 5
+    np.testing.assert_allclose(backend.keyframes[:6], [weights(frame) for frame in range(START, START + 6)], atol=1e-6)
+    assert pipeline.metrics.out_of_order == 1
+    assert pipeline.metrics.interpolated == 1
+
+
+def test_resamples_onto_the_recording_rate():
+    backend = NumpyBackend(16)
+    pipeline = LiveLinkFacePipeline([backend], record=True, num_frames=16, rate=30)
+    pipeline.receive(packets(face(fps=60), range(START, START + 20)))
+    pipeline.close()
+
+    # every other 60 fps frame falls on a 30 fps frame
+    assert backend.recorded == 10
+    np.testing.assert_allclose(backend.keyframes[:10], [weights(frame) for frame in range(START, START + 20, 2)], atol=1e-6)
+
+
+def test_backends_must_implement_the_interface():
+    class Incomplete(TargetBackend):
+        def write_frame(self, frame, values):
+            pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
@@ -0,0 +1,100 @@
+import uuid
+from array import array
+import numpy as np
+import pytest
+
+from livelinkface.pylivelinkface import PyLiveLinkFace, BLENDSHAPE_COUNT, ROW_SIZE, FRAME_COLUMN, \
+    SUB_FRAME_COLUMN, FPS_COLUMN, DENOMINATOR_COLUMN, MAX_PACKET_SIZE
+
+
+def face(name: str = "Subject", fps: int = 60) -> PyLiveLinkFace:
+    return PyLiveLinkFace(name=name, uuid=str(uuid.uuid5(uuid.NAMESPACE_DNS, name)), fps=fps)
+
+
+def weights(seed: int) -> np.ndarray:
+    return np.random.default_rng(seed).random(BLENDSHAPE_COUNT).astype(np.float32)
+
+
+def test_encode_into_decode_into_round_trip():
+    subject = face(fps=30)
+    subject.denominator = 1001
+    subject.set_blendshapes(weights(0), no_filter=True)
+    buffer = bytearray(MAX_PACKET_SIZE)
+    nbytes = subject.encode_into(buffer, 0, frames=1234)
+    assert bytes(buffer[:nbytes]) == subject.encode(1234)
+
+    for row in (np.zeros(ROW_SIZE), np.zeros(ROW_SIZE, np.float32), array("f", [0] * ROW_SIZE), array("d", [0] * ROW_SIZE)):
+        assert PyLiveLinkFace.decode_into(buffer, row, nbytes)
+        np.testing.assert_array_equal(np.asarray(row[:BLENDSHAPE_COUNT], np.float32), weights(0))
+        assert (row[FRAME_COLUMN], row[FPS_COLUMN], row[DENOMINATOR_COLUMN]) == (1234, 30, 1001)
+        # the sub-frame is sent as the raw bits of a float
+        assert row[SUB_FRAME_COLUMN] == np.int32(subject._sub_frame).view(np.float32)
+
+
+def test_decode_into_matches_decode():
+    subject = face()
+    subject.set_blendshapes(weights(1), no_filter=True)
+    packet = subject.encode(42)
+    found, decoded = PyLiveLinkFace.decode(packet)
+    row = np.zeros(ROW_SIZE)
+    assert found and PyLiveLinkFace.decode_into(packet, row)
+    np.testing.assert_array_equal(row[:BLENDSHAPE_COUNT], np.asarray(decoded._blend_shapes, np.float32))
+    assert row[FRAME_COLUMN] == decoded._frames == 42
+
+
+def test_decode_into_rejects_malformed_packets():
+    packet = face().encode(1)
+    row = np.full(ROW_SIZE, -1.0)
+    # a header without a face leaves the row untouched
+    header_only = packet[:len(packet) - 4 * BLENDSHAPE_COUNT - 1]
+    assert not PyLiveLinkFace.decode_into(header_only, row)
+    assert (row == -1).all()
+    with pytest.raises(ValueError):
+        PyLiveLinkFace.decode_into(packet[:-8], row)
+    wrong_count = bytearray(packet)
+    wrong_count[len(packet) - 4 * BLENDSHAPE_COUNT - 1] = 52
+    with pytest.raises(ValueError):
+        PyLiveLinkFace.decode_into(wrong_count, row)
+
+
+def _check_batch(batch, subjects, frames, indices):
+    assert batch.frames.tolist() == frames
+    assert batch.indices.tolist() == indices
+    assert batch.names.tolist() == [subject.name for subject in subjects]
+    # the uuid property starts with the "$" that completes the packet version
+    assert batch.device_ids.tolist() == [subject.uuid[1:] for subject in subjects]
+    np.testing.assert_array_equal(batch.blendshapes, [weights(frame) for frame in frames])
+
+
+def test_decode_batch_list_of_packets():
+    subject = face()
+    frames = list(range(100, 110))
+    packets = [bytes(subject.encode_view(frame, weights(frame))) for frame in frames]
+    batch = PyLiveLinkFace.decode_batch(packets)
+    _check_batch(batch, [subject] * len(frames), frames, list(range(len(frames))))
+    assert (batch.fps == 60).all() and (batch.denominators == 1).all()
+
+
+def test_decode_batch_concatenated_packets():
+    subject = face()
+    frames = list(range(200, 205))
+    buffer = b"".join(bytes(subject.encode_view(frame, weights(frame))) for frame in frames)
+    _check_batch(PyLiveLinkFace.decode_batch(buffer), [subject] * len(frames), frames, list(range(len(frames))))
+
+
+def test_decode_batch_mixed_lengths_keep_input_order():
+    short, long = face("A"), face("A much longer subject name")
+    subjects = [short, long, long, short, long]
+    frames = [1, 2, 3, 4, 5]
+    packets = [bytes(subject.encode_view(frame, weights(frame))) for subject, frame in zip(subjects, frames)]
+    _check_batch(PyLiveLinkFace.decode_batch(packets), subjects, frames, list(range(len(frames))))
+    _check_batch(PyLiveLinkFace.decode_batch(b"".join(packets)), subjects, frames, list(range(len(frames))))
+
+
+def test_decode_batch_skips_malformed_packets():
+    subject = face()
+    good = [bytes(subject.encode_view(frame, weights(frame))) for frame in (1, 2, 3)]
+    packets = [good[0], good[1][:-8], b"\x06", good[1][:40], good[2]]
+    batch = PyLiveLinkFace.decode_batch(packets)
+    _check_batch(batch, [subject] * 2, [1, 3], [0, 4])
+    assert len(PyLiveLinkFace.decode_batch([]).frames) == 0
@@ -0,0 +1,45 @@
+import socket
+import threading
+import time
+import uuid
+
+from livelinkface.pylivelinkface import PyLiveLinkFace
+from livelinkface.record import CaptureWriter, iter_capture, read_capture, record
+
+
+def test_captures_opened_in_the_same_second_get_their_own_file(tmp_path):
+    packets = [PyLiveLinkFace(uuid=str(uuid.uuid4())).encode(frame) for frame in (1, 2)]
+    paths = []
+    for packet in packets:
+        writer = CaptureWriter(str(tmp_path), prefix="take")
+        writer.write(packet, 1000.0)
+        writer.close()
+        paths += writer.files
+    assert len(set(paths)) == 2
+    for path, packet in zip(paths, packets):
+        assert list(iter_capture(path)) == [(1000.0, packet)]
+
+
+def test_record_writes_received_packets(tmp_path):
+    probe = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    probe.bind(("127.0.0.1", 0))
+    port = probe.getsockname()[1]
+    probe.close()
+
+    writer = CaptureWriter(str(tmp_path))
+    result = {}
+    thread = threading.Thread(target=lambda: result.setdefault("stats", record("127.0.0.1", port, writer, duration=1.0, stats_interval=0)))
+    thread.start()
+    face = PyLiveLinkFace(uuid=str(uuid.uuid4()))
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    # give the recorder time to bind
+    time.sleep(0.2)
+    for frame in range(10):
+        sender.sendto(face.encode(100 + frame), ("127.0.0.1", port))
+    sender.sendto(b"not a face", ("127.0.0.1", port))
+    thread.join()
+
+    stats = result["stats"]
+    assert (stats.received, stats.written, stats.malformed, stats.kernel_drops) == (11, 10, 1, 0)
+    timestamps, packets = read_capture(writer.files[0])
+    assert packets == [face.encode(100 + frame) for frame in range(10)]
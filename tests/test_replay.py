@@ -0,0 +1,57 @@
+import time
+
+import numpy as np
+
+from livelinkface.pylivelinkface import PyLiveLinkFace, BLENDSHAPE_COUNT, LIVE_LINK_FACE_HEADER
+from livelinkface.replay import LiveLinkFaceReplayer
+from livelinkface.timecode import format_timecodes
+
+
+class RecordingSocket:
+    """ Stands in for the UDP socket, keeping every packet with the time it was sent. """
+
+    def __init__(self) -> None:
+        self.sent = []
+
+    def sendto(self, packet, address) -> None:
+        self.sent.append((time.monotonic(), bytes(packet)))
+
+    def close(self) -> None:
+        pass
+
+
+def write_csv(path, frames, fps):
+    values = np.random.default_rng(0).random((len(frames), BLENDSHAPE_COUNT))
+    with open(path, "w") as f:
+        f.write(",".join(LIVE_LINK_FACE_HEADER) + "\n")
+        for timecode, row in zip(format_timecodes(frames, str(fps), np.zeros(len(frames))), values):
+            f.write(f"{timecode},{BLENDSHAPE_COUNT}," + ",".join(f"{v:.6f}" for v in row) + "\n")
+
+
+def test_csv_is_replayed_at_its_own_frame_rate(tmp_path):
+    # 12 frames at 30 fps, crossing a second boundary
+    frames = np.arange(30 * 3600 + 24, 30 * 3600 + 36)
+    write_csv(str(tmp_path / "take.csv"), frames, fps=30)
+    sock = RecordingSocket()
+    replayer = LiveLinkFaceReplayer(sock=sock)
+    subject = replayer.add_csv(str(tmp_path / "take.csv"))
+    np.testing.assert_allclose(subject.times, np.arange(12) / 30)
+    replayer.run()
+
+    assert len(sock.sent) == 12
+    sent_at = np.array([at for at, _ in sock.sent])
+    np.testing.assert_allclose(sent_at - sent_at[0], np.arange(12) / 30, atol=0.01)
+    batch = PyLiveLinkFace.decode_batch([packet for _, packet in sock.sent])
+    assert batch.fps.tolist() == [30] * 12
+    assert batch.frames.tolist() == frames.tolist()
+
+
+def test_csv_frame_rate_can_be_given(tmp_path):
+    # within a single second, so the timecodes can't tell the frame rate
+    frames = np.arange(30 * 3600 + 2, 30 * 3600 + 14)
+    write_csv(str(tmp_path / "take.csv"), frames, fps=30)
+    replayer = LiveLinkFaceReplayer(sock=RecordingSocket())
+    assert replayer.add_csv(str(tmp_path / "take.csv")).face.fps == 60
+    subject = replayer.add_csv(str(tmp_path / "take.csv"), fps=30)
+    assert subject.face.fps == 30
+    np.testing.assert_allclose(subject.times, np.arange(12) / 30)
@@ -0,0 +1,98 @@
+import numpy as np
+
+from livelinkface.pylivelinkface import BLENDSHAPE_COUNT
+from livelinkface.take import TAKE_CHANNELS, TakeReader, TakeWriter, read_csv
+from livelinkface.timecode import Timecode
+
+
+def write_take(path, frames, fps=30, start_timecode="00:00:00:00", index_stride=4, chunk=7):
+    values = np.random.default_rng(0).random((len(frames), 3), dtype=np.float32)
+    with TakeWriter(path, ["a", "b", "c"], fps, 1, start_timecode, index_stride) as writer:
+        # several writes, which don't line up with the index stride
+        for start in range(0, len(frames), chunk):
+            part = slice(start, start + chunk)
+            writer.write(frames[part], np.zeros(len(frames[part])), values[part])
+    return values
+
+
+def test_take_round_trip(tmp_path):
+    frames = np.arange(100, 150)
+    values = write_take(str(tmp_path / "take.llftake"), frames, start_timecode="00:00:03:10")
+    take = TakeReader(str(tmp_path / "take.llftake"))
+    assert (len(take), take.channel_names, take.framerate, take.start_timecode) == (50, ["a", "b", "c"], "30", "00:00:03:10")
+    assert len(take.index) == 13
+    read_frames, read_values = take.read(5, 20)
+    np.testing.assert_array_equal(read_frames, frames[5:20])
+    np.testing.assert_array_equal(read_values, values[5:20])
+
+
+def test_find_frame_matches_a_linear_search(tmp_path):
+    # gaps of up to 5 frames, so many frame numbers aren't in the take
+    frames = 1000 + np.cumsum(np.random.default_rng(1).integers(1, 6, 200))
+    write_take(str(tmp_path / "take.llftake"), frames)
+    take = TakeReader(str(tmp_path / "take.llftake"))
+    for frame in range(int(frames[0]) - 3, int(frames[-1]) + 3):
+        expected = next((row for row, f in enumerate(frames) if f >= frame), len(frames))
+        assert take.find_frame(frame) == expected, frame
+
+
+def test_find_frame_without_an_index(tmp_path):
+    frames = np.arange(0, 40, 2)
+    path = str(tmp_path / "take.llftake")
+    writer = TakeWriter(path, ["a"], index_stride=4)
+    writer.write(frames, np.zeros(len(frames)), np.zeros((len(frames), 1)))
+    # never closed, as after a crash
+    writer._file.flush()
+    take = TakeReader(path)
+    assert (len(take), len(take.index)) == (20, 0)
+    assert [take.find_frame(frame) for frame in (-1, 0, 1, 2, 37, 38, 39)] == [0, 0, 1, 1, 19, 19, 20]
+    writer.close()
+
+
+def test_find_timecode(tmp_path):
+    start = Timecode("30", "00:01:00:00").frames
+    frames = np.arange(start, start + 120, 3)
+    write_take(str(tmp_path / "take.llftake"), frames)
+    take = TakeReader(str(tmp_path / "take.llftake"))
+    assert take.find_timecode("00:01:00:00") == 0
+    assert take.find_timecode("00:01:00:03") == 1
+    assert take.find_timecode("00:01:00:04") == 2
+    assert take.find_timecode("00:01:02:00") == 20
+    assert take.find_timecode("00:00:59:00") == 0
+    assert take.find_timecode("00:01:10:00") == len(frames)
+
+
+def write_csv(path, timecodes, values, columns):
+    with open(path, "w") as f:
+        f.write(",".join(["Timecode", "BlendShapeCount"] + columns) + "\n")
+        for timecode, row in zip(timecodes, values):
+            f.write(",".join([timecode, str(len(columns))] + [f"{v:.6f}" for v in row]) + "\n")
+        # trailing blank lines are ignored
+        f.write("\n")
+
+
+def test_read_csv_is_the_same_for_any_chunk_size(tmp_path):
+    timecodes = [repr(Timecode("60", frames=frame)) for frame in range(1000, 1010)]
+    values = np.random.default_rng(2).random((10, BLENDSHAPE_COUNT)).astype(np.float32)
+    write_csv(str(tmp_path / "take.csv"), timecodes, values, list(TAKE_CHANNELS))
+    for chunk_rows in (1, 3, 10, 4096):
+        read_timecodes, read_values = read_csv(str(tmp_path / "take.csv"), chunk_rows)
+        assert list(read_timecodes) == timecodes
+        np.testing.assert_allclose(read_values, values, atol=1e-6)
+
+
+def test_read_csv_matches_columns_by_name(tmp_path):
+    columns = ["JawOpen", "EyeBlinkLeft", "NotABlendShape"]
+    values = np.random.default_rng(3).random((5, 3)).astype(np.float32)
+    write_csv(str(tmp_path / "take.csv"), ["00:00:00:0%d.000" % i for i in range(5)], values, columns)
+    timecodes, read_values = read_csv(str(tmp_path / "take.csv"), chunk_rows=2)
+    assert read_values.shape == (5, BLENDSHAPE_COUNT)
+    np.testing.assert_allclose(read_values[:, TAKE_CHANNELS.index("JawOpen")], values[:, 0], atol=1e-6)
+    np.testing.assert_allclose(read_values[:, TAKE_CHANNELS.index("EyeBlinkLeft")], values[:, 1], atol=1e-6)
+    assert np.count_nonzero(read_values.any(axis=0)) == 2
+
+
+def test_read_csv_without_rows(tmp_path):
+    write_csv(str(tmp_path / "take.csv"), [], [], list(TAKE_CHANNELS))
+    timecodes, values = read_csv(str(tmp_path / "take.csv"))
+    assert (timecodes.shape, values.shape) == ((0,), (0, BLENDSHAPE_COUNT))
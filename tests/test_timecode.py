@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from livelinkface.timecode import Timecode, format_timecodes, infer_framerate, parse_timecodes
+
+# (frame rate, the integer rate infer_framerate should read its timecodes at)
+FRAMERATES = [("24", 24), ("25", 25), ("29.97", 30), ("59.94", 60), ("60", 60)]
+
+
+def frame_numbers(framerate):
+    """ Frame numbers around the second, minute and (drop-frame) ten minute
+    boundaries, and across most of a day. """
+    fps = Timecode(framerate).framerate
+    rate = round(float(fps))
+    around = [0, rate - 1, rate, 60 * rate - 1, 60 * rate, 60 * rate + 2, 600 * rate - 1, 600 * rate, 3600 * rate + 7]
+    spread = np.random.default_rng(0).integers(0, 20 * 3600 * rate, 200)
+    return np.unique(np.concatenate([around, spread]))
+
+
+@pytest.mark.parametrize("framerate, rate", FRAMERATES)
+def test_vectorised_timecodes_match_timecode(framerate, rate):
+    frames = frame_numbers(framerate)
+    expected = [repr(Timecode(framerate, frames=int(frame) + 1)) for frame in frames]
+    assert format_timecodes(frames, framerate).tolist() == expected
+
+    parsed, sub_frames = parse_timecodes(expected, framerate)
+    assert parsed.tolist() == [Timecode(framerate, timecode).frame_number for timecode in expected]
+    assert parsed.tolist() == frames.tolist()
+    assert not sub_frames.any()
+
+
+@pytest.mark.parametrize("framerate, rate", FRAMERATES)
+def test_sub_frames_round_trip(framerate, rate):
+    frames = frame_numbers(framerate)
+    sub_frames = np.round(np.random.default_rng(1).random(len(frames)), 3)
+    timecodes = format_timecodes(frames, framerate, sub_frames)
+    assert all(timecode.startswith(repr(Timecode(framerate, frames=int(frame) + 1)) + ".")
+               for timecode, frame in zip(timecodes, frames))
+    parsed, parsed_sub_frames = parse_timecodes(timecodes, framerate)
+    assert parsed.tolist() == frames.tolist()
+    np.testing.assert_allclose(parsed_sub_frames, sub_frames, atol=1e-9)
+
+
+@pytest.mark.parametrize("framerate, rate", FRAMERATES)
+def test_infer_framerate(framerate, rate):
+    # two seconds of consecutive frames, as in a CSV
+    start = Timecode(framerate, "01:02:03:00").frame_number
+    timecodes = [repr(Timecode(framerate, frames=frame + 1)) for frame in range(start, start + 2 * rate)]
+    assert infer_framerate(timecodes) == rate
+    # not enough to tell
+    assert infer_framerate(timecodes[:3]) == 60
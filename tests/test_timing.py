@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from livelinkface.timing import Resampler, frame_times, interpolate, resample
+
+
+def stream(count=500, seed=0):
+    """ Arrival times of a jittery ~60 fps stream (some packets out of order),
+    with (N, 3) values. """
+    random = np.random.default_rng(seed)
+    times = 1.5 + np.arange(count) / 60 + random.normal(0, 0.006, count)
+    values = random.random((count, 3)).astype(np.float32)
+    return times, values
+
+
+def batch_resample(times, values, rate):
+    """ resample, after dropping the samples that arrived out of order (as
+    the streaming resampler does). """
+    keep = times >= np.maximum.accumulate(times)
+    keep[1:] &= np.diff(times) > 0
+    return resample(times[keep], values[keep], rate)
+
+
+@pytest.mark.parametrize("rate", [24, 30, 60, 59.94, 120])
+@pytest.mark.parametrize("batch", [1, 3, 17, 500])
+def test_streaming_matches_batch(rate, batch):
+    times, values = stream()
+    expected_frames, expected_values = batch_resample(times, values, rate)
+    resampler = Resampler(rate)
+    pushed = [resampler.push(times[i:i + batch], values[i:i + batch]) for i in range(0, len(times), batch)]
+    frames = np.concatenate([frames for frames, _ in pushed])
+    np.testing.assert_array_equal(frames, expected_frames)
+    np.testing.assert_allclose(np.concatenate([values for _, values in pushed]), expected_values, rtol=1e-6, atol=1e-6)
+
+
+def test_every_grid_frame_is_output_once():
+    times, values = stream()
+    resampler = Resampler(60)
+    frames = np.concatenate([resampler.push(times[i:i + 5], values[i:i + 5])[0] for i in range(0, len(times), 5)])
+    assert frames.tolist() == list(range(frames[0], frames[-1] + 1))
+    assert frames[0] == np.ceil(times[0] * 60)
+
+
+def test_reset_starts_a_new_grid():
+    resampler = Resampler(10)
+    resampler.push([0.0, 1.0], np.zeros((2, 1)))
+    resampler.reset()
+    frames, _ = resampler.push([0.55, 0.8], np.ones((2, 1)))
+    assert frames.tolist() == [6, 7, 8]
+
+
+def test_interpolate_and_frame_times():
+    times = np.array([0.0, 1.0, 3.0])
+    values = np.array([[0.0], [1.0], [5.0]])
+    np.testing.assert_allclose(interpolate(times, values, [-1.0, 0.5, 2.0, 4.0])[:, 0], [0.0, 0.5, 3.0, 5.0])
+    np.testing.assert_allclose(frame_times([0, 30, 60], fps=30), [0.0, 1.0, 2.0])
+    np.testing.assert_allclose(frame_times([1001], 0.5, 30000, 1001), [1001.5 * 1001 / 30000])
+    with pytest.raises(ValueError):
+        Resampler(0)
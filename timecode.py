@@ -23,6 +23,91 @@
 
 __version__ = '1.3.1'
 
+import time
+
+import numpy as np
+
+
+class FramerateInfo(object):
+    """The properties of a frame rate, as parsed by :attr:`Timecode.framerate`.
+
+    Instances are cached per frame rate value (see :func:`framerate_info`), so
+    a frame rate is only ever parsed once however many Timecode instances use
+    it.
+    """
+    __slots__ = ('framerate', 'int_framerate', 'float_framerate', 'drop_frame',
+                 'drop_frames', 'ms_frame', 'delimiter')
+
+    def __init__(self, framerate, force_non_drop_frame=False):
+        # Convert rational frame rate to float
+        numerator = None
+        denominator = None
+
+        try:
+            if '/' in framerate:
+                numerator, denominator = framerate.split('/')
+        except TypeError:
+            # not a string
+            pass
+
+        if isinstance(framerate, tuple):
+            numerator, denominator = framerate
+
+        try:
+            from fractions import Fraction
+            if isinstance(framerate, Fraction):
+                numerator = framerate.numerator
+                denominator = framerate.denominator
+        except ImportError:
+            pass
+
+        if numerator and denominator:
+            framerate = round(float(numerator) / float(denominator), 2)
+            if framerate.is_integer():
+                framerate = int(framerate)
+
+        # check if number is passed and if so convert it to a string
+        if isinstance(framerate, (int, float)):
+            framerate = str(framerate)
+
+        self.drop_frame = False
+        self.ms_frame = False
+        # set the int_frame_rate
+        if framerate == '29.97':
+            self.int_framerate = 30
+            self.drop_frame = not force_non_drop_frame
+        elif framerate == '59.94':
+            self.int_framerate = 60
+            self.drop_frame = not force_non_drop_frame
+        elif any(map(lambda x: framerate.startswith(x), ['23.976', '23.98'])):
+            self.int_framerate = 24
+        elif framerate in ['ms', '1000']:
+            self.int_framerate = 1000
+            self.ms_frame = True
+            framerate = 1000
+        elif framerate == 'frames':
+            self.int_framerate = 1
+        else:
+            self.int_framerate = int(float(framerate))
+
+        self.framerate = framerate
+        self.float_framerate = float(framerate) if framerate != 'frames' else float(self.int_framerate)
+        # Number of drop frames is 6% of framerate rounded to nearest integer
+        self.drop_frames = int(round(self.float_framerate * .066666)) if self.drop_frame else 0
+        self.delimiter = ';' if self.drop_frame else '.' if self.ms_frame else ':'
+
+
+_FRAMERATE_INFO = {}
+
+
+def framerate_info(framerate, force_non_drop_frame=False):
+    """Returns the (cached) :class:`FramerateInfo` of a frame rate."""
+    key = (framerate.__class__, framerate, force_non_drop_frame)
+    info = _FRAMERATE_INFO.get(key)
+    if info is None:
+        info = _FRAMERATE_INFO[key] = FramerateInfo(framerate, force_non_drop_frame)
+    return info
+
 
 class Timecode(object):
     """The main timecode class.
@@ -67,6 +152,7 @@ class Timecode(object):
         self.fraction_frame = False
         self._int_framerate = None
         self._framerate = None
+        self._info = None
         self.framerate = framerate
 
         self._frames = None
@@ -86,6 +172,42 @@ class Timecode(object):
                 # use default value of 00:00:00:00
                 self.frames = self.tc_to_frames('00:00:00:00')
 
+    @classmethod
+    def _from_info(cls, info, frames, force_non_drop_frame=False):
+        """Creates an instance from an already parsed frame rate, without
+        going through __init__.
+        """
+        tc = cls.__new__(cls)
+        tc.force_non_drop_frame = force_non_drop_frame
+        tc.fraction_frame = False
+        tc._set_info(info)
+        tc.frames = frames
+        return tc
+
+    @classmethod
+    def from_components(cls, framerate, hours, minutes, seconds, frames,
+                        force_non_drop_frame=False):
+        """Creates a Timecode from integer hours, minutes, seconds and frames,
+        skipping the timecode string formatting and parsing.
+        """
+        info = framerate_info(framerate, force_non_drop_frame)
+        tc = cls._from_info(info, 1, force_non_drop_frame)
+        tc.frames = tc.components_to_frames(hours, minutes, seconds, frames)
+        return tc
+
+    @classmethod
+    def from_clock(cls, framerate, seconds=None, force_non_drop_frame=False):
+        """Creates a Timecode from a clock reading in seconds, e.g. the
+        seconds since midnight or ``time.monotonic()``. Defaults to the
+        current local time of day.
+        """
+        if seconds is None:
+            now = time.time()
+            seconds = (now + time.localtime(now).tm_gmtoff) % 86400
+        info = framerate_info(framerate, force_non_drop_frame)
+        return cls._from_info(info, int(seconds * info.float_framerate) + 1,
+                              force_non_drop_frame)
+
     @property
     def frames(self):
         """getter for the _frames attribute
@@ -126,62 +248,14 @@ class Timecode(object):
         :param framerate:
         :return:
         """
-        # Convert rational frame rate to float
-        numerator = None
-        denominator = None
+        self._set_info(framerate_info(framerate, self.force_non_drop_frame is True))
 
-        try:
-            if '/' in framerate:
-                numerator, denominator = framerate.split('/')
-        except TypeError:
-            # not a string
-            pass
-
-        if isinstance(framerate, tuple):
-            numerator, denominator = framerate
-
-        try:
-            from fractions import Fraction
-            if isinstance(framerate, Fraction):
-                numerator = framerate.numerator
-                denominator = framerate.denominator
-        except ImportError:
-            pass
-
-        if numerator and denominator:
-            framerate = round(float(numerator) / float(denominator), 2)
-            if framerate.is_integer():
-                framerate = int(framerate)
-
-        # check if number is passed and if so convert it to a string
-        if isinstance(framerate, (int, float)):
-            framerate = str(framerate)
-
-        # set the int_frame_rate
-        if framerate == '29.97':
-            self._int_framerate = 30
-            if self.force_non_drop_frame is True:
-                self.drop_frame = False
-            else:
-                self.drop_frame = True
-        elif framerate == '59.94':
-            self._int_framerate = 60
-            if self.force_non_drop_frame is True:
-                self.drop_frame = False
-            else:
-                self.drop_frame = True
-        elif any(map(lambda x: framerate.startswith(x), ['23.976', '23.98'])):
-            self._int_framerate = 24
-        elif framerate in ['ms', '1000']:
-            self._int_framerate = 1000
-            self.ms_frame = True
-            framerate = 1000
-        elif framerate == 'frames':
-            self._int_framerate = 1
-        else:
-            self._int_framerate = int(float(framerate))
-
-        self._framerate = framerate
+    def _set_info(self, info):
+        self._info = info
+        self._int_framerate = info.int_framerate
+        self._framerate = info.framerate
+        self.drop_frame = info.drop_frame
+        self.ms_frame = info.ms_frame
 
     def set_fractional(self, state):
         """Set or unset timecode to be represented with fractional seconds
@@ -209,46 +283,31 @@ class Timecode(object):
         hours, minutes, seconds, frames = map(int, self.parse_timecode(timecode))
 
         if isinstance(timecode, int):
-            time_tokens = [hours, minutes, seconds, frames]
-            timecode = ':'.join(str(t) for t in time_tokens)
+            return self.components_to_frames(hours, minutes, seconds, frames)
 
-            if self.drop_frame:
-                timecode = ';'.join(timecode.rsplit(':', 1))
+        # Handle case where frames are fractions of a second
+        if len(timecode.split('.')) == 2 and not self.ms_frame:
+            self.fraction_frame = True
+            fraction = timecode.rsplit('.', 1)[1]
 
-        if self.framerate != 'frames':
-            ffps = float(self.framerate)
-        else:
-            ffps = float(self._int_framerate)
+            frames = int(round(float('.' + fraction) * self._info.float_framerate))
 
-        if self.drop_frame:
-            # Number of drop frames is 6% of framerate rounded to nearest
-            # integer
-            drop_frames = int(round(ffps * .066666))
-        else:
-            drop_frames = 0
+        return self.components_to_frames(hours, minutes, seconds, frames)
+
+    def components_to_frames(self, hours, minutes, seconds, frames):
+        """Converts integer hours, minutes, seconds and frames to frames
+        """
+        drop_frames = self._info.drop_frames
 
         # We don't need the exact framerate anymore, we just need it rounded to
         # nearest integer
         ifps = self._int_framerate
 
-        # Number of frames per hour (non-drop)
-        hour_frames = ifps * 60 * 60
-
-        # Number of frames per minute (non-drop)
-        minute_frames = ifps * 60
-
         # Total number of minutes
         total_minutes = (60 * hours) + minutes
 
-        # Handle case where frames are fractions of a second
-        if len(timecode.split('.')) == 2 and not self.ms_frame:
-            self.fraction_frame = True
-            fraction = timecode.rsplit('.', 1)[1]
-
-            frames = int(round(float('.' + fraction) * ffps))
-
         frame_number = \
-            ((hour_frames * hours) + (minute_frames * minutes) +
+            ((ifps * 3600 * hours) + (ifps * 60 * minutes) +
              (ifps * seconds) + frames) - \
             (drop_frames * (total_minutes - (total_minutes // 10)))
 
@@ -262,8 +321,8 @@ class Timecode(object):
         if self.drop_frame:
             # Number of frames to drop on the minute marks is the nearest
             # integer to 6% of the framerate
-            ffps = float(self.framerate)
-            drop_frames = int(round(ffps * .066666))
+            ffps = self._info.float_framerate
+            drop_frames = self._info.drop_frames
         else:
             ffps = float(self._int_framerate)
             drop_frames = 0
@@ -341,14 +400,10 @@ class Timecode(object):
     @property
     def frame_delimiter(self):
         """Return correct symbol based on framerate."""
-        if self.drop_frame:
-            return ';'
-
-        elif self.ms_frame or self.fraction_frame:
+        if self.fraction_frame and not self.drop_frame:
             return '.'
 
-        else:
-            return ':'
+        return self._info.delimiter
 
     def __iter__(self):
         yield self
@@ -436,7 +491,7 @@ class Timecode(object):
         added to this one
         """
         # duplicate current one
-        tc = Timecode(self.framerate, frames=self.frames)
+        tc = Timecode._from_info(self._info, self.frames)
 
         if isinstance(other, Timecode):
             tc.add_frames(other.frames)
@@ -536,3 +591,172 @@ class TimecodeError(Exception):
     """Raised when an error occurred in timecode calculation
     """
     pass
+
+
+# Array conversions. These follow the same rules as Timecode.tc_to_frames and
+# Timecode.frames_to_tc, but work on whole NumPy arrays at once, so a column
+# of timecodes (e.g. from a CSV) costs a few array operations rather than a
+# Timecode instance per row.
+
+def _components_to_frame_numbers(info, hours, minutes, seconds, frames):
+    ifps = info.int_framerate
+    total_minutes = 60 * hours + minutes
+    return (ifps * 3600 * hours + ifps * 60 * minutes + ifps * seconds + frames) - \
+        info.drop_frames * (total_minutes - total_minutes // 10)
+
+
+def parse_timecodes(timecodes, framerate, force_non_drop_frame=False):
+    """Converts an array of timecode strings to 0 based frame numbers
+    (i.e. :attr:`Timecode.frame_number`).
+
+    Accepts 'HH:MM:SS:FF', drop-frame 'HH:MM:SS;FF', fractional seconds
+    'HH:MM:SS.sss' (milliseconds as frames for the 'ms' frame rate) and the
+    'HH:MM:SS:FF.fff' form written by the LiveLinkFace app, where the
+    fraction is the sub-frame.
+
+    The strings are viewed as a (rows, characters) code point matrix, which is
+    split into fields at the separators and each field's digits summed with
+    their powers of ten, for every row at once.
+
+    :returns: the (N,) int64 frame numbers and (N,) float64 sub-frames (0
+      unless given).
+    """
+    info = framerate_info(framerate, force_non_drop_frame)
+    raw = np.asarray(timecodes)
+    if raw.dtype.kind not in 'US':
+        raw = raw.astype(str)
+    count = len(raw)
+    width = raw.dtype.itemsize
+    if count == 0 or width == 0:
+        return np.zeros(count, dtype=np.int64), np.zeros(count, dtype=np.float64)
+    # one code point per cell (4 bytes per character for str arrays)
+    chars = raw.view(np.uint32 if raw.dtype.kind == 'U' else np.uint8).reshape(count, -1)
+
+    is_digit = (chars >= 48) & (chars <= 57)
+    is_separator = (chars == 58) | (chars == 59) | (chars == 46)
+    # the field each character belongs to, counting separators from the left
+    field = np.cumsum(is_separator, axis=1, dtype=np.int8)
+    fields = field[:, -1].astype(np.int64)
+    invalid = ~(is_digit | is_separator | (chars == 0) | (chars == 32)).all(axis=1) | \
+        (fields < 3) | (fields > 4)
+    if invalid.any():
+        raise ValueError("Invalid timecode %r" % str(raw[np.argmax(invalid)]))
+
+    rows = np.arange(count)
+    if (is_digit == is_digit[0]).all() and (is_separator == is_separator[0]).all() and \
+            (chars[:, is_separator[0]] == chars[0, is_separator[0]]).all():
+        # every row has the same layout (the usual case, e.g. a CSV column),
+        # so each field is a fixed set of columns
+        values = np.zeros((count, 5), dtype=np.int64)
+        digits = np.zeros((count, 5), dtype=np.int64)
+        separators = np.zeros((count, 5), dtype=np.uint8)
+        for k in range(fields[0] + 1):
+            columns = np.flatnonzero(is_digit[0] & (field[0] == k))
+            values[:, k] = (chars[:, columns].astype(np.int64) - 48) @ (10 ** np.arange(len(columns) - 1, -1, -1))
+            digits[:, k] = len(columns)
+            if k > 0:
+                separators[:, k] = chars[0, np.flatnonzero(is_separator[0] & (field[0] == k))[0]]
+        return _fields_to_frame_numbers(info, fields, values, digits, separators)
+
+    # the power of ten of each digit is the number of digits after it in
+    # its field: all the digits after it, less those in later fields
+    digits = np.stack([(is_digit & (field == k)).sum(axis=1) for k in range(5)], axis=1)
+    later = np.cumsum(digits[:, ::-1], axis=1)[:, ::-1] - digits
+    after = np.cumsum(is_digit[:, ::-1], axis=1)[:, ::-1] - is_digit
+    power = after - np.take_along_axis(later, field.astype(np.intp), axis=1)
+    place = np.where(is_digit, (chars - 48) * 10 ** np.maximum(power, 0), 0)
+    values = np.stack([np.where(field == k, place, 0).sum(axis=1) for k in range(5)], axis=1)
+    # the separator that starts each field
+    separators = np.zeros((count, 5), dtype=np.uint8)
+    for k in range(1, 5):
+        starts = is_separator & (field == k)
+        separators[:, k] = np.where(starts.any(axis=1), chars[rows, np.argmax(starts, axis=1)], 0)
+    return _fields_to_frame_numbers(info, fields, values, digits, separators)
+
+
+def _fields_to_frame_numbers(info, field, values, digits, separators):
+    """ Frame numbers and sub-frames from the (N, 5) parsed timecode fields
+    (see parse_timecodes), field being the index of the last field. """
+    count = len(values)
+    hours, minutes, seconds, frames = values[:, 0], values[:, 1], values[:, 2], values[:, 3].copy()
+    sub_frames = np.zeros(count, dtype=np.float64)
+    # 'HH:MM:SS.sss', the last field is a fraction of a second (or milliseconds)
+    fraction = (field == 3) & (separators[:, 3] == 46)
+    if fraction.any() and not info.ms_frame:
+        seconds_fraction = values[fraction, 3] / 10.0 ** digits[fraction, 3]
+        frames[fraction] = np.round(seconds_fraction * info.float_framerate).astype(np.int64)
+    # 'HH:MM:SS:FF.fff', the last field is the sub-frame
+    sub_frame = field == 4
+    if sub_frame.any():
+        sub_frames[sub_frame] = values[sub_frame, 4] / 10.0 ** digits[sub_frame, 4]
+
+    return _components_to_frame_numbers(info, hours, minutes, seconds, frames), sub_frames
+
+
+def format_timecodes(frame_numbers, framerate, sub_frames=None, force_non_drop_frame=False):
+    """Converts an array of 0 based frame numbers to timecode strings (the
+    inverse of :func:`parse_timecodes`). If sub_frames are given they are
+    appended as a 3 digit fraction ('HH:MM:SS:FF.fff').
+
+    :returns: an (N,) array of str.
+    """
+    info = framerate_info(framerate, force_non_drop_frame)
+    frame_number = np.asarray(frame_numbers, dtype=np.int64)
+    count = len(frame_number)
+
+    if info.drop_frame:
+        ffps = info.float_framerate
+        drop_frames = info.drop_frames
+    else:
+        ffps = float(info.int_framerate)
+        drop_frames = 0
+    frames_per_10_minutes = int(round(ffps * 60 * 10))
+    frames_per_24_hours = int(round(ffps * 60 * 60 * 24))
+    frames_per_minute = int(round(ffps) * 60) - drop_frames
+
+    frame_number = frame_number % frames_per_24_hours
+    if info.drop_frame:
+        d = frame_number // frames_per_10_minutes
+        m = frame_number % frames_per_10_minutes
+        frame_number = frame_number + drop_frames * 9 * d + \
+            np.where(m > drop_frames, drop_frames * ((m - drop_frames) // frames_per_minute), 0)
+
+    ifps = info.int_framerate
+    fields = [frame_number // ifps // 3600, frame_number // ifps // 60 % 60,
+              frame_number // ifps % 60, frame_number % ifps]
+    frame_digits = 3 if info.ms_frame else 2
+    delimiter = ord(info.delimiter)
+    layout = [(fields[0], 2), (58, 0), (fields[1], 2), (58, 0), (fields[2], 2),
+              (delimiter, 0), (fields[3], frame_digits)]
+    if sub_frames is not None:
+        sub = np.clip(np.round(np.asarray(sub_frames, dtype=np.float64) * 1000), 0, 999).astype(np.int64)
+        layout += [(46, 0), (sub, 3)]
+
+    columns = []
+    for value, width in layout:
+        if width == 0:
+            columns.append(np.full(count, value, dtype=np.uint8))
+            continue
+        for power in range(width - 1, -1, -1):
+            columns.append((value // 10 ** power % 10 + 48).astype(np.uint8))
+    chars = np.ascontiguousarray(np.stack(columns, axis=1))
+    return chars.view('S%d' % chars.shape[1]).ravel().astype(str)
+
+
+def infer_framerate(timecodes, rates=(24, 25, 30, 48, 50, 60, 100, 120), default=60):
+    """Guesses the (integer) frame rate an array of 'HH:MM:SS:FF' timecodes
+    was written at, from the highest frame field (FF) seen: the smallest of
+    rates above it. Timecodes that never cross a second boundary can't tell,
+    so they get default.
+
+    :returns: the frame rate, an int.
+    """
+    # at 1000 fps, every frame field the timecodes can hold fits below a second
+    frame_numbers, _ = parse_timecodes(timecodes, 1000)
+    if len(frame_numbers) == 0:
+        return default
+    seconds = frame_numbers // 1000
+    if (seconds == seconds[0]).all():
+        return default
+    needed = int((frame_numbers % 1000).max()) + 1
+    return next((rate for rate in rates if rate >= needed), needed)
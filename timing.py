@@ -0,0 +1,102 @@
+"""Timing: from device frame numbers to times, and from times to scene frames.
+
+A LiveLinkFace packet stamps each frame with a frame number, a sub-frame
+(the fraction of a frame, as in Unreal's FFrameTime) and the device frame
+rate as a fraction (fps / denominator). frame_times turns those into
+seconds, and resample/Resampler then linearly interpolate the weights onto a
+fixed frame grid (e.g. the Blender scene's frame rate), so a 60 fps take
+keyed into a 24 fps scene keeps its real-time speed.
+
+resample works on a whole take at once; Resampler does the same for a
+stream, a batch of samples at a time, carrying the last sample over so the
+result is the same however the stream is split. Both are vectorized over
+samples and channels.
+"""
+import math
+from typing import Tuple
+import numpy as np
+
+
+def frame_times(frames, sub_frames=0.0, fps=60, denominator=1) -> np.ndarray:
+    """ Returns the time (seconds) of each frame. Every argument can be a
+    scalar or an array (broadcast against frames). """
+    frames = np.asarray(frames, dtype=np.float64)
+    return (frames + np.asarray(sub_frames, dtype=np.float64)) * \
+        np.asarray(denominator, dtype=np.float64) / np.asarray(fps, dtype=np.float64)
+
+
+def interpolate(times: np.ndarray, values: np.ndarray, at: np.ndarray) -> np.ndarray:
+    """ Linearly interpolates (N, channels) values sampled at increasing
+    times at the given times (clamped to the first/last sample). """
+    times = np.asarray(times, dtype=np.float64)
+    values = np.asarray(values)
+    at = np.asarray(at, dtype=np.float64)
+    if len(times) == 1:
+        return np.repeat(values[:1], len(at), axis=0)
+    idx = np.clip(np.searchsorted(times, at, side="right") - 1, 0, len(times) - 2)
+    t0, t1 = times[idx], times[idx + 1]
+    weight = np.clip((at - t0) / np.where(t1 > t0, t1 - t0, 1.0), 0.0, 1.0)
+    v0, v1 = values[idx], values[idx + 1]
+    return (v0 + weight.reshape((-1,) + (1,) * (values.ndim - 1)) * (v1 - v0)).astype(values.dtype, copy=False)
+
+
+def _increasing(times: np.ndarray, after: float) -> np.ndarray:
+    """ Mask of the samples later than every sample before them (and than
+    after), i.e. dropping any that arrived out of order. """
+    previous = np.maximum.accumulate(np.concatenate([[after], times[:-1]]))
+    return times > previous
+
+
+def resample(times, values, rate: float) -> Tuple[np.ndarray, np.ndarray]:
+    """ Resamples (N, channels) values taken at the given times onto a grid
+    of rate frames per second, covering the same time span.
+
+    Returns the grid frame numbers (time * rate, so frame 0 is time 0) and
+    the interpolated values.
+    """
+    return Resampler(rate).push(times, values)
+
+
+class Resampler:
+    """Streaming resampler onto a grid of rate frames per second.
+
+    Every call to push returns the grid frames that fall between the
+    previous sample and the newest one pushed. Samples older than one
+    already pushed are dropped.
+    """
+
+    def __init__(self, rate: float) -> None:
+        if rate <= 0:
+            raise ValueError("The frame rate must be greater than 0")
+        self.rate = rate
+        self.next_frame = None
+        self._last_time = -math.inf
+        self._last_values = None
+
+    def reset(self) -> None:
+        self.next_frame = None
+        self._last_time = -math.inf
+        self._last_values = None
+
+    def push(self, times, values) -> Tuple[np.ndarray, np.ndarray]:
+        times = np.asarray(times, dtype=np.float64)
+        values = np.asarray(values)
+        keep = _increasing(times, self._last_time)
+        if not keep.all():
+            times, values = times[keep], values[keep]
+        if len(times) == 0:
+            return np.zeros(0, dtype=np.int64), values[:0]
+
+        if self.next_frame is None:
+            self.next_frame = math.ceil(times[0] * self.rate - 1e-9)
+        else:
+            times = np.concatenate([[self._last_time], times])
+            values = np.concatenate([self._last_values[None], values])
+        last_frame = math.floor(times[-1] * self.rate + 1e-9)
+        grid = np.arange(self.next_frame, last_frame + 1, dtype=np.int64)
+        resampled = interpolate(times, values, grid / self.rate)
+
+        self.next_frame = max(self.next_frame, last_frame + 1)
+        self._last_time = times[-1]
+        self._last_values = values[-1]
+        return grid, resampled